@@ -3,6 +3,7 @@
 from fastapi import APIRouter, HTTPException
 from app.schemas.story_schema import GenreInput, GenreResponse
 from app.schemas.response_schema import APIResponse
+from app.core.executor import InferenceQueueFull, run_scoring
 from app.services.genre_service import GenreService
 
 router = APIRouter(prefix="/genre", tags=["Genre"])
@@ -16,13 +17,15 @@ async def detect_genre(input_data: GenreInput):
     - **text**: Story text to analyze
     """
     try:
-        result = GenreService.detect_genre(input_data.text)
+        result = await run_scoring(GenreService.detect_genre, input_data.text)
         
         return APIResponse(
             success=True,
             message="Genre detected successfully",
             data=result
         )
+    except InferenceQueueFull:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
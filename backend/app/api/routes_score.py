@@ -3,6 +3,7 @@
 from fastapi import APIRouter, HTTPException
 from app.schemas.story_schema import ScoreInput, ScoreResponse, CharacterInput, CharacterResponse
 from app.schemas.response_schema import APIResponse
+from app.core.executor import InferenceQueueFull, run_ner, run_scoring
 from app.services.scoring_service import ScoringService
 from app.services.memory_service import MemoryService
 
@@ -17,13 +18,15 @@ async def score_story(input_data: ScoreInput):
     - **text**: Story text to score
     """
     try:
-        result = ScoringService.score_story(input_data.text)
+        result = await run_scoring(ScoringService.score_story, input_data.text)
         
         return APIResponse(
             success=True,
             message="Story scored successfully",
             data=result
         )
+    except InferenceQueueFull:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -38,7 +41,7 @@ async def extract_characters(input_data: CharacterInput):
     - **text**: Story text to extract characters from
     """
     try:
-        result = MemoryService.extract_characters(input_data.text)
+        result = await run_ner(MemoryService.extract_characters, input_data.text)
 
         # Optional persistence for multi-turn story generation
         if getattr(input_data, "user_id", None) and result.get("characters"):
@@ -53,6 +56,8 @@ async def extract_characters(input_data: CharacterInput):
             message="Characters extracted successfully",
             data=result
         )
+    except InferenceQueueFull:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -1,9 +1,23 @@
 """Story pipeline API routes for multi-genre story generation."""
 
+import asyncio
+import json
 import logging
-from fastapi import APIRouter, HTTPException
-from typing import Optional
+import time
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Dict, Optional
 
+from app.core.config import settings
+from app.core.deadline import Deadline, GenerationCancelled
+from app.core.executor import (
+    InferenceQueueFull,
+    run_generation,
+    run_ner,
+    run_scoring,
+    submit_generation,
+)
+from app.core.timing import server_timing_header, stage_histograms
 from app.schemas.story_schema import (
     GenerateStoryRequest,
     GenerateStoryResponse,
@@ -16,18 +30,31 @@ from app.services.memory_service import get_characters
 from app.services.story_service import (
     continue_story_pipeline,
     generate_story_pipeline,
+    generate_story_stream,
 )
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Story"])
 
 
+async def _cancel_on_disconnect(http_request: Request, deadline: Deadline) -> None:
+    """Poll the ASGI connection and cancel `deadline` once the client has gone away."""
+    while not deadline.cancelled:
+        if await http_request.is_disconnected():
+            logger.info(f"Client disconnected from {http_request.url.path}; cancelling generation")
+            deadline.cancel()
+            return
+        await asyncio.sleep(settings.DISCONNECT_POLL_INTERVAL)
+
+
 # ============================================================================
 # MAIN ENDPOINT: Complete multi-genre story generation pipeline
 # ============================================================================
 
 @router.post("/generate", response_model=GenerateStoryResponse)
-async def generate_story(request: GenerateStoryRequest) -> GenerateStoryResponse:
+async def generate_story(
+    request: GenerateStoryRequest, http_request: Request, http_response: Response
+) -> GenerateStoryResponse:
     """
     Generate a story with advanced features: character persistence, twist injection,
     refinement, and scoring.
@@ -53,9 +80,14 @@ async def generate_story(request: GenerateStoryRequest) -> GenerateStoryResponse
         measure: Whether to score the story
         temperature: Creativity parameter (0.1=focused, 2.0=creative)
         max_tokens: Maximum tokens to generate
+        candidates: Continuations to sample together and rerank (best-of-N)
+        seed: Optional seed; identical seeded requests are answered from cache
     
     Returns:
-        GenerateStoryResponse with generated story and metadata
+        GenerateStoryResponse with generated story and metadata. Per-stage
+        timings are returned in `timings` and as a Server-Timing header.
+        Generation stops at REQUEST_TIMEOUT (partial story returned with
+        `deadline_exceeded`) or as soon as the client disconnects.
     
     Example request:
     ```json
@@ -73,7 +105,9 @@ async def generate_story(request: GenerateStoryRequest) -> GenerateStoryResponse
     
     Raises:
         HTTPException 400: Invalid input or validation failed
+        HTTPException 499: Client disconnected (generation cancelled)
         HTTPException 500: Generation failed
+        HTTPException 504: Deadline passed before generation could start
     """
     try:
         logger.info(f"POST /api/story/generate for user {request.user_id}")
@@ -83,17 +117,35 @@ async def generate_story(request: GenerateStoryRequest) -> GenerateStoryResponse
             logger.warning("Missing user_id")
             raise HTTPException(status_code=400, detail="user_id is required")
         
-        # Run the complete pipeline
-        result = generate_story_pipeline(
-            user_id=request.user_id,
-            prompt=request.story,
-            genre=request.genre,
-            twist=request.twist,
-            refine=request.refine,
-            measure=request.measure,
-            temperature=request.temperature,
-            max_tokens=request.max_tokens,
-        )
+        # Run the complete pipeline; the deadline starts now, so queueing counts against it
+        deadline = Deadline(settings.REQUEST_TIMEOUT)
+        watcher = asyncio.create_task(_cancel_on_disconnect(http_request, deadline))
+        submitted = time.perf_counter()
+        try:
+            result = await run_generation(
+                generate_story_pipeline,
+                user_id=request.user_id,
+                prompt=request.story,
+                genre=request.genre,
+                twist=request.twist,
+                refine=request.refine,
+                measure=request.measure,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                candidates=request.candidates,
+                seed=request.seed,
+                deadline=deadline,
+            )
+        finally:
+            watcher.cancel()
+        
+        # Time spent waiting for an inference worker, outside the pipeline's own timer
+        timings = result.get("timings")
+        if timings and timings.get("total_ms") is not None:
+            queue_ms = max(0.0, (time.perf_counter() - submitted) * 1000 - timings["total_ms"])
+            timings["stages"]["queue_wait"] = round(queue_ms, 1)
+            stage_histograms.observe("queue_wait", queue_ms)
+            http_response.headers["Server-Timing"] = server_timing_header(timings)
         
         # Map to response model
         response = GenerateStoryResponse(
@@ -105,19 +157,112 @@ async def generate_story(request: GenerateStoryRequest) -> GenerateStoryResponse
             refined=result.get("refined", False),
             score=result.get("score"),
             character_focus_required=result.get("character_focus_required", False),
+            cached=result.get("cached", False),
+            deadline_exceeded=result.get("deadline_exceeded", False),
+            timings=timings,
         )
         
         logger.info(f"Story generated successfully for user {request.user_id}")
         return response
     
+    except (HTTPException, InferenceQueueFull):
+        raise
     except ValueError as e:
         logger.error(f"Validation error: {e}")
         raise HTTPException(status_code=400, detail=f"Invalid input: {str(e)}")
+    except GenerationCancelled as e:
+        logger.info(f"Story generation for user {request.user_id} abandoned: {e}")
+        raise HTTPException(status_code=499, detail=str(e))
+    except TimeoutError as e:
+        logger.warning(f"Story generation timed out for user {request.user_id}: {e}")
+        raise HTTPException(status_code=504, detail=f"Story generation timed out: {str(e)}")
     except Exception as e:
         logger.error(f"Story generation failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Story generation failed: {str(e)}")
 
 
+# ============================================================================
+# STREAMING ENDPOINT: Server-Sent Events variant of /generate
+# ============================================================================
+
+def _format_sse(event: str, payload: Dict) -> str:
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@router.post("/generate/stream")
+async def generate_story_streaming(request: GenerateStoryRequest) -> StreamingResponse:
+    """
+    Stream a generated story as Server-Sent Events.
+    
+    Accepts the same body as POST /generate. Events are sent in order:
+    - **metadata**: genre, detected/persisted characters and twist (before generation)
+    - **token**: `{"text": ...}` for each decoded chunk as it is generated
+    - **score**: `{"score": ...}` after generation (when `measure` is true)
+    - **done**: the full generated text and character presence ratio
+    - **error**: `{"detail": ...}` if generation fails mid-stream
+    
+    `refine` is ignored: refinement and character-focus regeneration rewrite
+    text that has already been streamed. Decoding stops at REQUEST_TIMEOUT
+    (`done` then carries `deadline_exceeded: true`) or within one token once
+    the client disconnects.
+    
+    Raises:
+        HTTPException 400: Missing user_id
+        HTTPException 503: Generation queue is full (with Retry-After)
+    """
+    logger.info(f"POST /api/story/generate/stream for user {request.user_id}")
+    if not request.user_id or not request.user_id.strip():
+        logger.warning("Missing user_id")
+        raise HTTPException(status_code=400, detail="user_id is required")
+    
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    deadline = Deadline(settings.REQUEST_TIMEOUT)
+    
+    def produce() -> None:
+        try:
+            for event, payload in generate_story_stream(
+                user_id=request.user_id,
+                prompt=request.story,
+                genre=request.genre,
+                twist=request.twist,
+                measure=request.measure,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                deadline=deadline,
+            ):
+                loop.call_soon_threadsafe(events.put_nowait, (event, payload))
+        except GenerationCancelled:
+            logger.info(f"Streaming generation for user {request.user_id} cancelled: client disconnected")
+        except Exception as e:
+            logger.error(f"Streaming generation failed: {e}", exc_info=True)
+            loop.call_soon_threadsafe(events.put_nowait, ("error", {"detail": str(e)}))
+        finally:
+            loop.call_soon_threadsafe(events.put_nowait, None)
+    
+    # Raises InferenceQueueFull (-> 503) before the response starts
+    submit_generation(produce)
+    
+    async def event_source():
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                event, payload = item
+                yield _format_sse(event, payload)
+        finally:
+            # Closed early when the client disconnects: stop decoding for nobody
+            deadline.cancel()
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ============================================================================
 # LEGACY ENDPOINT: Simple story continuation (backward compatible)
 # ============================================================================
@@ -159,8 +304,10 @@ async def continue_story(request: StoryRequest) -> StoryResponse:
         # Detect genre
         logger.info("Detecting genre...")
         try:
-            detected_genre = get_genre(story, genre)
+            detected_genre = await run_scoring(get_genre, story, genre)
             logger.info(f"Detected genre: {detected_genre}")
+        except InferenceQueueFull:
+            raise
         except Exception as e:
             logger.error(f"Genre detection failed: {e}")
             detected_genre = "general"
@@ -168,8 +315,10 @@ async def continue_story(request: StoryRequest) -> StoryResponse:
         # Extract characters
         logger.info("Extracting characters...")
         try:
-            characters = get_characters(story)
+            characters = await run_ner(get_characters, story)
             logger.info(f"Extracted {len(characters)} characters")
+        except InferenceQueueFull:
+            raise
         except Exception as e:
             logger.error(f"Character extraction failed: {e}")
             characters = []
@@ -177,12 +326,15 @@ async def continue_story(request: StoryRequest) -> StoryResponse:
         # Generate continuation and score with timeout protection
         logger.info("Generating continuation and calculating score...")
         try:
-            continuation, score = continue_story_pipeline(
+            continuation, score = await run_generation(
+                continue_story_pipeline,
                 story,
                 detected_genre,
                 characters,
             )
             logger.info(f"Generated continuation ({len(continuation)} chars), score: {score}")
+        except InferenceQueueFull:
+            raise
         except TimeoutError as e:
             logger.error(f"Generation timeout: {e}")
             raise HTTPException(status_code=504, detail="Story generation timed out. Please try with a shorter prompt.")
@@ -197,7 +349,7 @@ async def continue_story(request: StoryRequest) -> StoryResponse:
             continuation=continuation,
             score=score,
         )
-    except HTTPException:
+    except (HTTPException, InferenceQueueFull):
         raise
     except ValueError as e:
         logger.error(f"Validation error: {e}")
@@ -0,0 +1 @@
+# App-level benchmarks package
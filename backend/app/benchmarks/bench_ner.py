@@ -0,0 +1,125 @@
+"""
+spaCy NER throughput: full pipeline per document vs NER-only batched.
+
+Reports docs/sec for:
+- full: the whole pipeline (tagger, parser, lemmatizer, ...), nlp(text) per doc
+- ner-only: the pipeline NERModel loads, nlp(text) per doc
+- ner-only pipe: the same pipeline over nlp.pipe batches (extract_characters_batch)
+- coalesced: concurrent NERModel.extract_characters calls from request threads
+
+Usage (from backend/):
+    python -m app.benchmarks.bench_ner
+    python -m app.benchmarks.bench_ner --docs 400 --batch-size 64 --threads 8
+    python -m app.benchmarks.bench_ner --stand-in   # untrained pipeline shaped like en_core_web_sm
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import spacy
+from spacy.training import Example
+
+from app.core.config import settings
+from app.models.ner_model import NON_NER_COMPONENTS, NERModel
+
+NAMES = ["Alice", "Bob", "Mayank", "Naitik", "Riya", "Carter", "Elena", "Victor"]
+
+
+def _texts(count: int):
+    return [
+        f"{NAMES[i % 8]} crept down the stairs while {NAMES[(i + 3) % 8]} held the lantern. "
+        f"The storm rattled the windows of the old house, and somewhere below them a door slammed. "
+        f"{NAMES[(i + 5) % 8]} whispered that nobody had lived here for forty years."
+        for i in range(count)
+    ]
+
+
+def _stand_in(path: str) -> None:
+    """Randomly initialised tok2vec + tagger + parser + attribute_ruler + ner (the en_core_web_sm layout)."""
+    listener = {"@architectures": "spacy.Tok2VecListener.v1", "width": 96, "upstream": "*"}
+    nlp = spacy.blank("en")
+    nlp.add_pipe("tok2vec")
+    nlp.add_pipe("tagger", config={"model": {"@architectures": "spacy.Tagger.v2", "tok2vec": listener}})
+    nlp.add_pipe(
+        "parser",
+        config={"model": {
+            "@architectures": "spacy.TransitionBasedParser.v2", "state_type": "parser",
+            "extra_state_tokens": False, "hidden_width": 64, "maxout_pieces": 2, "use_upper": True,
+            "tok2vec": listener,
+        }},
+    )
+    nlp.add_pipe("attribute_ruler")
+    nlp.add_pipe("ner")  # own embedded tok2vec, as in the trained English pipelines
+    doc = nlp.make_doc("Alice met Bob in London .")
+    example = Example.from_dict(doc, {
+        "tags": ["NNP", "VBD", "NNP", "IN", "NNP", "."],
+        "heads": [1, 1, 1, 1, 3, 1],
+        "deps": ["nsubj", "ROOT", "dobj", "prep", "pobj", "punct"],
+        "entities": ["U-PERSON", "O", "U-PERSON", "O", "U-GPE", "O"],
+    })
+    nlp.initialize(lambda: [example])
+    nlp.to_disk(path)
+
+
+def _rate(fn, count: int) -> float:
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def _coalesced(model: NERModel, texts, threads: int) -> None:
+    chunks = [texts[i::threads] for i in range(threads)]
+    workers = [
+        threading.Thread(target=lambda chunk=chunk: [model.extract_characters(t) for t in chunk])
+        for chunk in chunks
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full-pipeline vs NER-only batched spaCy extraction")
+    parser.add_argument("--model", default=settings.SPACY_MODEL, help="spaCy pipeline name or path")
+    parser.add_argument("--stand-in", action="store_true", help="Build an untrained en_core_web_sm-shaped pipeline")
+    parser.add_argument("--docs", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=settings.NER_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=settings.NER_WORKERS, help="Request threads for 'coalesced'")
+    args = parser.parse_args()
+
+    model_path = args.model
+    if args.stand_in:
+        model_path = os.path.join(tempfile.mkdtemp(), "stand_in")
+        _stand_in(model_path)
+    settings.SPACY_MODEL = model_path
+    settings.NER_BATCH_SIZE = args.batch_size
+    texts = _texts(args.docs)
+
+    full = spacy.load(model_path)
+    ner = NERModel()
+    if not ner._load_model():
+        raise SystemExit(f"spaCy pipeline '{model_path}' not available")
+    print(f"full pipeline: {full.pipe_names}")
+    print(f"ner-only:      {ner.nlp.pipe_names} (excluded: {', '.join(NON_NER_COMPONENTS)})")
+    for nlp in (full, ner.nlp):
+        list(nlp.pipe(texts[:20]))  # warm up
+
+    rows = [
+        ("full, per doc", _rate(lambda: [full(t) for t in texts], len(texts))),
+        ("ner-only, per doc", _rate(lambda: [ner.nlp(t) for t in texts], len(texts))),
+        (f"ner-only, pipe (batch {args.batch_size})", _rate(lambda: ner.extract_characters_batch(texts), len(texts))),
+        (f"coalesced ({args.threads} threads)", _rate(lambda: _coalesced(ner, texts, args.threads), len(texts))),
+    ]
+    baseline = rows[0][1]
+    print(f"{'mode':<30} {'docs/sec':>10} {'speedup':>8}")
+    for name, rate in rows:
+        print(f"{name:<30} {rate:>10.1f} {rate / baseline:>7.2f}x")
+    print(f"coalesced batches: {ner.batch_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Circuit breakers for the generation fallback chain.
+
+Each backend (and, for PlotCraft, each genre) gets a breaker. While a breaker
+is closed, calls go through and consecutive failures are counted. Once the
+count reaches the threshold the breaker opens, and callers skip that backend
+with an O(1) check instead of paying for the failure again. Load failures
+(missing or corrupt checkpoint) open it at once, which works as a negative
+cache. After the cooldown a single half-open probe is let through: success
+closes the breaker, failure reopens it for another cooldown.
+
+State per breaker is reported on /health and /ready.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised in place of calling a backend whose breaker is open."""
+
+    def __init__(self, breaker: "CircuitBreaker"):
+        self.retry_after = breaker.retry_in()
+        super().__init__(f"Circuit '{breaker.name}' is open (last error: {breaker.last_error}); retry in {self.retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """
+    Failure counter with cooldown and half-open probes for one backend.
+
+    Args:
+        name: Reported name, e.g. "plotcraft:horror"
+        failure_threshold: Consecutive failures that open the breaker
+        cooldown_seconds: Time open before a half-open probe is allowed
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = max(0.0, cooldown_seconds)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def retry_in(self) -> float:
+        """Seconds until the next half-open probe (0 unless open)."""
+        if self._state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.cooldown_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go to the backend now.
+
+        A True answer after the cooldown makes the caller the half-open probe;
+        it must report back with record_success() or record_failure().
+        """
+        if self._state == CLOSED:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN and now >= self._opened_at + self.cooldown_seconds:
+                self._state = HALF_OPEN
+                self._probe_started = now
+                return True
+            # A probe that never reported back (e.g. its thread died) is replaced after a cooldown
+            if self._state == HALF_OPEN and now >= (self._probe_started or 0.0) + self.cooldown_seconds:
+                self._probe_started = now
+                return True
+            if self._state == CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        if self._state == CLOSED and self._failures == 0:
+            return
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_started = None
+
+    def record_failure(self, error: Any = None, trip: bool = False) -> None:
+        """
+        Count a failed call.
+
+        Args:
+            error: Exception or message, kept for reporting
+            trip: Open the breaker now regardless of the failure count
+        """
+        with self._lock:
+            self._failures += 1
+            if error is not None:
+                self.last_error = str(error)
+            if trip or self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.trips += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._state,
+                "failures": self._failures,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "retry_in_s": round(self.retry_in(), 1),
+                "last_error": self.last_error,
+            }
+
+
+class CircuitBreakers:
+    """Breakers keyed by backend and genre, created on first use."""
+
+    def __init__(self, failure_threshold: int = 3, cooldown_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, backend: str, genre: Optional[str] = None) -> CircuitBreaker:
+        name = f"{backend}:{genre}" if genre else backend
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    name, CircuitBreaker(name, self.failure_threshold, self.cooldown_seconds)
+                )
+        return breaker
+
+    @property
+    def any_open(self) -> bool:
+        return any(breaker.state != CLOSED for breaker in list(self._breakers.values()))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.snapshot() for name, breaker in sorted(self._breakers.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._breakers.clear()
+
+
+breakers = CircuitBreakers(
+    failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    cooldown_seconds=settings.CIRCUIT_BREAKER_COOLDOWN_SECONDS,
+)
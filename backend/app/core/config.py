@@ -17,6 +17,60 @@ class Settings(BaseSettings):
     SPACY_MODEL: str = "en_core_web_sm"
     TEXT_GENERATION_MODEL: str = "distilgpt2"
     MAX_STORY_LENGTH: int = 150
+    PLOTCRAFT_QUANTIZATION: str = "none"  # "none" or "int8" (CPU dynamic quantization)
+    PLOTCRAFT_BACKEND: str = "torch"  # "torch" or "onnx" (ONNX Runtime on exported graphs)
+    PLOTCRAFT_CACHE_MAX_MB: int = 0  # Loaded-model memory budget; 0 = unbounded
+    PLOTCRAFT_CACHE_POLICY: str = "lru"  # "lru" or "lfu" eviction once over budget
+    PLOTCRAFT_PINNED_GENRES: List[str] = []  # Genres never evicted from the model cache
+    PLOTCRAFT_SPECULATIVE: bool = False  # Prompt-lookup speculative decoding instead of batching
+    PLOTCRAFT_COMPILE: bool = False  # torch.compile'd per-request decoding (CPU) instead of batching
+    PLOTCRAFT_COMPILE_BUCKETS: List[int] = [128, 256, 512]  # Padded sequence lengths compiled at startup
+    PLOTCRAFT_WORKER_POOL_ADDRESS: str = ""  # Worker pool socket (path or host:port); empty = serve in-process
+    PLOTCRAFT_WORKER_POOL_AUTHKEY: str = ""  # Secret shared with the worker pool; required with an address
+
+    # Seeded generation result cache (see app/core/result_cache.py)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_ENTRIES: int = 1024  # In-process LRU tier
+    RESULT_CACHE_TTL_SECONDS: int = 86400  # 0 = never expire
+    RESULT_CACHE_DB_PATH: str = ""  # SQLite file for the on-disk tier; empty = memory only
+
+    # Fallback-chain circuit breakers per backend/genre (see app/core/circuit_breaker.py)
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 3  # Consecutive failures before a backend is skipped
+    CIRCUIT_BREAKER_COOLDOWN_SECONDS: float = 30.0  # Time skipped before one probe request is let through
+
+    # Generation prompt token budgets (see app/utils/prompt_builder.py)
+    PROMPT_HEADER_TOKENS: int = 48  # Genre instruction
+    PROMPT_CHARACTER_TOKENS: int = 48  # Character focus line
+    PROMPT_TWIST_TOKENS: int = 64  # Twist directive
+    PROMPT_STORY_TOKENS: int = 224  # Most recent story tokens kept
+    PROMPT_MIN_GENERATION_TOKENS: int = 128  # Context always left free to generate into
+
+    # Long-form generation past the 512-token PlotCraft window (see plotcraft_generator.generate_long_text)
+    ROLLING_CONTEXT_ENABLED: bool = True
+    ROLLING_CONTEXT_TAIL_TOKENS: int = 256  # Story tokens carried into each new chunk
+
+    # Story refinement (see story_service._refine_story)
+    REFINE_WINDOW_TOKENS: int = 200  # Story tokens per refine window (capped to fit the PlotCraft context)
+    REFINE_WINDOW_OVERLAP_TOKENS: int = 40  # Tokens each window repeats from the previous one
+
+    # Character steering (see plotcraft/src/character_bias.py)
+    CHARACTER_BIAS_ENABLED: bool = True  # Bias the first pass toward persisted characters
+    CHARACTER_BIAS_STRENGTH: float = 2.0  # Logit bias on a pending name's first token at the first step
+    CHARACTER_BIAS_DECAY: float = 0.99  # Per-token decay of that bias
+    CHARACTER_MONITOR_ENABLED: bool = True  # Abort a drifting first pass early (see app/core/presence_monitor.py)
+    CHARACTER_MONITOR_CHECKPOINT_TOKENS: int = 96  # Generated tokens before presence is checked
+    CHARACTER_MONITOR_MIN_RATIO: float = 0.25  # Abort and restart below this presence ratio at the checkpoint
+
+    # Startup warmup (see app/core/lifecycle.py and /ready)
+    WARMUP_ON_STARTUP: bool = True
+    PRELOAD_GENRES: List[str] = ["action", "horror", "scifi"]  # PlotCraft genres loaded at startup
+    PRELOAD_TEXT_GENERATOR: bool = True  # Also load the transformers fallback pipeline
+    WARMUP_MAX_TOKENS: int = 8  # Tokens decoded per model to trigger lazy allocations
+
+    # spaCy NER batching (see app/models/ner_model.py)
+    NER_BATCH_SIZE: int = 32  # Texts per nlp.pipe batch
+    NER_BATCH_WAIT_MS: float = 2.0  # Time a batch waits for more concurrent texts before running
+    NER_N_PROCESS: int = 1  # nlp.pipe processes for extract_characters_batch()
 
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:5173"]
@@ -29,6 +83,16 @@ class Settings(BaseSettings):
     REQUEST_TIMEOUT: int = 300  # 5 minutes for ML operations
     KEEP_ALIVE_TIMEOUT: int = 600  # 10 minutes keep-alive
     GENERATION_TIMEOUT: int = 120  # 2 minutes for text generation
+    DISCONNECT_POLL_INTERVAL: float = 0.5  # seconds between client-disconnect checks during /generate
+
+    # Inference executors (workers + bounded queue per workload)
+    GENERATION_WORKERS: int = 4
+    GENERATION_QUEUE_SIZE: int = 16
+    NER_WORKERS: int = 8  # Threads mostly wait on the NER batcher, which runs one batch at a time
+    NER_QUEUE_SIZE: int = 32
+    SCORING_WORKERS: int = 2
+    SCORING_QUEUE_SIZE: int = 32
+    QUEUE_RETRY_AFTER: int = 5  # seconds advertised in 503 Retry-After
 
     class Config:
         env_file = ".env"
@@ -8,6 +8,13 @@ SCORING_WEIGHTS = {
     "creativity": 25,
 }
 
+# Best-of-N candidate ranking: weights of each normalised (0–1) signal
+CANDIDATE_RANK_WEIGHTS = {
+    "characters": 0.5,  # share of session characters mentioned
+    "score": 0.3,  # ScoringService total score / 100
+    "likelihood": 0.2,  # model log-likelihood, min-max scaled across candidates
+}
+
 # Minimal genre examples for TF-IDF + LogisticRegression genre model
 GENRE_TRAINING_DATA = {
     "fantasy": [
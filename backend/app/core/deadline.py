@@ -0,0 +1,96 @@
+"""
+Request deadlines and cancellation for generation work.
+
+A Deadline is created by the route for each generation request and passed down
+the story pipeline. It expires after the request timeout and can be cancelled
+from the event loop when the client disconnects. Deadlines are callable with
+the tokens generated so far, so they plug straight into the PlotCraft decode
+loop as a stop criterion (and into HF generate as a stopping criterion),
+ending a decode within one token step.
+"""
+
+import threading
+import time
+from typing import List, Optional
+
+
+class GenerationCancelled(Exception):
+    """Raised when the client went away and the request's work was abandoned."""
+    pass
+
+
+class Deadline:
+    """
+    Monotonic-clock deadline with a shared cancellation flag.
+
+    Args:
+        timeout: Seconds from now until the deadline; None = no time limit
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.expires_at = time.monotonic() + timeout if timeout is not None else None
+        self._cancelled = threading.Event()
+        self._exceeded = threading.Event()
+
+    def within(self, timeout: Optional[float]) -> "Deadline":
+        """A deadline for one step: the earlier of this one and `timeout` from now, sharing cancellation."""
+        child = Deadline(timeout)
+        if child.expires_at is None or (self.expires_at is not None and self.expires_at < child.expires_at):
+            child.expires_at = self.expires_at
+        child._cancelled = self._cancelled
+        child._exceeded = self._exceeded
+        return child
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    @property
+    def exceeded(self) -> bool:
+        """Whether a decode checking this deadline (or one derived with within()) was cut short by time."""
+        return self._exceeded.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a time limit."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def raise_if_cancelled(self) -> None:
+        """
+        Raise if the request was cancelled (the client is gone).
+
+        Raises:
+            GenerationCancelled: If the request was cancelled
+        """
+        if self.cancelled:
+            raise GenerationCancelled("Client disconnected; generation cancelled")
+
+    def check(self) -> None:
+        """
+        Raise if no further work should start.
+
+        Raises:
+            GenerationCancelled: If the request was cancelled
+            TimeoutError: If the deadline has passed
+        """
+        self.raise_if_cancelled()
+        if self.expired:
+            raise TimeoutError("Request deadline exceeded")
+
+    def __call__(self, generated: Optional[List[int]] = None) -> bool:
+        """Stop-criterion form: True once cancelled or past the deadline."""
+        if self.cancelled:
+            return True
+        if self.expired:
+            self._exceeded.set()
+            return True
+        return False
+
@@ -0,0 +1,153 @@
+"""
+Bounded executors for blocking inference work.
+
+Route handlers are async, but torch, spaCy, TextBlob and sklearn calls are fully
+synchronous. Each workload class (generation, NER, scoring) gets its own thread
+pool with a bounded number of queued + running jobs so one slow generation never
+blocks the event loop, and overload is rejected quickly instead of piling up
+connections.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFull(Exception):
+    """Raised when an inference queue is at capacity; mapped to HTTP 503."""
+
+    def __init__(self, queue_name: str, retry_after: int):
+        super().__init__(f"{queue_name} queue is full. Retry after {retry_after}s.")
+        self.queue_name = queue_name
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a hard cap on accepted (queued + running) jobs.
+
+    Submitting beyond the cap raises InferenceQueueFull immediately rather than
+    waiting for a slot.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, retry_after: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.capacity = self.max_workers + max(0, max_queue)
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"inference-{name}")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                raise InferenceQueueFull(self.name, self.retry_after)
+            self._in_flight += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> "asyncio.Future[Any]":
+        """
+        Schedule a blocking callable on the pool from the running event loop.
+
+        Capacity is checked synchronously, so InferenceQueueFull is raised by
+        this call (before any response has started) rather than when awaited.
+        """
+        self._acquire()
+
+        def _call() -> Any:
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._release()
+
+        loop = asyncio.get_running_loop()
+        try:
+            return loop.run_in_executor(self._pool, _call)
+        except Exception:
+            # Never scheduled (e.g. pool shut down), so free the slot here
+            self._release()
+            raise
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking callable on the pool and await its result."""
+        return await self.submit(fn, *args, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        """Current load for this executor."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "capacity": self.capacity,
+                "in_flight": self._in_flight,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+generation_executor = BoundedExecutor(
+    "generation",
+    max_workers=settings.GENERATION_WORKERS,
+    max_queue=settings.GENERATION_QUEUE_SIZE,
+    retry_after=settings.QUEUE_RETRY_AFTER,
+)
+ner_executor = BoundedExecutor(
+    "ner",
+    max_workers=settings.NER_WORKERS,
+    max_queue=settings.NER_QUEUE_SIZE,
+    retry_after=settings.QUEUE_RETRY_AFTER,
+)
+scoring_executor = BoundedExecutor(
+    "scoring",
+    max_workers=settings.SCORING_WORKERS,
+    max_queue=settings.SCORING_QUEUE_SIZE,
+    retry_after=settings.QUEUE_RETRY_AFTER,
+)
+
+
+async def run_generation(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run story generation work off the event loop."""
+    return await generation_executor.run(fn, *args, **kwargs)
+
+
+def submit_generation(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> "asyncio.Future[Any]":
+    """Schedule long-running generation work (e.g. streaming) without awaiting it."""
+    return generation_executor.submit(fn, *args, **kwargs)
+
+
+async def run_ner(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run NER / character extraction work off the event loop."""
+    return await ner_executor.run(fn, *args, **kwargs)
+
+
+async def run_scoring(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run scoring and classification work off the event loop."""
+    return await scoring_executor.run(fn, *args, **kwargs)
+
+
+def shutdown_executors() -> None:
+    """Stop every inference executor (app shutdown); queued jobs are cancelled."""
+    for executor in (generation_executor, ner_executor, scoring_executor):
+        executor.shutdown()
+
+
+def get_executor_stats() -> Dict[str, Dict[str, int]]:
+    """Load statistics for every inference executor."""
+    return {
+        executor.name: executor.stats()
+        for executor in (generation_executor, ner_executor, scoring_executor)
+    }
+
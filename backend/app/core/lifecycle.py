@@ -0,0 +1,218 @@
+"""
+Startup preloading, warmup and readiness tracking.
+
+Every model in the app loads lazily on first use (spaCy, the genre
+classifier, the transformers pipeline, each PlotCraft genre), so without a
+warmup the first request per component pays seconds of load time. At startup
+the lifespan hook runs each configured component once on a background thread:
+load it, then run one small inference to trigger lazy allocations. /ready
+reports per-component state and timings and only returns 200 once the warmup
+has finished, so an orchestrator routes traffic to warm replicas only; /health
+stays a plain liveness check.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.circuit_breaker import breakers
+from app.core.config import settings
+from app.core.executor import shutdown_executors
+from app.core.plotcraft_pool import plotcraft_pool
+from app.models.genre_model import genre_model
+from app.models.ner_model import ner_model
+from app.models.story_generator import story_generator
+
+# Optional: PlotCraft trained models (backend/plotcraft)
+try:
+    from plotcraft.src import plotcraft_generator
+except ImportError:
+    plotcraft_generator = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TEXT = "Alice and Bob walked into the old house as the storm began."
+
+
+@dataclass
+class ComponentStatus:
+    """Load state of one preloaded component."""
+
+    state: str = "pending"  # pending | loading | warming | ready | failed
+    load_ms: Optional[float] = None
+    warmup_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+class Readiness:
+    """Tracks component warmup; ready once every component has been attempted."""
+
+    def __init__(self):
+        self._components: Dict[str, ComponentStatus] = {}
+        self._lock = threading.Lock()
+        self._started: Optional[float] = None
+        self._elapsed_ms: Optional[float] = None
+        self._finished = False
+
+    def start(self, names: List[str]) -> None:
+        with self._lock:
+            self._components = {name: ComponentStatus() for name in names}
+            self._started = time.perf_counter()
+            self._elapsed_ms = None
+            self._finished = False
+
+    def finish(self) -> None:
+        with self._lock:
+            if self._started is not None:
+                self._elapsed_ms = (time.perf_counter() - self._started) * 1000
+            self._finished = True
+
+    @property
+    def is_ready(self) -> bool:
+        return self._finished
+
+    def run_component(self, name: str, load: Callable[[], Any], warmup: Optional[Callable[[], Any]] = None) -> None:
+        """Load and warm one component, recording timings; failures are recorded, not raised."""
+        status = self._components.setdefault(name, ComponentStatus())
+        try:
+            status.state = "loading"
+            start = time.perf_counter()
+            load()
+            status.load_ms = round((time.perf_counter() - start) * 1000, 1)
+            if warmup is not None:
+                status.state = "warming"
+                start = time.perf_counter()
+                warmup()
+                status.warmup_ms = round((time.perf_counter() - start) * 1000, 1)
+            status.state = "ready"
+            logger.info(f"Warmup: {name} ready (load {status.load_ms} ms, warmup {status.warmup_ms} ms)")
+        except Exception as e:  # noqa: BLE001
+            status.state = "failed"
+            status.error = str(e)
+            logger.warning(f"Warmup: {name} failed: {e}")
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Readiness summary for /ready.
+
+        Returns:
+            Dict with "status" ("warming", "ready", or "degraded" when some
+            component failed or a circuit breaker is open and requests will
+            use its fallback), the total warmup time, each component's state
+            and timings, and the generation circuit breakers.
+        """
+        with self._lock:
+            components = {name: asdict(status) for name, status in self._components.items()}
+            finished = self._finished
+            elapsed_ms = self._elapsed_ms
+        if not finished:
+            status = "warming"
+        elif any(c["state"] == "failed" for c in components.values()) or breakers.any_open:
+            status = "degraded"
+        else:
+            status = "ready"
+        return {
+            "status": status,
+            "warmup_ms": round(elapsed_ms, 1) if elapsed_ms is not None else None,
+            "components": components,
+            "circuit_breakers": breakers.snapshot(),
+        }
+
+
+readiness = Readiness()
+
+
+def _load_spacy() -> None:
+    if not ner_model._load_model():
+        raise RuntimeError(f"spaCy model '{settings.SPACY_MODEL}' unavailable; using regex fallback")
+
+
+def _warm_spacy() -> None:
+    ner_model.extract_characters(WARMUP_TEXT)
+
+
+def _load_genre_model() -> None:
+    if not genre_model._is_trained:
+        genre_model.train()
+
+
+def _warm_genre_model() -> None:
+    genre_model.predict_proba(WARMUP_TEXT)
+
+
+def _load_story_generator() -> None:
+    story_generator._load_model()
+
+
+def _warm_story_generator() -> None:
+    story_generator.generate(WARMUP_TEXT, max_length=settings.WARMUP_MAX_TOKENS)
+
+
+def _plotcraft_component(genre: str) -> Tuple[Callable[[], Any], Callable[[], Any]]:
+    # With a worker pool the genre is loaded by the pool; this checks it is served and warms a worker
+    serving = plotcraft_pool if plotcraft_pool is not None else plotcraft_generator
+
+    def load() -> None:
+        if plotcraft_generator is None:
+            raise RuntimeError("plotcraft package not importable")
+        try:
+            serving.preload(genre)
+        except plotcraft_generator.PlotCraftUnavailable as e:
+            # Requests skip the genre straight away instead of retrying the load
+            breakers.get("plotcraft", genre).record_failure(e, trip=True)
+            raise
+
+    def warm() -> None:
+        # Compiles every shape bucket when PLOTCRAFT_COMPILE is on (no-op otherwise)
+        serving.warmup(genre)
+        serving.generate_text(WARMUP_TEXT, max_tokens=settings.WARMUP_MAX_TOKENS, model_name=genre)
+
+    return load, warm
+
+
+def warmup_components() -> List[Tuple[str, Callable[[], Any], Optional[Callable[[], Any]]]]:
+    """(name, load, warmup) for every component configured for preloading."""
+    components = [
+        ("genre_model", _load_genre_model, _warm_genre_model),
+        ("spacy", _load_spacy, _warm_spacy),
+    ]
+    if settings.PRELOAD_TEXT_GENERATOR:
+        components.append(("story_generator", _load_story_generator, _warm_story_generator))
+    for genre in settings.PRELOAD_GENRES:
+        components.append((f"plotcraft:{genre}", *_plotcraft_component(genre)))
+    return components
+
+
+def run_warmup() -> None:
+    """Preload and warm every configured component, then mark the app ready."""
+    components = warmup_components()
+    readiness.start([name for name, _, _ in components])
+    logger.info(f"Warmup started: {', '.join(name for name, _, _ in components)}")
+    try:
+        for name, load, warmup in components:
+            readiness.run_component(name, load, warmup)
+    finally:
+        readiness.finish()
+    logger.info(f"Warmup finished: {readiness.report()['status']}")
+
+
+def start_warmup() -> Optional[threading.Thread]:
+    """Run the warmup on a background thread (or mark ready at once if disabled)."""
+    if not settings.WARMUP_ON_STARTUP:
+        readiness.start([])
+        readiness.finish()
+        return None
+    thread = threading.Thread(target=run_warmup, name="plotcraft-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def shutdown() -> None:
+    """Release inference threads and loaded PlotCraft models on app shutdown."""
+    shutdown_executors()
+    if plotcraft_pool is not None:
+        plotcraft_pool.close()
+    if plotcraft_generator is not None:
+        plotcraft_generator.clear_cache()
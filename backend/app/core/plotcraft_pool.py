@@ -0,0 +1,41 @@
+"""
+Optional connection to a PlotCraft worker pool.
+
+With PLOTCRAFT_WORKER_POOL_ADDRESS set, this API process does not load
+PlotCraft models itself. Generation and tokenizer calls go over a local socket
+to a worker pool supervisor (plotcraft/src/worker_pool.py), whose worker
+processes share one copy of each genre's weights. Several uvicorn workers can
+then share one pool instead of each holding every genre model.
+PLOTCRAFT_WORKER_POOL_AUTHKEY must be set to the pool's secret; the client
+refuses to connect without one.
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+# Optional: PlotCraft package (backend/plotcraft)
+try:
+    from plotcraft.src.worker_pool import WorkerPoolClient
+except ImportError:
+    WorkerPoolClient = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+plotcraft_pool = (
+    WorkerPoolClient(settings.PLOTCRAFT_WORKER_POOL_ADDRESS, settings.PLOTCRAFT_WORKER_POOL_AUTHKEY)
+    if settings.PLOTCRAFT_WORKER_POOL_ADDRESS and WorkerPoolClient is not None
+    else None
+)
+
+
+def pool_stats() -> Optional[Dict[str, Any]]:
+    """Worker pool load for /health; None when PlotCraft is served in-process."""
+    if plotcraft_pool is None:
+        return None
+    try:
+        return plotcraft_pool.stats()
+    except Exception as e:  # noqa: BLE001
+        logger.warning(f"PlotCraft worker pool stats unavailable: {e}")
+        return {"address": settings.PLOTCRAFT_WORKER_POOL_ADDRESS, "error": str(e)}
@@ -0,0 +1,56 @@
+"""
+Online character-presence monitor for generation.
+
+The story pipeline checks which persisted characters appear in a continuation
+only after it has been fully decoded, and regenerates it with a focus prompt
+when too few do. A PresenceMonitor runs during decoding instead: it is a stop
+criterion (like Deadline) that, once `checkpoint_tokens` have been generated,
+decodes the text so far and measures character presence. Below `min_ratio`
+it aborts the decode, so only the partial budget is spent before the
+character-focused restart.
+"""
+
+from typing import Callable, List, Optional
+
+
+class PresenceMonitor:
+    """
+    Stop criterion that aborts a decode which has drifted away from the characters.
+
+    Args:
+        presence: Presence ratio (0-1) of the characters in a text
+        checkpoint_tokens: Generated tokens after which presence is checked (once)
+        min_ratio: Abort when presence at the checkpoint is below this
+    """
+
+    def __init__(self, presence: Callable[[str], float], checkpoint_tokens: int, min_ratio: float):
+        self.presence = presence
+        self.checkpoint_tokens = max(1, checkpoint_tokens)
+        self.min_ratio = min_ratio
+        self._decode: Optional[Callable[[List[int]], str]] = None
+        self.checked = False
+        self.aborted = False
+        self.ratio: Optional[float] = None
+        self.tokens_at_abort = 0
+
+    def bind(self, decode: Callable[[List[int]], str]) -> "PresenceMonitor":
+        """Attach the serving backend's token decoder and reset for a new decode."""
+        self._decode = decode
+        self.checked = False
+        self.aborted = False
+        self.ratio = None
+        self.tokens_at_abort = 0
+        return self
+
+    def __call__(self, generated: Optional[List[int]] = None) -> bool:
+        """Stop-criterion form: True once the decode has been found to drift."""
+        if self.aborted:
+            return True
+        if self.checked or self._decode is None or generated is None or len(generated) < self.checkpoint_tokens:
+            return False
+        self.checked = True
+        self.ratio = self.presence(self._decode(generated))
+        if self.ratio < self.min_ratio:
+            self.aborted = True
+            self.tokens_at_abort = len(generated)
+        return self.aborted
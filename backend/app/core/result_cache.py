@@ -0,0 +1,194 @@
+"""
+Exact-match cache for seeded generation results.
+
+A seeded generation is a pure function of the model version, genre, final
+prompt (after character and twist enrichment), sampling parameters and seed, so
+its result can be stored under a hash of those inputs and replayed for any
+identical request. Entries live in an in-process LRU tier and, optionally, in a
+SQLite file shared by workers and kept across restarts; both honour a TTL.
+Unseeded requests are never cached.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Expired rows are purged from disk every this many stores
+_PURGE_EVERY = 256
+
+
+class ResultCache:
+    """
+    Two-tier (memory LRU + optional SQLite) cache of JSON-serializable results.
+
+    Args:
+        max_entries: In-memory LRU capacity; 0 disables the memory tier
+        ttl_seconds: Entry lifetime; 0 = never expire
+        db_path: SQLite file for the disk tier, or None for memory only
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 0, db_path: Optional[str] = None):
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self.db_path = db_path or None
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._stores = 0
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        if self.db_path:
+            self._open_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._db is not None
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        """Content address for a request: SHA-256 of its canonical JSON form."""
+        canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached result for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at and expires_at <= now:
+                    del self._entries[key]
+                    self._expired += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self._memory_hits += 1
+                    return dict(value)
+
+            row = self._db_get(key)
+            if row is not None:
+                expires_at, value = row
+                if expires_at and expires_at <= now:
+                    self._db_delete(key)
+                    self._expired += 1
+                else:
+                    self._remember(key, expires_at, value)
+                    self._disk_hits += 1
+                    return dict(value)
+
+            self._misses += 1
+            return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a result in every enabled tier."""
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else 0.0
+        value = dict(value)
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._stores += 1
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), expires_at),
+                    )
+                    if self._stores % _PURGE_EVERY == 0:
+                        self._db.execute(
+                            "DELETE FROM results WHERE expires_at > 0 AND expires_at <= ?", (time.time(),)
+                        )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Result cache disk write failed: {e}")
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM results")
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Result cache disk clear failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry counts, configuration and hit/miss counters."""
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            lookups = hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk": self.db_path,
+                "hits": hits,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "stores": self._stores,
+                "expired": self._expired,
+                "evictions": self._evictions,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals (callers hold self._lock)
+    # ------------------------------------------------------------------
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]) -> None:
+        if self.max_entries == 0:
+            return
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _open_db(self) -> None:
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache disk tier unavailable ({self.db_path}): {e}")
+            self._db = None
+
+    def _db_get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute("SELECT expires_at, value FROM results WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache disk read failed: {e}")
+            return None
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _db_delete(self, key: str) -> None:
+        try:
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache disk delete failed: {e}")
+
+
+result_cache = ResultCache(
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES if settings.RESULT_CACHE_ENABLED else 0,
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    db_path=settings.RESULT_CACHE_DB_PATH if settings.RESULT_CACHE_ENABLED else None,
+)
@@ -0,0 +1,180 @@
+"""
+Per-stage latency tracking for the story pipeline.
+
+A StageTimer is activated for the duration of one pipeline call; code anywhere
+below it (including helpers shared with the streaming pipeline) wraps work in
+`stage("name")` and reports model calls with `record_generation()`. Both are
+no-ops when no timer is active. All durations use time.perf_counter, a
+monotonic clock.
+
+Finished stages are also folded into in-process histograms (`stage_histograms`)
+so /health can report per-stage p50/p95/p99 across requests, plus tokens/sec
+per generation backend.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is open-ended)
+BUCKETS_MS: Tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class LatencyHistograms:
+    """Fixed-bucket latency histograms per stage plus token throughput per backend."""
+
+    def __init__(self, buckets_ms: Tuple[float, ...] = BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._backends: Dict[str, Dict[str, float]] = {}
+
+    def observe(self, stage: str, ms: float) -> None:
+        with self._lock:
+            hist = self._stages.setdefault(
+                stage, {"count": 0, "sum_ms": 0.0, "counts": [0] * (len(self.buckets_ms) + 1)}
+            )
+            hist["count"] += 1
+            hist["sum_ms"] += ms
+            hist["counts"][bisect.bisect_left(self.buckets_ms, ms)] += 1
+
+    def observe_generation(self, backend: str, new_tokens: int, seconds: float) -> None:
+        with self._lock:
+            totals = self._backends.setdefault(backend, {"calls": 0, "tokens": 0, "seconds": 0.0})
+            totals["calls"] += 1
+            totals["tokens"] += new_tokens
+            totals["seconds"] += seconds
+
+    def _quantile(self, counts: List[int], total: int, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None if it is the open-ended bucket)."""
+        target = q * total
+        cumulative = 0
+        for idx, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= target:
+                return self.buckets_ms[idx] if idx < len(self.buckets_ms) else None
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-stage count / mean / bucketed p50-p95-p99 and per-backend tokens/sec."""
+        with self._lock:
+            stages = {}
+            for name, hist in self._stages.items():
+                count = hist["count"]
+                stages[name] = {
+                    "count": count,
+                    "mean_ms": round(hist["sum_ms"] / count, 1),
+                    "p50_ms": self._quantile(hist["counts"], count, 0.50),
+                    "p95_ms": self._quantile(hist["counts"], count, 0.95),
+                    "p99_ms": self._quantile(hist["counts"], count, 0.99),
+                }
+            backends = {
+                name: {
+                    "calls": int(t["calls"]),
+                    "tokens": int(t["tokens"]),
+                    "tokens_per_sec": round(t["tokens"] / t["seconds"], 1) if t["seconds"] else 0.0,
+                }
+                for name, t in self._backends.items()
+            }
+        return {"stages": stages, "generation_backends": backends}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._backends.clear()
+
+
+stage_histograms = LatencyHistograms()
+
+_current: "ContextVar[Optional[StageTimer]]" = ContextVar("plotcraft_stage_timer", default=None)
+
+
+class StageTimer:
+    """Stage durations and generation calls for one pipeline run."""
+
+    def __init__(self, histograms: Optional[LatencyHistograms] = None):
+        self.histograms = histograms if histograms is not None else stage_histograms
+        self.stages: Dict[str, float] = {}
+        self.generations: List[Dict[str, Any]] = []
+        self._open: List[str] = []
+        self._started: Optional[float] = None
+        self._total_ms: Optional[float] = None
+
+    @contextmanager
+    def activate(self) -> Iterator["StageTimer"]:
+        """Make this the current timer; records the "total" stage on exit."""
+        token = _current.set(self)
+        self._started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+            self._total_ms = (time.perf_counter() - self._started) * 1000
+            self.histograms.observe("total", self._total_ms)
+
+    def add_stage(self, name: str, ms: float) -> None:
+        # A stage entered more than once (e.g. generation retried) accumulates
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+        self.histograms.observe(name, ms)
+
+    def add_generation(self, backend: str, new_tokens: int, seconds: float, prompt_tokens: Optional[int] = None) -> None:
+        self.generations.append({
+            "stage": self._open[-1] if self._open else None,
+            "backend": backend,
+            "prompt_tokens": prompt_tokens,
+            "new_tokens": new_tokens,
+            "ms": round(seconds * 1000, 1),
+            "tokens_per_sec": round(new_tokens / seconds, 1) if seconds > 0 else None,
+        })
+        self.histograms.observe_generation(backend, new_tokens, seconds)
+
+    def report(self) -> Dict[str, Any]:
+        """Timings block: total and per-stage milliseconds plus generation calls."""
+        total_ms = self._total_ms
+        if total_ms is None and self._started is not None:
+            total_ms = (time.perf_counter() - self._started) * 1000
+        return {
+            "total_ms": round(total_ms, 1) if total_ms is not None else None,
+            "stages": {name: round(ms, 1) for name, ms in self.stages.items()},
+            "generations": list(self.generations),
+        }
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as pipeline stage `name` on the current timer (no-op without one)."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    timer._open.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer._open.pop()
+        timer.add_stage(name, (time.perf_counter() - start) * 1000)
+
+
+def record_generation(backend: str, new_tokens: int, seconds: float, prompt_tokens: Optional[int] = None) -> None:
+    """Attach a model call (serving backend, token counts, duration) to the current timer."""
+    timer = _current.get()
+    if timer is not None:
+        timer.add_generation(backend, new_tokens, seconds, prompt_tokens)
+
+
+def generation_backends() -> List[str]:
+    """Backends that served the model calls recorded on the current timer so far (empty without one)."""
+    timer = _current.get()
+    return [call["backend"] for call in timer.generations] if timer is not None else []
+
+
+def server_timing_header(timings: Dict[str, Any]) -> str:
+    """Format a timings block as a Server-Timing header value."""
+    entries = [f"{name};dur={ms}" for name, ms in timings.get("stages", {}).items()]
+    if timings.get("total_ms") is not None:
+        entries.append(f"total;dur={timings['total_ms']}")
+    return ", ".join(entries)
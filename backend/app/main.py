@@ -5,20 +5,41 @@ Mounts all API routers and middleware. Use run.py to start the server.
 """
 
 import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from app.core.character_focus import character_focus_stats
+from app.core.circuit_breaker import breakers
 from app.core.config import settings
+from app.core.executor import InferenceQueueFull, get_executor_stats
+from app.core.lifecycle import readiness, shutdown, start_warmup
+from app.core.plotcraft_pool import pool_stats
+from app.core.result_cache import result_cache
+from app.core.timing import stage_histograms
+from app.models.ner_model import ner_model
 from app.api import routes_story, routes_score, routes_genre
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Preload and warm models in the background at startup; release them on shutdown."""
+    start_warmup()
+    yield
+    shutdown()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="AI-powered story generation and analysis API",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -38,16 +59,42 @@ app.include_router(routes_genre.router, prefix=settings.API_V1_PREFIX)
 app.include_router(routes_score.router, prefix=settings.API_V1_PREFIX)
 
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all requests and handle connection errors gracefully."""
-    try:
-        logger.info(f"{request.method} {request.url.path}")
-        response = await call_next(request)
-        return response
-    except Exception as e:
-        logger.error(f"Request failed: {request.method} {request.url.path} - {str(e)}", exc_info=True)
-        raise
+class RequestLoggingMiddleware:
+    """
+    Log all requests and handle connection errors gracefully.
+
+    Plain ASGI rather than @app.middleware("http"): BaseHTTPMiddleware hides
+    http.disconnect from the routes, which need it to cancel generation when
+    the client goes away.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        try:
+            logger.info(f"{scope['method']} {scope['path']}")
+            await self.app(scope, receive, send)
+        except Exception as e:
+            logger.error(f"Request failed: {scope['method']} {scope['path']} - {str(e)}", exc_info=True)
+            raise
+
+
+app.add_middleware(RequestLoggingMiddleware)
+
+
+@app.exception_handler(InferenceQueueFull)
+async def inference_queue_full_handler(request: Request, exc: InferenceQueueFull):
+    """Reject overload fast with 503 + Retry-After instead of queueing connections."""
+    logger.warning(f"Rejected {request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 @app.get("/")
@@ -61,6 +108,31 @@ async def root():
 
 
 @app.get("/health")
-async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy", "service": settings.PROJECT_NAME}
+def health_check():
+    """
+    Health check endpoint (liveness; see /ready for model warmup).
+
+    A plain def, so FastAPI runs it in its threadpool: asking the worker pool
+    for its stats is a blocking socket call that must not stall the event loop.
+    """
+    return {
+        "status": "healthy",
+        "service": settings.PROJECT_NAME,
+        "ready": readiness.is_ready,
+        "executors": get_executor_stats(),
+        "result_cache": result_cache.stats(),
+        "latency": stage_histograms.snapshot(),
+        "circuit_breakers": breakers.snapshot(),
+        "character_focus": character_focus_stats.snapshot(),
+        "worker_pool": pool_stats(),
+        "ner_batching": ner_model.batch_stats(),
+    }
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until startup warmup finishes, then per-component load state and timings."""
+    return JSONResponse(
+        status_code=200 if readiness.is_ready else 503,
+        content=readiness.report(),
+    )
@@ -4,11 +4,21 @@ Named Entity Recognition model for character extraction.
 Provides dual strategies for character extraction:
 1. Primary: spaCy NER (PERSON label) - high accuracy
 2. Fallback: Regex-based detection - graceful degradation when spaCy unavailable
+
+The spaCy pipeline is loaded with only the components entity recognition
+needs (no tagger, parser or lemmatizer). Single-text calls from concurrent
+request threads are coalesced by one batcher thread into nlp.pipe batches;
+extract_characters_batch() hands its whole list to the same thread, as one
+nlp.pipe run with the caller's batch_size/n_process when those are given.
 """
 
 import re
 import logging
-from typing import List, Set
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Set
 
 try:
     import spacy
@@ -20,6 +30,104 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Pipeline components entity extraction never uses; not loaded at all
+NON_NER_COMPONENTS = ("tagger", "morphologizer", "parser", "senter", "attribute_ruler", "lemmatizer")
+
+
+class _DocBatcher:
+    """
+    Coalesces nlp() calls from many threads into nlp.pipe batches.
+
+    One thread owns the pipeline (spaCy pipelines are not meant to be shared
+    across threads). It takes whatever texts are queued, waits up to
+    `max_wait` for more while the batch is below `batch_size`, and resolves
+    each caller's future with its Doc. A job submitted with its own
+    batch_size or n_process is never coalesced: it runs as one nlp.pipe call
+    with those options, still on the owner thread.
+    """
+
+    def __init__(self, nlp, batch_size: int, max_wait: float):
+        self.nlp = nlp
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._pending: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # Job taken off the queue while coalescing that must run on its own
+        self._held: Optional[tuple] = None
+        self._batches = 0
+        self._docs = 0
+
+    def submit(self, texts: List[str], batch_size: Optional[int] = None, n_process: int = 1) -> Future:
+        """
+        Queue texts for parsing; the future resolves to their Docs, in order.
+
+        With batch_size or n_process > 1 the texts run as their own nlp.pipe
+        call with those options instead of being coalesced with other callers.
+        """
+        future: Future = Future()
+        self._ensure_thread()
+        self._pending.put((texts, future, batch_size, n_process))
+        return future
+
+    @staticmethod
+    def _is_explicit(item: tuple) -> bool:
+        return item[2] is not None or item[3] > 1
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ner-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> List[tuple]:
+        first, self._held = self._held or self._pending.get(), None
+        items = [first]
+        if self._is_explicit(first):
+            return items
+        # One deadline for the whole batch: a trickle of arrivals cannot hold the first caller longer
+        deadline = time.monotonic() + self.max_wait
+        size = len(first[0])
+        while size < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._pending.get(timeout=remaining) if remaining > 0 else self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_explicit(item):
+                self._held = item
+                break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    def _run(self) -> None:
+        while True:
+            items = self._collect()
+            texts = [text for item in items for text in item[0]]
+            _, _, batch_size, n_process = items[0]
+            try:
+                docs = list(self.nlp.pipe(texts, batch_size=batch_size or self.batch_size, n_process=n_process))
+            except Exception as e:  # noqa: BLE001
+                for item in items:
+                    item[1].set_exception(e)
+                continue
+            with self._lock:
+                self._batches += 1
+                self._docs += len(docs)
+            start = 0
+            for item_texts, future, _, _ in items:
+                future.set_result(docs[start : start + len(item_texts)])
+                start += len(item_texts)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "docs": self._docs,
+                "mean_batch_size": round(self._docs / self._batches, 2) if self._batches else 0.0,
+            }
+
 
 class NERModel:
     """
@@ -33,6 +141,8 @@ class NERModel:
         self.nlp = None
         self._is_loaded = False
         self._spacy_failed = False
+        self._batcher: Optional[_DocBatcher] = None
+        self._load_lock = threading.Lock()
     
     def _load_model(self) -> bool:
         """
@@ -43,7 +153,14 @@ class NERModel:
         """
         if self._is_loaded:
             return True
-        
+        with self._load_lock:
+            return self._load_model_locked()
+
+    def _load_model_locked(self) -> bool:
+        """Load under _load_lock, so concurrent first calls share one pipeline and batcher."""
+        if self._is_loaded:
+            return True
+
         if self._spacy_failed:
             return False
         
@@ -54,9 +171,13 @@ class NERModel:
         
         try:
             logger.info(f"Loading spaCy model: {settings.SPACY_MODEL}")
-            self.nlp = spacy.load(settings.SPACY_MODEL)
+            self.nlp = spacy.load(settings.SPACY_MODEL, exclude=list(NON_NER_COMPONENTS))
+            # The shared tok2vec only feeds the excluded components unless NER listens to it
+            if "tok2vec" in self.nlp.pipe_names and not self.nlp.get_pipe("tok2vec").listening_components:
+                self.nlp.remove_pipe("tok2vec")
+            self._batcher = _DocBatcher(self.nlp, settings.NER_BATCH_SIZE, settings.NER_BATCH_WAIT_MS / 1000)
             self._is_loaded = True
-            logger.info("spaCy model loaded successfully")
+            logger.info(f"spaCy model loaded successfully (components: {', '.join(self.nlp.pipe_names)})")
             return True
         except OSError as e:
             logger.warning(
@@ -338,39 +459,8 @@ class NERModel:
         # Try spaCy first, but supplement with explicit/regex patterns for robustness
         if self._load_model():
             try:
-                doc = self.nlp(text)
-                names = [
-                    ent.text for ent in doc.ents 
-                    if ent.label_ == "PERSON"
-                ]
-                
-                # Remove duplicates while preserving order
-                seen: Set[str] = set()
-                unique_names = []
-                for name in names:
-                    norm = self._normalize_name(name)
-                    if norm.lower() not in seen:
-                        seen.add(norm.lower())
-                        unique_names.append(norm)
-                        if len(unique_names) >= max_chars:
-                            break
-                
-                # If spaCy misses (often with lowercase names), enrich with explicit introductions + regex
-                if len(unique_names) < max_chars:
-                    explicit = self._extract_explicit_name_introductions(text, max_chars=max_chars)
-                    group_lists = self._extract_name_lists_after_group_nouns(text, max_chars=max_chars)
-                    regex = self._extract_characters_regex(text, max_chars=max_chars)
-                    for candidate in (explicit + group_lists + regex):
-                        cand = self._normalize_name(candidate)
-                        if cand.lower() in seen:
-                            continue
-                        seen.add(cand.lower())
-                        unique_names.append(cand)
-                        if len(unique_names) >= max_chars:
-                            break
-
-                logger.debug(f"spaCy extracted {len(unique_names)} characters (enriched): {unique_names}")
-                return unique_names
+                doc = self._parse([text])[0]
+                return self._characters_from_doc(doc, text, max_chars)
             except Exception as e:
                 logger.error(f"spaCy extraction failed: {e}. Falling back to regex.")
                 self._spacy_failed = True
@@ -378,6 +468,106 @@ class NERModel:
         # Fallback to regex
         logger.info("Using regex fallback for character extraction")
         return self._extract_characters_regex(text, max_chars)
+
+    def extract_characters_batch(
+        self,
+        texts: List[str],
+        max_chars: int = 5,
+        batch_size: Optional[int] = None,
+        n_process: Optional[int] = None,
+    ) -> List[List[str]]:
+        """
+        Extract character names from many texts with one nlp.pipe pass.
+
+        Gives the same names per text as extract_characters().
+
+        Args:
+            texts: Input story texts
+            max_chars: Maximum number of characters per text (default: 5)
+            batch_size: Texts per nlp.pipe batch. When given (or with n_process
+                above 1) the texts run as one nlp.pipe call of their own;
+                otherwise they are coalesced with concurrent callers in
+                batches of NER_BATCH_SIZE.
+            n_process: Processes for nlp.pipe (default: NER_N_PROCESS). Above 1,
+                every call starts its own worker processes, so this only pays
+                off for large batches.
+
+        Returns:
+            One list of character names per input text ([] for empty texts)
+        """
+        results: List[List[str]] = [[] for _ in texts]
+        indices = [i for i, text in enumerate(texts) if text and text.strip()]
+        if not indices:
+            return results
+
+        if self._load_model():
+            try:
+                docs = self._parse(
+                    [texts[i] for i in indices],
+                    batch_size=batch_size,
+                    n_process=n_process or settings.NER_N_PROCESS,
+                )
+                for i, doc in zip(indices, docs):
+                    results[i] = self._characters_from_doc(doc, texts[i], max_chars)
+                return results
+            except Exception as e:
+                logger.error(f"spaCy batch extraction failed: {e}. Falling back to regex.")
+                self._spacy_failed = True
+
+        logger.info("Using regex fallback for character extraction")
+        for i in indices:
+            results[i] = self._extract_characters_regex(texts[i], max_chars)
+        return results
+
+    def _parse(self, texts: List[str], batch_size: Optional[int] = None, n_process: int = 1) -> List[Any]:
+        """
+        Docs for texts (model loaded).
+
+        Always parsed on the batcher thread that owns the pipeline. Without
+        batch_size or n_process the texts are coalesced with concurrent callers.
+        """
+        return self._batcher.submit(texts, batch_size=batch_size, n_process=n_process).result()
+
+    def _characters_from_doc(self, doc, text: str, max_chars: int) -> List[str]:
+        """PERSON entities of a parsed text, enriched with explicit/regex patterns."""
+        names = [
+            ent.text for ent in doc.ents 
+            if ent.label_ == "PERSON"
+        ]
+        
+        # Remove duplicates while preserving order
+        seen: Set[str] = set()
+        unique_names = []
+        for name in names:
+            norm = self._normalize_name(name)
+            if norm.lower() not in seen:
+                seen.add(norm.lower())
+                unique_names.append(norm)
+                if len(unique_names) >= max_chars:
+                    break
+        
+        # If spaCy misses (often with lowercase names), enrich with explicit introductions + regex
+        if len(unique_names) < max_chars:
+            explicit = self._extract_explicit_name_introductions(text, max_chars=max_chars)
+            group_lists = self._extract_name_lists_after_group_nouns(text, max_chars=max_chars)
+            regex = self._extract_characters_regex(text, max_chars=max_chars)
+            for candidate in (explicit + group_lists + regex):
+                cand = self._normalize_name(candidate)
+                if cand.lower() in seen:
+                    continue
+                seen.add(cand.lower())
+                unique_names.append(cand)
+                if len(unique_names) >= max_chars:
+                    break
+
+        logger.debug(f"spaCy extracted {len(unique_names)} characters (enriched): {unique_names}")
+        return unique_names
+
+    def batch_stats(self) -> Dict[str, Any]:
+        """Coalesced nlp.pipe batches so far (reported on /health)."""
+        if self._batcher is None:
+            return {"batches": 0, "docs": 0, "mean_batch_size": 0.0}
+        return self._batcher.stats()
     
     def extract_entities(self, text: str) -> dict[str, List[str]]:
         """
@@ -399,7 +589,7 @@ class NERModel:
             return {}
         
         try:
-            doc = self.nlp(text)
+            doc = self._parse([text])[0]
             entities = {}
             
             for ent in doc.ents:
@@ -1,11 +1,112 @@
 """Story generation model."""
 
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Set
 
-from transformers import pipeline
+from transformers import (
+    DynamicCache,
+    LogitsProcessor,
+    LogitsProcessorList,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TemperatureLogitsWarper,
+    TextIteratorStreamer,
+    TopKLogitsWarper,
+    TopPLogitsWarper,
+    pipeline,
+)
 
 from app.core.config import settings
 
+# Shared-prefix KV cache and character logit bias (plotcraft package); optional like the PlotCraft models
+try:
+    import torch
+    from plotcraft.src.character_bias import CharacterBias
+    from plotcraft.src.decoding import cache_tensors
+    from plotcraft.src.prefix_cache import PrefixCache
+except ImportError:
+    torch = None  # type: ignore
+    CharacterBias = None  # type: ignore
+    cache_tensors = None  # type: ignore
+    PrefixCache = None  # type: ignore
+
+# Sampling pool size of every transformers generation
+TOP_K = 50
+
+
+class _StopWhen(StoppingCriteria):
+    """
+    Stopping criterion that ends every row once `stop(generated)` returns True (e.g. a request deadline).
+
+    `generated` is the first row's new token ids; the prompt length is taken
+    from the first call, so one instance serves a single generate() call.
+    """
+
+    def __init__(self, stop: Callable[[List[int]], bool]):
+        self.stop = stop
+        self._prompt_len: Optional[int] = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self._prompt_len is None:
+            # Called once per sampled token, after it is appended
+            self._prompt_len = input_ids.shape[1] - 1
+        generated = input_ids[0, self._prompt_len :].tolist()
+        return torch.full((input_ids.shape[0],), bool(self.stop(generated)), dtype=torch.bool, device=input_ids.device)
+
+
+class _CharacterBiasProcessor(LogitsProcessor):
+    """
+    Steer every row toward character names it has not generated yet (see plotcraft character_bias.py).
+
+    The prompt length is taken from the first call, so one instance serves a
+    single generate() call.
+    """
+
+    def __init__(self, bias: "CharacterBias"):
+        self.bias = bias
+        self._prompt_len: Optional[int] = None
+        self._pending: List[Set[int]] = []
+
+    def __call__(self, input_ids, scores):
+        if self._prompt_len is None:
+            self._prompt_len = input_ids.shape[1]
+            self._pending = [set(range(len(self.bias.names))) for _ in range(input_ids.shape[0])]
+        for row, pending in enumerate(self._pending):
+            generated = input_ids[row, self._prompt_len :].tolist()
+            if generated and pending:
+                pending -= self.bias.completed(generated, pending)
+            for token_id, value in self.bias.biases(generated, pending).items():
+                scores[row, token_id] += value
+        return scores
+
+
+class _SeededSampler(LogitsProcessor):
+    """
+    Draw every row's next token from a private generator, leaving only that token selectable.
+
+    HF sampling draws from torch's global RNG, which concurrent unseeded
+    generations advance too. This processor runs last, applies temperature,
+    top-k and top-p itself and samples with its own torch.Generator. Every
+    other logit is set to -inf, so HF's own draw can only pick the same
+    token and seeded output does not depend on other traffic. One instance
+    serves a single generate() call.
+    """
+
+    def __init__(self, seed: int, temperature: float, top_k: int, top_p: float):
+        self.seed = seed
+        self.warpers = LogitsProcessorList(
+            [TemperatureLogitsWarper(temperature), TopKLogitsWarper(top_k), TopPLogitsWarper(top_p)]
+        )
+        self._generator: Optional["torch.Generator"] = None
+
+    def __call__(self, input_ids, scores):
+        if self._generator is None:
+            self._generator = torch.Generator(device=scores.device).manual_seed(self.seed)
+        probs = self.warpers(input_ids, scores.float()).softmax(dim=-1)
+        tokens = torch.multinomial(probs, num_samples=1, generator=self._generator)
+        return torch.full_like(scores, -float("inf")).scatter_(1, tokens, 0.0)
+
 
 class StoryGenerator:
     """
@@ -16,9 +117,18 @@ class StoryGenerator:
     avoids the kind of copy–pasted repetition you were seeing.
     """
 
+    PROMPT_HEADER = (
+        "You are a professional novelist. Continue the following story in a vivid, "
+        "emotionally rich, coherent way with strong sensory detail and forward-moving plot.\n\n"
+        "Story:\n"
+    )
+
     def __init__(self):
         self.generator: Optional[pipeline] = None
         self._is_loaded = False
+        self._prefix_cache = PrefixCache() if PrefixCache is not None else None
+        # Held while generate_batch() has the shared tokenizer left-padded
+        self._padding_lock = threading.Lock()
 
     def _load_model(self) -> None:
         """Lazy load the generation model."""
@@ -73,6 +183,72 @@ class StoryGenerator:
 
         return "\n".join(cleaned).strip()
 
+    @staticmethod
+    def _build_prompt(text: str) -> str:
+        """
+        Wrap the user prompt in a stronger instruction so the model
+        behaves like a professional novelist. We keep this here so
+        the external API does not change.
+        """
+        return f"{StoryGenerator.PROMPT_HEADER}{text}\n\n"
+
+    def _prefix_past(self, full_prompt: str, prompt_prefix: Optional[str]) -> Optional["DynamicCache"]:
+        """
+        Cached past_key_values for the static start of a prompt.
+
+        The static part is the novelist header plus the caller's template
+        prefix. Only tokens shared with the full prompt's own encoding are
+        reused, so generation sees exactly the same input ids.
+        """
+        if self._prefix_cache is None:
+            return None
+        model = self.generator.model
+        tokenizer = self.generator.tokenizer
+
+        def _compute(prefix_ids):
+            with torch.no_grad():
+                out = model(input_ids=torch.tensor([prefix_ids], device=model.device), use_cache=True)
+            return cache_tensors(out.past_key_values)
+
+        model_key = (settings.TEXT_GENERATION_MODEL, getattr(model.config, "_commit_hash", None), len(tokenizer))
+        layers = self._prefix_cache.lookup(
+            model_key,
+            tokenizer(full_prompt)["input_ids"],
+            tokenizer(self.PROMPT_HEADER + (prompt_prefix or ""))["input_ids"],
+            _compute,
+        )
+        if layers is None:
+            return None
+        # DynamicCache appends by concatenation, so the cached tensors are never written to
+        past = DynamicCache()
+        for idx, (k, v) in enumerate(layers):
+            past.update(k, v, idx)
+        return past
+
+    def _character_processors(self, characters: Optional[List[str]]) -> Optional[LogitsProcessorList]:
+        """Logits processors biasing generation toward `characters` (None when there is nothing to steer)."""
+        if not characters or CharacterBias is None:
+            return None
+        tokenizer = self.generator.tokenizer
+        bias = CharacterBias.for_names(
+            characters,
+            # GPT-2 BPE: names mid-sentence carry a leading space
+            lambda name: tokenizer.encode(" " + name, add_special_tokens=False),
+            strength=settings.CHARACTER_BIAS_STRENGTH,
+            decay=settings.CHARACTER_BIAS_DECAY,
+        )
+        return LogitsProcessorList([_CharacterBiasProcessor(bias)]) if bias.names else None
+
+    @staticmethod
+    def _sampling_processors(
+        processors: Optional[LogitsProcessorList], seed: Optional[int], temperature: float, top_p: float
+    ) -> Optional[LogitsProcessorList]:
+        """`processors` plus, for a seeded call, the private-RNG sampler (which must run last)."""
+        if seed is None:
+            return processors
+        sampler = _SeededSampler(seed, temperature, TOP_K, top_p)
+        return LogitsProcessorList([*(processors or []), sampler])
+
     def generate(
         self,
         text: str,
@@ -80,6 +256,10 @@ class StoryGenerator:
         num_return_sequences: int = 1,
         temperature: float = 0.85,
         top_p: float = 0.92,
+        prompt_prefix: Optional[str] = None,
+        seed: Optional[int] = None,
+        stop: Optional[Callable[[List[int]], bool]] = None,
+        characters: Optional[List[str]] = None,
     ) -> str:
         """
         Generate story continuation.
@@ -90,10 +270,50 @@ class StoryGenerator:
             num_return_sequences: Number of sequences to generate
             temperature: Sampling temperature (lower = more focused)
             top_p: Nucleus sampling parameter
+            prompt_prefix: Static template text `text` starts with (KV reused)
+            seed: Sample reproducibly from this seed (prefix KV is not reused)
+            stop: Checked after every token with the new token ids (of the first
+                sequence); generation ends early (keeping the partial text) once
+                it returns True
+            characters: Character names to steer the continuation toward
+                (decaying logit bias; started names are completed)
 
         Returns:
             Cleaned generated story continuation text.
         """
+        sequences = self.generate_candidates(
+            text,
+            max_length=max_length,
+            num_return_sequences=num_return_sequences,
+            temperature=temperature,
+            top_p=top_p,
+            prompt_prefix=prompt_prefix,
+            seed=seed,
+            stop=stop,
+            characters=characters,
+        )
+        return sequences[0] if sequences else ""
+
+    def generate_candidates(
+        self,
+        text: str,
+        max_length: int | None = None,
+        num_return_sequences: int = 1,
+        temperature: float = 0.85,
+        top_p: float = 0.92,
+        prompt_prefix: Optional[str] = None,
+        seed: Optional[int] = None,
+        stop: Optional[Callable[[List[int]], bool]] = None,
+        characters: Optional[List[str]] = None,
+    ) -> list[str]:
+        """
+        Generate several story continuations in one batched call.
+
+        Takes the same arguments as generate().
+
+        Returns:
+            Cleaned continuation text per returned sequence.
+        """
         if not self._is_loaded:
             self._load_model()
 
@@ -107,16 +327,17 @@ class StoryGenerator:
         else:
             max_new_tokens = max_length
 
-        # Wrap the user prompt in a stronger instruction so the model
-        # behaves like a professional novelist. We keep this here so
-        # the external API does not change.
-        user_prompt = text
-        full_prompt = (
-            "You are a professional novelist. Continue the following story in a vivid, "
-            "emotionally rich, coherent way with strong sensory detail and forward-moving plot.\n\n"
-            "Story:\n"
-            f"{user_prompt}\n\n"
-        )
+        full_prompt = self._build_prompt(text)
+        extra_kwargs = {}
+        if num_return_sequences == 1 and seed is None:
+            past = self._prefix_past(full_prompt, prompt_prefix)
+            if past is not None:
+                extra_kwargs["past_key_values"] = past
+        if stop is not None:
+            extra_kwargs["stopping_criteria"] = StoppingCriteriaList([_StopWhen(stop)])
+        processors = self._sampling_processors(self._character_processors(characters), seed, temperature, top_p)
+        if processors is not None:
+            extra_kwargs["logits_processor"] = processors
 
         try:
             result = self.generator(
@@ -125,31 +346,290 @@ class StoryGenerator:
                 num_return_sequences=num_return_sequences,
                 temperature=temperature,
                 top_p=top_p,
-                top_k=50,
+                top_k=TOP_K,
                 do_sample=True,
                 no_repeat_ngram_size=4,
                 repetition_penalty=1.15,
                 pad_token_id=self.generator.tokenizer.eos_token_id,
+                **extra_kwargs,
             )
 
-            if not result:
-                return ""
+            sequences = []
+            for item in result or []:
+                raw = item["generated_text"]
+                # 1) Remove prompt echo
+                cleaned = self._strip_prompt(full_prompt, raw)
+                # 2) Remove excessive repeated lines
+                cleaned = self._dedupe_repetitions(cleaned)
+                sequences.append(cleaned or raw)
+            return sequences
+        except Exception as e:  # pragma: no cover - defensive
+            raise RuntimeError(f"Story generation failed: {e}")
+
+    @contextmanager
+    def _left_padded(self, tokenizer):
+        """
+        Left-pad (with EOS if there is no pad token) for one batch call, then restore the tokenizer.
+
+        The tokenizer is shared with every other call, so batch calls are
+        serialized while it is changed. Single-prompt calls never pad.
+        """
+        with self._padding_lock:
+            pad_token, padding_side = tokenizer.pad_token, tokenizer.padding_side
+            if pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            tokenizer.padding_side = "left"
+            try:
+                yield
+            finally:
+                tokenizer.padding_side = padding_side
+                if pad_token is None:
+                    tokenizer.pad_token = None
+
+    def generate_batch(
+        self,
+        texts: list[str],
+        max_length: int | None = None,
+        temperature: float = 0.85,
+        top_p: float = 0.92,
+        seed: Optional[int] = None,
+        stop: Optional[Callable[[List[int]], bool]] = None,
+    ) -> list[str]:
+        """
+        Continue several different prompts in one padded batch.
+
+        Takes the same sampling arguments as generate(); prompts are
+        left-padded so every row continues from its own last token.
+
+        Returns:
+            Cleaned continuation text per prompt, in order.
+        """
+        if not texts:
+            return []
+        if not self._is_loaded:
+            self._load_model()
+
+        assert self.generator is not None  # for type checkers
 
-            raw = result[0]["generated_text"]
-            # 1) Remove prompt echo
-            cleaned = self._strip_prompt(full_prompt, raw)
-            # 2) Remove excessive repeated lines
-            cleaned = self._dedupe_repetitions(cleaned)
+        tokenizer = self.generator.tokenizer
+        full_prompts = [self._build_prompt(text) for text in texts]
+        extra_kwargs = {}
+        if stop is not None:
+            extra_kwargs["stopping_criteria"] = StoppingCriteriaList([_StopWhen(stop)])
+        processors = self._sampling_processors(None, seed, temperature, top_p)
+        if processors is not None:
+            extra_kwargs["logits_processor"] = processors
 
-            return cleaned or raw
+        try:
+            with self._left_padded(tokenizer):
+                results = self.generator(
+                    full_prompts,
+                    batch_size=len(full_prompts),
+                    max_new_tokens=2000 if max_length is None else max_length,
+                    temperature=temperature,
+                    top_p=top_p,
+                    top_k=TOP_K,
+                    do_sample=True,
+                    no_repeat_ngram_size=4,
+                    repetition_penalty=1.15,
+                    pad_token_id=tokenizer.eos_token_id,
+                    **extra_kwargs,
+                )
+
+            sequences = []
+            for full_prompt, result in zip(full_prompts, results):
+                raw = result[0]["generated_text"] if result else ""
+                cleaned = self._dedupe_repetitions(self._strip_prompt(full_prompt, raw))
+                sequences.append(cleaned or raw)
+            return sequences
         except Exception as e:  # pragma: no cover - defensive
             raise RuntimeError(f"Story generation failed: {e}")
 
+    @property
+    def tokenizer(self):
+        """The loaded model's tokenizer, or None before the model is loaded."""
+        return self.generator.tokenizer if self._is_loaded else None
+
+    def context_size(self) -> int:
+        """Context window of the loaded model in tokens (GPT-2 default before loading)."""
+        if not self._is_loaded:
+            return 1024
+        config = self.generator.model.config
+        return getattr(config, "n_positions", None) or getattr(config, "max_position_embeddings", 1024)
+
+    def decode_tokens(self, token_ids: List[int]) -> str:
+        """Text of generated token ids ("" if the model is not loaded)."""
+        if not self._is_loaded:
+            return ""
+        return self.generator.tokenizer.decode(token_ids, skip_special_tokens=True)
+
+    def count_tokens(self, text: str) -> int:
+        """Number of model tokens in `text` (0 if the model is not loaded)."""
+        if not self._is_loaded or not text:
+            return 0
+        return len(self.generator.tokenizer(text)["input_ids"])
+
+    def generate_stream(
+        self,
+        text: str,
+        max_length: int | None = None,
+        temperature: float = 0.85,
+        top_p: float = 0.92,
+        prompt_prefix: Optional[str] = None,
+        stop: Optional[Callable[[List[int]], bool]] = None,
+        characters: Optional[List[str]] = None,
+    ) -> Iterator[str]:
+        """
+        Stream a story continuation as text chunks while tokens are generated.
+
+        Uses the same prompt and sampling settings as generate(); the repetition
+        cleanup in generate() needs the full text, so it is not applied here.
+
+        Args:
+            text: Input story text (prompt)
+            max_length: Maximum number of new tokens to generate
+            temperature: Sampling temperature (lower = more focused)
+            top_p: Nucleus sampling parameter
+            prompt_prefix: Static template text `text` starts with (KV reused)
+            stop: Checked after every token; the stream ends early once it returns True
+            characters: Character names to steer the continuation toward
+
+        Returns:
+            Iterator of decoded text chunks.
+        """
+        if not self._is_loaded:
+            self._load_model()
+
+        assert self.generator is not None  # for type checkers
+
+        model = self.generator.model
+        tokenizer = self.generator.tokenizer
+        full_prompt = self._build_prompt(text)
+        inputs = tokenizer(full_prompt, return_tensors="pt").to(model.device)
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        generation_kwargs = dict(
+            **inputs,
+            streamer=streamer,
+            max_new_tokens=2000 if max_length is None else max_length,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=TOP_K,
+            do_sample=True,
+            no_repeat_ngram_size=4,
+            repetition_penalty=1.15,
+            pad_token_id=tokenizer.eos_token_id,
+        )
+        past = self._prefix_past(full_prompt, prompt_prefix)
+        if past is not None:
+            generation_kwargs["past_key_values"] = past
+        if stop is not None:
+            generation_kwargs["stopping_criteria"] = StoppingCriteriaList([_StopWhen(stop)])
+        processors = self._character_processors(characters)
+        if processors is not None:
+            generation_kwargs["logits_processor"] = processors
+        errors: list[Exception] = []
+
+        def _run() -> None:
+            try:
+                model.generate(**generation_kwargs)
+            except Exception as e:  # pragma: no cover - defensive
+                errors.append(e)
+                streamer.end()
+
+        thread = threading.Thread(target=_run, daemon=True)
+        thread.start()
+        for chunk in streamer:
+            if chunk:
+                yield chunk
+        thread.join()
+        if errors:
+            raise RuntimeError(f"Story generation failed: {errors[0]}")
+
 
 # Global generator instance
 story_generator = StoryGenerator()
 
 
-def generate_story(prompt: str, max_length: int = None) -> str:
+def generate_story(
+    prompt: str,
+    max_length: int = None,
+    temperature: float = 0.85,
+    prompt_prefix: Optional[str] = None,
+    seed: Optional[int] = None,
+    stop: Optional[Callable[[List[int]], bool]] = None,
+    characters: Optional[List[str]] = None,
+) -> str:
     """Generate story text from a prompt. Used by the story pipeline."""
-    return story_generator.generate(prompt, max_length=max_length)
+    return story_generator.generate(
+        prompt,
+        max_length=max_length,
+        temperature=temperature,
+        prompt_prefix=prompt_prefix,
+        seed=seed,
+        stop=stop,
+        characters=characters,
+    )
+
+
+def generate_story_candidates(
+    prompt: str,
+    num_candidates: int,
+    max_length: int = None,
+    temperature: float = 0.85,
+    prompt_prefix: Optional[str] = None,
+    seed: Optional[int] = None,
+    stop: Optional[Callable[[List[int]], bool]] = None,
+    characters: Optional[List[str]] = None,
+) -> list[str]:
+    """Generate several story continuations at once. Used for best-of-N in the story pipeline."""
+    return story_generator.generate_candidates(
+        prompt,
+        max_length=max_length,
+        num_return_sequences=num_candidates,
+        temperature=temperature,
+        prompt_prefix=prompt_prefix,
+        seed=seed,
+        stop=stop,
+        characters=characters,
+    )
+
+
+def generate_story_batch(
+    prompts: list[str],
+    max_length: int = None,
+    temperature: float = 0.85,
+    seed: Optional[int] = None,
+    stop: Optional[Callable[[List[int]], bool]] = None,
+) -> list[str]:
+    """Continue several prompts in one batch. Used for windowed refinement in the story pipeline."""
+    return story_generator.generate_batch(prompts, max_length=max_length, temperature=temperature, seed=seed, stop=stop)
+
+
+def count_story_tokens(text: str) -> int:
+    """Count model tokens in generated text. Used for pipeline throughput timings."""
+    return story_generator.count_tokens(text)
+
+
+def decode_story_tokens(token_ids: List[int]) -> str:
+    """Decode generated token ids to text. Used by the story pipeline's character-drift monitor."""
+    return story_generator.decode_tokens(token_ids)
+
+
+def stream_story(
+    prompt: str,
+    max_length: int = None,
+    temperature: float = 0.85,
+    prompt_prefix: Optional[str] = None,
+    stop: Optional[Callable[[List[int]], bool]] = None,
+    characters: Optional[List[str]] = None,
+) -> Iterator[str]:
+    """Stream story text chunks for a prompt. Used by the streaming story pipeline."""
+    return story_generator.generate_stream(
+        prompt,
+        max_length=max_length,
+        temperature=temperature,
+        prompt_prefix=prompt_prefix,
+        stop=stop,
+        characters=characters,
+    )
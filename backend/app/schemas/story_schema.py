@@ -1,7 +1,7 @@
 """Pydantic schemas for story-related requests and responses."""
 
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+from typing import Any, Optional, List, Dict
 
 
 # ============================================================================
@@ -26,6 +26,12 @@ class GenerateStoryRequest(BaseModel):
     # Generation parameters
     temperature: float = Field(0.8, ge=0.1, le=2.0, description="Sampling temperature (default: 0.8)")
     max_tokens: int = Field(600, ge=50, le=2000, description="Max tokens to generate (default: 600)")
+    candidates: int = Field(
+        1, ge=1, le=8, description="Continuations sampled in one batch; the best-ranked is returned (default: 1)"
+    )
+    seed: Optional[int] = Field(
+        None, ge=0, description="Seed for reproducible generation; identical seeded requests are served from cache"
+    )
     
     class Config:
         """Pydantic config."""
@@ -54,6 +60,14 @@ class GenerateStoryResponse(BaseModel):
     refined: bool = Field(False, description="Whether story was refined")
     score: Optional[float] = Field(None, description="Story quality score if measured")
     character_focus_required: bool = Field(False, description="Whether second-pass generation was needed")
+    cached: bool = Field(False, description="Whether a seeded result was served from the result cache")
+    deadline_exceeded: bool = Field(
+        False, description="Whether generation stopped at the request deadline (generated_text is partial)"
+    )
+    timings: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Latency breakdown: total_ms, per-stage ms and each generation call's backend, tokens and tokens/sec",
+    )
     
     class Config:
         """Pydantic config."""
@@ -7,37 +7,155 @@ Implements a complete pipeline:
 3. Genre-specific model generation (PlotCraft preferred, fallback to transformers)
 4. Story refinement for coherence
 5. Quality scoring
-6. Character-centered regeneration if needed
+6. Character-centered regeneration if needed, or best-of-N candidate reranking
 
 Supports: Action, Horror, Sci-Fi genres with multi-turn session persistence.
 """
 
 import logging
-from typing import List, Tuple, Optional, Dict
+import math
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
 
-from app.models.story_generator import story_generator, generate_story
+from app.core.character_focus import character_focus_stats
+from app.core.circuit_breaker import CircuitOpenError, breakers
+from app.core.config import settings
+from app.core.constants import CANDIDATE_RANK_WEIGHTS
+from app.core.deadline import Deadline
+from app.core.plotcraft_pool import plotcraft_pool
+from app.core.presence_monitor import PresenceMonitor
+from app.core.result_cache import result_cache
+from app.core.timing import StageTimer, generation_backends, record_generation, stage
+from app.models.story_generator import (
+    story_generator,
+    count_story_tokens,
+    decode_story_tokens,
+    generate_story,
+    generate_story_batch,
+    generate_story_candidates,
+    stream_story,
+)
 from app.services.scoring_service import calculate_score
 from app.services.memory_service import (
     get_characters,
     save_user_characters,
     get_user_characters,
 )
-from app.services.twist_service import apply_twist_to_prompt
-from app.utils.text_preprocessing import clean_text, truncate_text
+from app.services.twist_service import twist_directive
+from app.utils.prompt_builder import PromptBudget, PromptBuilder
+from app.utils.text_preprocessing import (
+    clean_text,
+    sentence_windows,
+    split_long_sentences,
+    split_sentences,
+    truncate_text,
+)
 from app.utils.validators import validate_story_text
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on best-of-N candidates (one PlotCraft decode batch)
+MAX_CANDIDATES = 8
+
+T = TypeVar("T")
+
 # Optional: PlotCraft trained model (backend/plotcraft). Used when available.
 try:
     from plotcraft.src.plotcraft_generator import (
+        CONTEXT_SIZE as PLOTCRAFT_CONTEXT_SIZE,
+        configure as plotcraft_configure,
+        count_tokens as plotcraft_count_tokens,
+        decode_tokens as plotcraft_decode_tokens,
+        encode_text as plotcraft_encode_text,
+        GenerationStats as PlotCraftGenerationStats,
+        generate_batch as plotcraft_generate_batch,
+        generate_candidates as plotcraft_generate_candidates,
+        generate_long_text as plotcraft_generate_long_text,
         generate_text as plotcraft_generate_text,
+        loaded_version as plotcraft_loaded_version,
+        model_version as plotcraft_model_version,
+        stream_text as plotcraft_stream_text,
         PlotCraftUnavailable,
     )
+    plotcraft_configure(
+        quantization=settings.PLOTCRAFT_QUANTIZATION,
+        backend=settings.PLOTCRAFT_BACKEND,
+        cache_max_bytes=settings.PLOTCRAFT_CACHE_MAX_MB * 1024 * 1024,
+        cache_policy=settings.PLOTCRAFT_CACHE_POLICY,
+        pinned_genres=settings.PLOTCRAFT_PINNED_GENRES,
+        speculative=settings.PLOTCRAFT_SPECULATIVE,
+        compiled=settings.PLOTCRAFT_COMPILE,
+        compile_buckets=settings.PLOTCRAFT_COMPILE_BUCKETS,
+        character_bias_strength=settings.CHARACTER_BIAS_STRENGTH,
+        character_bias_decay=settings.CHARACTER_BIAS_DECAY,
+    )
 except ImportError:
+    PLOTCRAFT_CONTEXT_SIZE = None
+    PlotCraftGenerationStats = None
+    plotcraft_count_tokens = None
+    plotcraft_decode_tokens = None
+    plotcraft_encode_text = None
+    plotcraft_generate_batch = None
+    plotcraft_generate_candidates = None
+    plotcraft_generate_long_text = None
     plotcraft_generate_text = None
+    plotcraft_loaded_version = None
+    plotcraft_model_version = None
+    plotcraft_stream_text = None
     PlotCraftUnavailable = Exception  # noqa: A001
 
+# PlotCraft served by a worker pool process instead of in-process (see app/core/plotcraft_pool.py)
+if plotcraft_pool is not None:
+    plotcraft_count_tokens = plotcraft_pool.count_tokens
+    plotcraft_decode_tokens = plotcraft_pool.decode_tokens
+    plotcraft_encode_text = plotcraft_pool.encode_text
+    plotcraft_generate_batch = plotcraft_pool.generate_batch
+    plotcraft_generate_candidates = plotcraft_pool.generate_candidates
+    plotcraft_generate_long_text = plotcraft_pool.generate_long_text
+    plotcraft_generate_text = plotcraft_pool.generate_text
+    plotcraft_loaded_version = plotcraft_pool.loaded_version
+    plotcraft_model_version = plotcraft_pool.model_version
+    plotcraft_stream_text = plotcraft_pool.stream_text
+
+
+# ============================================================================
+# PROMPT TEMPLATES
+# ============================================================================
+# Static leading text of each prompt template. Passed to the generators as
+# prompt_prefix so its KV is prefilled once per model and reused per request.
+
+def _generation_prefix(genre: str) -> str:
+    return f"Continue this {genre} story in a compelling and coherent way.\n\n"
+
+
+def _rolling_header(genre: str, characters: List[str]) -> str:
+    """Compact context carried into every chunk of a long-form generation past the PlotCraft window."""
+    header = _generation_prefix(genre)
+    if characters:
+        header += "Characters: " + ", ".join(characters) + ".\n\n"
+    return header
+
+
+def _refinement_prefix(genre: str) -> str:
+    return f"""You are an expert editor specializing in {genre} stories.
+
+Rewrite the following story to:
+- Improve narrative coherence and flow
+- Reduce repetition and redundant phrases
+- Strengthen character development and dialogue
+- Enhance descriptive language and atmosphere
+- Maintain the original plot and key events
+
+Original Story:
+"""
+
+
+def _legacy_continue_prefix(genre: str) -> str:
+    return f"""You are a creative AI storyteller.
+
+Continue this {genre} story.
+Maintain consistency with these characters: """
+
 
 # ============================================================================
 # GENERATION HELPERS
@@ -50,71 +168,414 @@ def _strip_prompt_from_continuation(prompt: str, full_output: str) -> str:
     return full_output
 
 
+def _plotcraft_model_name(genre: str) -> str:
+    """Map a story genre to the PlotCraft model that serves it."""
+    genre_key = (genre or "").strip().lower()
+    if "horror" in genre_key:
+        return "horror"
+    if "action" in genre_key:
+        return "action"
+    return "scifi"
+
+
+def _step_deadline(deadline: Optional[Deadline]) -> Deadline:
+    """Deadline for one generation call: GENERATION_TIMEOUT, capped by the request deadline."""
+    return (deadline if deadline is not None else Deadline()).within(settings.GENERATION_TIMEOUT)
+
+
+def _record_plotcraft_failure(breaker, error: Exception) -> None:
+    """Count a PlotCraft failure; a failed load (missing/corrupt checkpoint) opens the breaker at once."""
+    breaker.record_failure(error, trip=isinstance(error, PlotCraftUnavailable))
+
+
+def _stop_either(*criteria: Callable[[List[int]], bool]) -> Callable[[List[int]], bool]:
+    """One stop callable that fires when any of `criteria` does."""
+    return lambda generated: any(criterion(generated) for criterion in criteria)
+
+
+def _log_if_cut_short(step: Deadline) -> None:
+    if step.cancelled:
+        logger.info("Generation stopped early: request cancelled")
+    elif step.expired:
+        logger.warning("Generation stopped at its deadline; returning partial output")
+
+
+def _with_plotcraft_fallback(
+    genre: str,
+    deadline: Optional[Deadline],
+    description: str,
+    plotcraft: Optional[Callable[[str, Deadline, "PlotCraftGenerationStats"], T]],
+    transformers: Callable[[Deadline], Tuple[T, int]],
+    require_output: bool = False,
+    record: bool = True,
+) -> T:
+    """
+    Run a generation on PlotCraft, falling back to transformers.
+
+    Shared by the generation helpers below. Each backend is skipped while its
+    circuit breaker is open, and a PlotCraft failure is counted on the genre's
+    breaker before transformers is tried. Decoding stops after
+    GENERATION_TIMEOUT or at `deadline`, whichever comes first.
+
+    Args:
+        genre: Story genre (action, horror, scifi)
+        deadline: Request deadline / cancellation flag
+        description: What is generated, for logs (e.g. "3 candidates")
+        plotcraft: Calls PlotCraft with (model name, step deadline, stats to
+            fill in); None when PlotCraft is not installed
+        transformers: Calls the transformers model with the step deadline and
+            returns (result, new tokens)
+        require_output: Treat an empty result as a failure of that backend
+        record: Report the call with record_generation() (off for streams,
+            whose tokens are produced after this returns)
+
+    Returns:
+        The first backend's result
+
+    Raises:
+        TimeoutError: If the deadline passed before generation could start
+        GenerationCancelled: If the deadline was cancelled (client disconnected)
+        RuntimeError: If all generation methods fail
+    """
+    last_error: Optional[Exception] = None
+    step = _step_deadline(deadline)
+    step.check()
+
+    if plotcraft is not None:
+        model_name = _plotcraft_model_name(genre)
+        breaker = breakers.get("plotcraft", model_name)
+        if not breaker.allow():
+            last_error = CircuitOpenError(breaker)
+            logger.info(f"PlotCraft skipped: {last_error}. Using transformers.")
+        else:
+            try:
+                logger.info(f"Generating {description} with PlotCraft model: {model_name}")
+                stats = PlotCraftGenerationStats()
+                start = time.perf_counter()
+                result = plotcraft(model_name, step, stats)
+                # Empty output means the prompt filled the context, not a backend fault
+                breaker.record_success()
+                if result or not require_output:
+                    if record:
+                        record_generation("plotcraft", stats.new_tokens, time.perf_counter() - start, stats.prompt_tokens)
+                        logger.info(f"PlotCraft generation successful ({stats.new_tokens} tokens)")
+                    _log_if_cut_short(step)
+                    return result
+                last_error = RuntimeError(f"PlotCraft produced no output ({description})")
+                logger.warning(f"{last_error}. Falling back to transformers.")
+            except Exception as e:  # noqa: BLE001
+                logger.warning(f"PlotCraft generation failed: {e}. Falling back to transformers.")
+                _record_plotcraft_failure(breaker, e)
+                last_error = e
+            step.check()
+    else:
+        logger.info("PlotCraft unavailable. Using transformers as primary.")
+
+    breaker = breakers.get("transformers")
+    if not breaker.allow():
+        last_error = CircuitOpenError(breaker)
+    else:
+        try:
+            logger.info(f"Generating {description} with transformers model...")
+            start = time.perf_counter()
+            result, new_tokens = transformers(step)
+            breaker.record_success()
+            if result or not require_output:
+                if record:
+                    record_generation("transformers", new_tokens, time.perf_counter() - start)
+                    logger.info(f"Transformers generation successful ({new_tokens} tokens)")
+                _log_if_cut_short(step)
+                return result
+            last_error = RuntimeError(f"Transformers produced no output ({description})")
+        except Exception as e:  # noqa: BLE001
+            logger.error(f"Transformers generation failed: {e}", exc_info=True)
+            breaker.record_failure(e)
+            last_error = e
+
+    error_msg = f"All generation methods failed. Last error: {last_error}"
+    logger.error(error_msg)
+    raise RuntimeError(error_msg)
+
+
 def _generate_with_plotcraft_fallback(
     prompt: str,
     genre: str,
     max_tokens: int = 300,
     temperature: float = 0.8,
+    prompt_prefix: Optional[str] = None,
+    seed: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
+    characters: Optional[List[str]] = None,
+    monitor: Optional[PresenceMonitor] = None,
+    context_header: Optional[str] = None,
 ) -> str:
     """
     Generate text using PlotCraft if available, otherwise fallback to transformers.
     
+    Decoding stops after GENERATION_TIMEOUT or at `deadline`, whichever comes
+    first, and the partial continuation is returned; cancelling the deadline
+    stops it within one token. A backend whose circuit breaker is open (see
+    app/core/circuit_breaker.py) is skipped without being called.
+    
     Args:
         prompt: Generation prompt
         genre: Story genre (action, horror, scifi)
         max_tokens: Maximum tokens to generate
         temperature: Sampling temperature
+        prompt_prefix: Static template text the prompt starts with
+        seed: Optional seed for reproducible sampling
+        deadline: Request deadline / cancellation flag
+        characters: Character names to steer sampling toward (logit bias)
+        monitor: Character-presence monitor; the decode stops at its checkpoint
+            when the text has drifted (check `monitor.aborted` afterwards)
+        context_header: Enables PlotCraft long-form mode: past the context
+            window, generation continues in chunks prompted with this header
+            plus the story tail, so all of `max_tokens` is delivered
     
     Returns:
         Generated text continuation
     
     Raises:
-        TimeoutError: If generation takes too long
+        TimeoutError: If the deadline passed before generation could start
+        GenerationCancelled: If the deadline was cancelled (client disconnected)
+        RuntimeError: If all generation methods fail
+    """
+    def plotcraft(model_name: str, step: Deadline, stats) -> str:
+        generate = plotcraft_generate_text
+        long_form = {}
+        if context_header is not None and plotcraft_generate_long_text is not None:
+            generate = plotcraft_generate_long_text
+            long_form = dict(context_header=context_header, tail_tokens=settings.ROLLING_CONTEXT_TAIL_TOKENS)
+        return generate(
+            prompt,
+            max_tokens=max_tokens,
+            model_name=model_name,
+            temperature=temperature,
+            prompt_prefix=prompt_prefix,
+            seed=seed,
+            stats=stats,
+            stop_criteria=[step] if monitor is None else [
+                step,
+                monitor.bind(lambda ids: plotcraft_decode_tokens(ids, model_name)),
+            ],
+            characters=characters,
+            **long_form,
+        )
+
+    def transformers(step: Deadline) -> Tuple[str, int]:
+        continuation = generate_story(
+            prompt,
+            max_length=max_tokens,
+            temperature=temperature,
+            prompt_prefix=prompt_prefix,
+            seed=seed,
+            stop=step if monitor is None else _stop_either(step, monitor.bind(decode_story_tokens)),
+            characters=characters,
+        )
+        return continuation, count_story_tokens(continuation)
+
+    return _with_plotcraft_fallback(
+        genre, deadline, "text", plotcraft if plotcraft_generate_text is not None else None, transformers
+    )
+
+
+def _generate_candidates_with_plotcraft_fallback(
+    prompt: str,
+    genre: str,
+    num_candidates: int,
+    max_tokens: int = 300,
+    temperature: float = 0.8,
+    prompt_prefix: Optional[str] = None,
+    seed: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
+    characters: Optional[List[str]] = None,
+) -> List[Tuple[str, Optional[float]]]:
+    """
+    Generate several continuations in one batched decode.
+
+    PlotCraft also returns each candidate's mean token log-likelihood; the
+    transformers fallback returns None for it. Deadlines and circuit breakers
+    apply as in _generate_with_plotcraft_fallback. A backend that returns no
+    candidates counts as failed, and the next one is tried.
+
+    Args:
+        prompt: Generation prompt
+        genre: Story genre (action, horror, scifi)
+        num_candidates: Number of continuations to sample
+        max_tokens: Maximum tokens to generate
+        temperature: Sampling temperature
+        prompt_prefix: Static template text the prompt starts with
+        seed: Optional seed for reproducible sampling
+        deadline: Request deadline / cancellation flag
+        characters: Character names to steer sampling toward (logit bias)
+
+    Returns:
+        List of (text, log-likelihood or None) tuples
+
+    Raises:
+        TimeoutError: If the deadline passed before generation could start
+        GenerationCancelled: If the deadline was cancelled (client disconnected)
+        RuntimeError: If all generation methods fail or return no candidates
+    """
+    def plotcraft(model_name: str, step: Deadline, stats) -> List[Tuple[str, Optional[float]]]:
+        return plotcraft_generate_candidates(
+            prompt,
+            num_candidates,
+            max_tokens=max_tokens,
+            model_name=model_name,
+            temperature=temperature,
+            prompt_prefix=prompt_prefix,
+            seed=seed,
+            stats=stats,
+            stop_criteria=[step],
+            characters=characters,
+        )
+
+    def transformers(step: Deadline) -> Tuple[List[Tuple[str, Optional[float]]], int]:
+        texts = generate_story_candidates(
+            prompt,
+            num_candidates,
+            max_length=max_tokens,
+            temperature=temperature,
+            prompt_prefix=prompt_prefix,
+            seed=seed,
+            stop=step,
+            characters=characters,
+        )
+        return [(text, None) for text in texts], sum(count_story_tokens(text) for text in texts)
+
+    return _with_plotcraft_fallback(
+        genre,
+        deadline,
+        f"{num_candidates} candidates",
+        plotcraft if plotcraft_generate_candidates is not None else None,
+        transformers,
+        require_output=True,
+    )
+
+
+def _generate_batch_with_plotcraft_fallback(
+    prompts: List[str],
+    genre: str,
+    max_tokens: int = 300,
+    temperature: float = 0.8,
+    prompt_prefix: Optional[str] = None,
+    seed: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
+) -> List[str]:
+    """
+    Continue several prompts in one batched decode.
+
+    Deadlines and circuit breakers apply as in _generate_with_plotcraft_fallback.
+
+    Args:
+        prompts: Generation prompts
+        genre: Story genre (action, horror, scifi)
+        max_tokens: Maximum tokens to generate per prompt
+        temperature: Sampling temperature
+        prompt_prefix: Static template text every prompt starts with
+        seed: Optional seed for reproducible sampling
+        deadline: Request deadline / cancellation flag
+
+    Returns:
+        Generated continuation per prompt, in order
+
+    Raises:
+        TimeoutError: If the deadline passed before generation could start
+        GenerationCancelled: If the deadline was cancelled (client disconnected)
         RuntimeError: If all generation methods fail
     """
-    continuation: str
-    last_error = None
+    def plotcraft(model_name: str, step: Deadline, stats) -> List[str]:
+        return plotcraft_generate_batch(
+            prompts,
+            max_tokens=max_tokens,
+            model_name=model_name,
+            temperature=temperature,
+            prompt_prefix=prompt_prefix,
+            seed=seed,
+            stats=stats,
+            stop_criteria=[step],
+        )
+
+    def transformers(step: Deadline) -> Tuple[List[str], int]:
+        continuations = generate_story_batch(
+            prompts, max_length=max_tokens, temperature=temperature, seed=seed, stop=step
+        )
+        return continuations, sum(count_story_tokens(text) for text in continuations)
+
+    return _with_plotcraft_fallback(
+        genre,
+        deadline,
+        f"{len(prompts)} prompts in one batch",
+        plotcraft if plotcraft_generate_batch is not None else None,
+        transformers,
+    )
+
+
+def _stream_with_plotcraft_fallback(
+    prompt: str,
+    genre: str,
+    max_tokens: int = 300,
+    temperature: float = 0.8,
+    prompt_prefix: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+    characters: Optional[List[str]] = None,
+) -> Iterator[str]:
+    """
+    Stream generated text using PlotCraft if available, otherwise transformers.
     
-    if plotcraft_generate_text is not None:
-        try:
-            # Map genre to PlotCraft model
-            genre_key = (genre or "").strip().lower()
-            if "horror" in genre_key:
-                model_name = "horror"
-            elif "action" in genre_key:
-                model_name = "action"
-            else:
-                model_name = "scifi"
-            
-            logger.info(f"Generating with PlotCraft model: {model_name}")
-            continuation = plotcraft_generate_text(
-                prompt,
-                max_tokens=max_tokens,
-                model_name=model_name,
-                temperature=temperature,
-            )
-            logger.info(f"PlotCraft generation successful ({len(continuation)} tokens)")
-            return continuation
-        except (PlotCraftUnavailable, Exception) as e:
-            logger.warning(f"PlotCraft generation failed: {e}. Falling back to transformers.")
-            last_error = e
-    else:
-        logger.info("PlotCraft unavailable. Using transformers as primary.")
+    The fallback decision is made before the first chunk is produced (an open
+    PlotCraft circuit breaker skips straight to transformers); errors
+    raised mid-stream propagate to the consumer. The stream ends early when
+    the generation deadline passes or `deadline` is cancelled.
     
-    # Fallback to transformers
-    try:
-        logger.info("Generating with transformers model...")
-        continuation = generate_story(prompt, max_length=max_tokens, temperature=temperature)
-        logger.info(f"Transformers generation successful ({len(continuation)} tokens)")
-        return continuation
-    except Exception as e:
-        logger.error(f"Transformers generation failed: {e}", exc_info=True)
-        last_error = e
-    
-    # If we get here, both methods failed
-    error_msg = f"All generation methods failed. Last error: {str(last_error)}"
-    logger.error(error_msg)
-    raise RuntimeError(error_msg)
+    Args:
+        prompt: Generation prompt
+        genre: Story genre (action, horror, scifi)
+        max_tokens: Maximum tokens to generate
+        temperature: Sampling temperature
+        prompt_prefix: Static template text the prompt starts with
+        deadline: Request deadline / cancellation flag
+        characters: Character names to steer sampling toward (logit bias)
+    
+    Returns:
+        Iterator of generated text chunks
+
+    Raises:
+        TimeoutError: If the deadline passed before generation could start
+        GenerationCancelled: If the deadline was cancelled (client disconnected)
+        RuntimeError: If no backend could start the stream
+    """
+    def plotcraft(model_name: str, step: Deadline, stats) -> Iterator[str]:
+        return plotcraft_stream_text(
+            prompt,
+            max_tokens=max_tokens,
+            model_name=model_name,
+            temperature=temperature,
+            prompt_prefix=prompt_prefix,
+            stop_criteria=[step],
+            characters=characters,
+        )
+
+    def transformers(step: Deadline) -> Tuple[Iterator[str], int]:
+        chunks = stream_story(
+            prompt,
+            max_length=max_tokens,
+            temperature=temperature,
+            prompt_prefix=prompt_prefix,
+            stop=step,
+            characters=characters,
+        )
+        return chunks, 0
+
+    return _with_plotcraft_fallback(
+        genre,
+        deadline,
+        "a stream",
+        plotcraft if plotcraft_stream_text is not None else None,
+        transformers,
+        record=False,
+    )
 
 
 def _check_character_presence(text: str, characters: List[str]) -> Tuple[bool, float]:
@@ -139,50 +600,216 @@ def _check_character_presence(text: str, characters: List[str]) -> Tuple[bool, f
     return all_present, ratio
 
 
+def _rank_candidates(
+    candidates: List[Tuple[str, Optional[float]]],
+    characters: List[str],
+    story_prefix: str,
+) -> List[Dict]:
+    """
+    Rank generated candidates, best first.
+
+    Each candidate is rated on character presence, the ScoringService total
+    score of the full story and model log-likelihood (min-max scaled across
+    the candidates, neutral when unavailable), combined with
+    CANDIDATE_RANK_WEIGHTS.
+
+    Args:
+        candidates: (text, log-likelihood or None) per candidate
+        characters: Session characters expected in the continuation
+        story_prefix: Story so far, prepended to each candidate for scoring
+
+    Returns:
+        List of dicts with text, character_presence, score, log_likelihood and
+        rank_score, sorted by rank_score descending.
+    """
+    likelihoods = [lp for _, lp in candidates if lp is not None]
+    low, high = (min(likelihoods), max(likelihoods)) if likelihoods else (0.0, 0.0)
+
+    ranked = []
+    for text, log_likelihood in candidates:
+        _, presence = _check_character_presence(text, characters)
+        score = calculate_score(story_prefix + " " + text) if text.strip() else 0
+        if log_likelihood is None or high == low:
+            likelihood = 0.5
+        else:
+            likelihood = (log_likelihood - low) / (high - low)
+        rank_score = (
+            CANDIDATE_RANK_WEIGHTS["characters"] * presence
+            + CANDIDATE_RANK_WEIGHTS["score"] * score / 100
+            + CANDIDATE_RANK_WEIGHTS["likelihood"] * likelihood
+        )
+        ranked.append({
+            "text": text,
+            "character_presence": presence,
+            "score": score,
+            "log_likelihood": log_likelihood,
+            "rank_score": rank_score,
+        })
+    ranked.sort(key=lambda c: c["rank_score"], reverse=True)
+    return ranked
+
+
+def _estimate_tokens(text: str) -> int:
+    """Conservative token estimate when no tokenizer is loaded (subword tokenizers average under 1.5 per word)."""
+    return math.ceil(len(text.split()) * 1.5)
+
+
+def _plotcraft_tokenizer(genre: str) -> Optional[Tuple[str, str]]:
+    """
+    (model name, loaded version) of the PlotCraft model whose tokenizer measures text for `genre`.
+
+    None while that model is not loaded or its circuit breaker is not closed.
+    Only looks at loaded state, so it never loads a model on the request path;
+    until the genre is loaded (normally at startup) callers fall back.
+    """
+    if plotcraft_loaded_version is None or plotcraft_encode_text is None:
+        return None
+    model_name = _plotcraft_model_name(genre)
+    if breakers.get("plotcraft", model_name).state != "closed":
+        return None
+    version = plotcraft_loaded_version(model_name)
+    return (model_name, version) if version is not None else None
+
+
+def _refine_token_counter(genre: str) -> Callable[[List[str]], List[int]]:
+    """Per-text token counter for sizing refine windows: the PlotCraft tokenizer when it is usable."""
+    resolved = _plotcraft_tokenizer(genre)
+    if resolved is not None:
+        model_name = resolved[0]
+        return lambda texts: plotcraft_count_tokens(texts, model_name)
+    return lambda texts: [_estimate_tokens(text) for text in texts]
+
+
+# Prompt builder per genre, with the (tokenizer, budget) it was built for
+_prompt_builders: Dict[str, Tuple[tuple, PromptBuilder]] = {}
+
+
+def _prompt_builder(genre: str) -> PromptBuilder:
+    """
+    Prompt builder in the token space of the model that will serve `genre`.
+
+    Uses the PlotCraft tokenizer when that model is loaded and usable, else
+    the loaded transformers tokenizer, else words at about 1.5 tokens each.
+    Builders are cached per genre and rebuilt when the choice changes (breaker
+    state, loaded model version or budget settings).
+    """
+    budget = PromptBudget(
+        header=settings.PROMPT_HEADER_TOKENS,
+        characters=settings.PROMPT_CHARACTER_TOKENS,
+        twist=settings.PROMPT_TWIST_TOKENS,
+        story=settings.PROMPT_STORY_TOKENS,
+        min_generation=settings.PROMPT_MIN_GENERATION_TOKENS,
+    )
+    resolved = _plotcraft_tokenizer(genre)
+    tokenizer = story_generator.tokenizer if resolved is None else None
+    stamp = (resolved, id(tokenizer) if tokenizer is not None else None, budget)
+    cached = _prompt_builders.get(genre)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    if resolved is not None:
+        model_name, version = resolved
+        builder = PromptBuilder(
+            lambda text: plotcraft_encode_text(text, model_name),
+            lambda ids: plotcraft_decode_tokens(ids, model_name),
+            PLOTCRAFT_CONTEXT_SIZE,
+            budget,
+            cache_key=f"plotcraft:{version}",
+        )
+    elif tokenizer is not None:
+        builder = PromptBuilder(
+            lambda text: tokenizer.encode(text, add_special_tokens=False),
+            tokenizer.decode,
+            story_generator.context_size(),
+            budget,
+            cache_key=f"transformers:{settings.TEXT_GENERATION_MODEL}",
+        )
+    else:
+        builder = PromptBuilder(
+            str.split, " ".join, story_generator.context_size() * 2 // 3, budget.scaled(2 / 3), cache_key="words"
+        )
+    _prompt_builders[genre] = (stamp, builder)
+    return builder
+
+
 def _refine_story(
     text: str,
     genre: str,
     temperature: float = 0.7,
+    seed: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
 ) -> str:
     """
     Refine a generated story for coherence and narrative focus.
-    
+
+    The story is split at sentence boundaries into overlapping windows of
+    REFINE_WINDOW_TOKENS (capped so that the prompt and an equally long
+    rewrite fit the PlotCraft context; a rewrite may run a quarter longer
+    only where the context has room), and every window is refined in one
+    batched decode, so latency follows batch throughput rather than story
+    length. Each window after the first repeats up to
+    REFINE_WINDOW_OVERLAP_TOKENS of the previous one for context; when
+    stitching, that many leading sentences of its rewrite are dropped.
+    Sentences too long to fit a window next to its overlap are split at word
+    boundaries first, so one long sentence cannot shrink every window's
+    rewrite budget. A window keeps its original sentences when its rewrite
+    comes back empty, fills the whole budget (likely cut off) or is under
+    half as long as the window.
+
     Args:
         text: Story text to refine
         genre: Story genre
         temperature: Sampling temperature (usually lower for refinement)
+        seed: Optional seed for reproducible sampling
+        deadline: Request deadline / cancellation flag
     
     Returns:
         Refined story text
     """
     if not text or not text.strip():
         return text
-    
-    refinement_prompt = f"""You are an expert editor specializing in {genre} stories.
 
-Rewrite the following story to:
-- Improve narrative coherence and flow
-- Reduce repetition and redundant phrases
-- Strengthen character development and dialogue
-- Enhance descriptive language and atmosphere
-- Maintain the original plot and key events
+    sentences = split_sentences(text)
+    prefix = _refinement_prefix(genre)
+    suffix = "\n\nRefined Story:\n"
+    count_tokens = _refine_token_counter(genre)
+    *sentence_tokens, overhead = count_tokens(sentences + [prefix + suffix])
+    window_tokens = settings.REFINE_WINDOW_TOKENS
+    if PLOTCRAFT_CONTEXT_SIZE is not None:
+        window_tokens = max(1, min(window_tokens, (PLOTCRAFT_CONTEXT_SIZE - overhead) // 2))
+    overlap_tokens = min(settings.REFINE_WINDOW_OVERLAP_TOKENS, window_tokens // 2)
+    # A window is its overlap plus at least one new sentence, so that sentence must fit beside the overlap
+    sentences, sentence_tokens = split_long_sentences(
+        sentences, sentence_tokens, max(1, window_tokens - overlap_tokens), count_tokens
+    )
+    windows = sentence_windows(sentence_tokens, window_tokens, overlap_tokens)
+    # Rewrites may run a little longer than their window, but never past the context
+    max_tokens = window_tokens * 5 // 4
+    if PLOTCRAFT_CONTEXT_SIZE is not None:
+        longest = max(sum(sentence_tokens[start:end]) for start, end, _ in windows)
+        max_tokens = max(1, min(max_tokens, PLOTCRAFT_CONTEXT_SIZE - overhead - longest))
 
-Original Story:
-{text}
+    logger.info(f"Refining story ({genre} genre) in {len(windows)} window(s) of up to {window_tokens} tokens")
 
-Refined Story:
-"""
-    
-    logger.info(f"Refining story ({genre} genre)")
-    
-    refined = _generate_with_plotcraft_fallback(
-        refinement_prompt,
+    refined = _generate_batch_with_plotcraft_fallback(
+        [prefix + " ".join(sentences[start:end]) + suffix for start, end, _ in windows],
         genre,
-        max_tokens=500,
+        max_tokens=max_tokens,
         temperature=temperature,
+        prompt_prefix=prefix,
+        seed=seed,
+        deadline=deadline,
     )
-    
-    return refined.strip()
+
+    pieces = []
+    refined_tokens = count_tokens(refined)
+    for (start, end, overlap), piece, tokens in zip(windows, refined, refined_tokens):
+        piece_sentences = split_sentences(piece)
+        if not piece_sentences or tokens >= max_tokens or tokens * 2 < sum(sentence_tokens[start:end]):
+            piece_sentences = sentences[start:end]
+        # Never drop a whole window's rewrite
+        pieces.extend(piece_sentences[min(overlap, len(piece_sentences) - 1):])
+    return " ".join(pieces).strip()
 
 
 def _regenerate_for_character_focus(
@@ -191,11 +818,16 @@ def _regenerate_for_character_focus(
     characters: List[str],
     main_character: Optional[str] = None,
     max_tokens: int = 300,
+    seed: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
+    bias_characters: Optional[List[str]] = None,
+    context_header: Optional[str] = None,
 ) -> str:
     """
     Perform second-pass generation focused on main character.
     
-    Used when generation drifts away from character focus.
+    Used when generation drifts away from character focus (the fallback when
+    logit biasing alone did not bring the characters in).
     
     Args:
         base_prompt: Original prompt
@@ -203,6 +835,10 @@ def _regenerate_for_character_focus(
         characters: List of characters
         main_character: Primary character to focus on
         max_tokens: Generation tokens
+        seed: Optional seed for reproducible sampling
+        deadline: Request deadline / cancellation flag
+        bias_characters: Character names to steer sampling toward (logit bias)
+        context_header: Header for long-form generation past the context window
     
     Returns:
         Character-focused generated text
@@ -211,7 +847,16 @@ def _regenerate_for_character_focus(
         if characters:
             main_character = characters[0]
         else:
-            return _generate_with_plotcraft_fallback(base_prompt, genre, max_tokens)
+            return _generate_with_plotcraft_fallback(
+                base_prompt,
+                genre,
+                max_tokens,
+                prompt_prefix=_generation_prefix(genre),
+                seed=seed,
+                deadline=deadline,
+                characters=bias_characters,
+                context_header=context_header,
+            )
     
     focus_prompt = f"""{base_prompt}
 
@@ -226,13 +871,155 @@ All events should significantly impact or involve {main_character}.
         focus_prompt,
         genre,
         max_tokens=max_tokens,
+        prompt_prefix=_generation_prefix(genre),
+        seed=seed,
+        deadline=deadline,
+        characters=bias_characters,
+        context_header=context_header,
+    )
+
+
+def _biased_characters(persisted_chars: List[str]) -> Optional[List[str]]:
+    """Characters to steer generation toward with a logit bias (None when CHARACTER_BIAS_ENABLED is off)."""
+    if not settings.CHARACTER_BIAS_ENABLED or not persisted_chars:
+        return None
+    return list(persisted_chars)
+
+
+def _character_bias_key(characters: Optional[List[str]]) -> Optional[Tuple[float, float]]:
+    """Bias settings that change seeded output (part of the result-cache key)."""
+    if not characters:
+        return None
+    return (settings.CHARACTER_BIAS_STRENGTH, settings.CHARACTER_BIAS_DECAY)
+
+
+def _presence_monitor(persisted_chars: List[str], max_tokens: int) -> Optional[PresenceMonitor]:
+    """Drift monitor for a first pass (None when disabled or the checkpoint is past the budget)."""
+    checkpoint = settings.CHARACTER_MONITOR_CHECKPOINT_TOKENS
+    if not settings.CHARACTER_MONITOR_ENABLED or not persisted_chars or checkpoint >= max_tokens:
+        return None
+    return PresenceMonitor(
+        lambda text: _check_character_presence(text, persisted_chars)[1],
+        checkpoint_tokens=checkpoint,
+        min_ratio=settings.CHARACTER_MONITOR_MIN_RATIO,
     )
 
 
+def _model_version(genre: str) -> str:
+    """
+    Identity of the model expected to answer for a genre (keys the result cache).
+
+    The loaded PlotCraft weights when the genre is loaded; the checkpoint on
+    disk (one stat per file) only before its first load. While the genre's
+    PlotCraft breaker is open, transformers answers instead.
+    """
+    model_name = _plotcraft_model_name(genre)
+    if plotcraft_loaded_version is not None and breakers.get("plotcraft", model_name).state != "open":
+        version = plotcraft_loaded_version(model_name) or plotcraft_model_version(model_name)
+        if version is not None:
+            return f"plotcraft:{version}"
+    return f"transformers:{settings.TEXT_GENERATION_MODEL}"
+
+
 # ============================================================================
 # MAIN PIPELINE
 # ============================================================================
 
+def _normalize_inputs(
+    prompt: str,
+    genre: str,
+    temperature: float,
+    max_tokens: int,
+) -> Tuple[str, str, float, int]:
+    """
+    Validate the prompt and clamp generation parameters.
+    
+    Raises:
+        ValueError: If prompt is empty or invalid
+    """
+    is_valid, error = validate_story_text(prompt)
+    if not is_valid:
+        raise ValueError(f"Invalid prompt: {error}")
+    
+    prompt = prompt.strip()
+    genre = genre.strip().lower() if genre else "scifi"
+    temperature = max(0.1, min(2.0, temperature))  # Clamp to valid range
+    max_tokens = max(50, min(2000, max_tokens))     # Clamp to valid range
+    return prompt, genre, temperature, max_tokens
+
+
+def _prepare_generation(
+    user_id: str,
+    prompt: str,
+    genre: str,
+    twist: Optional[str],
+) -> Dict:
+    """
+    Run the pre-generation pipeline steps (1-5).
+    
+    Detects and persists characters, then builds the generation prompt with
+    character focus and optional twist directive. The prompt is assembled in
+    the serving tokenizer's token space (see _prompt_builder): every section
+    has a PROMPT_*_TOKENS budget, the story keeps its most recent tokens, and
+    PROMPT_MIN_GENERATION_TOKENS of the context always stay free.
+    
+    Returns:
+        Dictionary with detected_characters, persisted_characters,
+        cleaned_prompt, generation_prompt and twist_applied.
+    """
+    # STEP 1: Detect characters from prompt
+    logger.info("Step 1: Detecting characters from prompt")
+    with stage("character_detection"):
+        detected_chars = get_characters(prompt)
+    logger.info(f"Detected {len(detected_chars)} characters: {detected_chars}")
+    
+    # STEP 2-3: Persist and retrieve characters
+    logger.info("Step 2-3: Persisting and retrieving user characters")
+    with stage("character_persistence"):
+        if detected_chars:
+            save_user_characters(user_id, detected_chars)
+        persisted_chars = get_user_characters(user_id)
+    logger.info(f"Persisted characters for user: {persisted_chars}")
+    
+    # STEP 4-5: Build the prompt with character focus and optional twist, within token budgets
+    logger.info("Step 4: Building enhanced prompt")
+    twist_applied = twist.lower() if twist and twist.strip() else None
+    with stage("prompt_build"):
+        cleaned_prompt = clean_text(prompt)
+        characters_line = ""
+        if persisted_chars:
+            characters_line = (
+                "Focus on these characters: " + ", ".join(persisted_chars) + ". \n"
+                "The story should revolve primarily around: " + persisted_chars[0] + ".\n"
+            )
+        twist_line = ""
+        if twist_applied:
+            logger.info(f"Step 5: Applying twist ({twist})")
+            twist_line = twist_directive(twist, persisted_chars[0] if persisted_chars else None) + "\n"
+        built = _prompt_builder(genre).build(
+            header=_generation_prefix(genre),
+            characters=characters_line,
+            twist=twist_line,
+            story=cleaned_prompt,
+            story_label="\nStory so far:\n",
+            footer="\n\nContinue the story:\n",
+        )
+        generation_prompt = built.text
+    if built.truncated:
+        logger.info(
+            f"Prompt sections cut to their token budgets: {', '.join(built.truncated)} "
+            f"({built.prompt_tokens} prompt tokens, {built.generation_budget} left to generate)"
+        )
+    
+    return {
+        "detected_characters": detected_chars,
+        "persisted_characters": persisted_chars,
+        "cleaned_prompt": cleaned_prompt,
+        "generation_prompt": generation_prompt,
+        "twist_applied": twist_applied,
+    }
+
+
 def generate_story_pipeline(
     user_id: str,
     prompt: str,
@@ -242,6 +1029,9 @@ def generate_story_pipeline(
     measure: bool = True,
     temperature: float = 0.8,
     max_tokens: int = 300,
+    candidates: int = 1,
+    seed: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
 ) -> Dict:
     """
     Complete story generation pipeline with character persistence and twist injection.
@@ -252,10 +1042,11 @@ def generate_story_pipeline(
     3. Retrieve all persisted characters
     4. Build enhanced generation prompt with character focus
     5. Optionally add twist directive
-    6. Generate story using PlotCraft or fallback
+    6. Generate story using PlotCraft or fallback (best of N candidates if requested)
     7. Optionally refine story
     8. Optionally score story
-    9. Ensure character focus (regenerate if needed)
+    9. Ensure character focus (regenerate if needed, aborting a drifting first
+       pass at CHARACTER_MONITOR_CHECKPOINT_TOKENS; skipped for best-of-N)
     10. Return structured response
     
     Args:
@@ -266,7 +1057,20 @@ def generate_story_pipeline(
         refine: Whether to refine generated story for coherence
         measure: Whether to score the generated story
         temperature: Sampling temperature (0.1-2.0). Default: 0.8
-        max_tokens: Maximum tokens to generate. Default: 300
+        max_tokens: Maximum tokens to generate (50-2000). With ROLLING_CONTEXT_ENABLED,
+            PlotCraft keeps generating past its context window. Default: 300
+        candidates: Continuations to sample in one batch and rerank (1-8).
+            With more than one, the best candidate by character presence,
+            score and log-likelihood is returned instead of regenerating
+            when characters go missing. Default: 1
+        seed: Make sampling reproducible. Seeded results are cached by model
+            version, genre, final prompt, parameters and seed, and identical
+            requests are answered from the cache. Default: None
+        deadline: Request deadline, cancelled by the route when the client
+            disconnects. Every decode stops within one token once it passes
+            (the partial story is returned, later generation passes are
+            skipped and deadline_exceeded is set) or is cancelled (raises
+            GenerationCancelled). Default: REQUEST_TIMEOUT from now
     
     Returns:
         Dictionary with:
@@ -279,10 +1083,15 @@ def generate_story_pipeline(
             "refined": bool,
             "score": Optional[float],
             "character_focus_required": bool,
+            "cached": bool,
+            "deadline_exceeded": bool,
+            "timings": Dict,  # total_ms, per-stage ms, generation calls
         }
     
     Raises:
         ValueError: If prompt is empty or invalid
+        TimeoutError: If the deadline passed before generation started
+        GenerationCancelled: If the deadline was cancelled
     
     Example:
         >>> result = generate_story_pipeline(
@@ -294,109 +1103,311 @@ def generate_story_pipeline(
         ... )
         >>> print(result["generated_text"])
     """
+    timer = StageTimer()
+    with timer.activate():
+        result = _run_story_pipeline(
+            user_id,
+            prompt,
+            genre,
+            twist,
+            refine,
+            measure,
+            temperature,
+            max_tokens,
+            candidates,
+            seed,
+            deadline if deadline is not None else Deadline(settings.REQUEST_TIMEOUT),
+        )
+    result["timings"] = timer.report()
+    return result
+
+
+def _run_story_pipeline(
+    user_id: str,
+    prompt: str,
+    genre: str,
+    twist: Optional[str],
+    refine: bool,
+    measure: bool,
+    temperature: float,
+    max_tokens: int,
+    candidates: int,
+    seed: Optional[int],
+    deadline: Deadline,
+) -> Dict:
+    """Pipeline steps of generate_story_pipeline, timed stage by stage."""
     logger.info(f"Starting story pipeline for user {user_id} (genre: {genre})")
     
-    # Validate input
-    is_valid, error = validate_story_text(prompt)
-    if not is_valid:
-        raise ValueError(f"Invalid prompt: {error}")
-    
-    # Normalize inputs
-    prompt = prompt.strip()
-    genre = genre.strip().lower() if genre else "scifi"
-    temperature = max(0.1, min(2.0, temperature))  # Clamp to valid range
-    max_tokens = max(50, min(1000, max_tokens))     # Clamp to valid range
+    with stage("validation"):
+        prompt, genre, temperature, max_tokens = _normalize_inputs(prompt, genre, temperature, max_tokens)
     
-    # STEP 1: Detect characters from prompt
-    logger.info("Step 1: Detecting characters from prompt")
-    detected_chars = get_characters(prompt)
-    logger.info(f"Detected {len(detected_chars)} characters: {detected_chars}")
+    prepared = _prepare_generation(user_id, prompt, genre, twist)
+    detected_chars = prepared["detected_characters"]
+    persisted_chars = prepared["persisted_characters"]
+    cleaned_prompt = prepared["cleaned_prompt"]
+    generation_prompt = prepared["generation_prompt"]
+    twist_applied = prepared["twist_applied"]
+    candidates = max(1, min(MAX_CANDIDATES, candidates))
+    focus_chars = _biased_characters(persisted_chars)
+    monitor = _presence_monitor(persisted_chars, max_tokens) if candidates == 1 else None
+    context_header = _rolling_header(genre, persisted_chars) if settings.ROLLING_CONTEXT_ENABLED else None
     
-    # STEP 2-3: Persist and retrieve characters
-    logger.info("Step 2-3: Persisting and retrieving user characters")
-    if detected_chars:
-        save_user_characters(user_id, detected_chars)
-    persisted_chars = get_user_characters(user_id)
-    logger.info(f"Persisted characters for user: {persisted_chars}")
-    
-    # STEP 4: Build enhanced prompt with character focus
-    logger.info("Step 4: Building enhanced prompt")
-    cleaned_prompt = clean_text(prompt)
-    truncated_prompt = truncate_text(cleaned_prompt, max_length=500)
-    
-    # Build base generation prompt
-    generation_prompt = f"""Continue this {genre} story in a compelling and coherent way.
-
-{("Focus on these characters: " + ", ".join(persisted_chars) + ". " if persisted_chars else "")}
-{"The story should revolve primarily around: " + persisted_chars[0] + "." if persisted_chars else ""}
-
-Story so far:
-{truncated_prompt}
-
-Continue the story:
-"""
+    # Seeded generations are deterministic: replay an identical earlier request
+    cache_key = None
+    if seed is not None and result_cache.enabled:
+        model = _model_version(genre)
+        with stage("cache_lookup"):
+            cache_key = result_cache.make_key(
+                model=model,
+                genre=genre,
+                prompt=generation_prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                refine=refine,
+                measure=measure,
+                candidates=candidates,
+                seed=seed,
+                character_bias=_character_bias_key(focus_chars),
+                presence_monitor=(
+                    (monitor.checkpoint_tokens, monitor.min_ratio) if monitor is not None else None
+                ),
+                rolling_tail=settings.ROLLING_CONTEXT_TAIL_TOKENS if context_header is not None else None,
+            )
+            cached = result_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Story pipeline served from result cache (seed={seed})")
+            return {
+                "genre": genre,
+                "detected_characters": detected_chars,
+                "persisted_characters": persisted_chars,
+                "twist_applied": twist_applied,
+                **cached,
+                "cached": True,
+                "deadline_exceeded": False,
+            }
     
-    # STEP 5: Add twist if requested
-    if twist and twist.strip():
-        logger.info(f"Step 5: Applying twist ({twist})")
-        main_char = persisted_chars[0] if persisted_chars else None
-        generation_prompt = apply_twist_to_prompt(generation_prompt, twist, main_char)
-        twist_applied = twist.lower()
+    # STEP 6: Generate
+    best_score = None
+    if candidates > 1:
+        logger.info(f"Step 6: Generating story (best of {candidates})")
+        with stage("generation"):
+            sampled = _generate_candidates_with_plotcraft_fallback(
+                generation_prompt,
+                genre,
+                candidates,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                prompt_prefix=_generation_prefix(genre),
+                seed=seed,
+                deadline=deadline,
+                characters=focus_chars,
+            )
+        with stage("ranking"):
+            ranked = _rank_candidates(sampled, persisted_chars, cleaned_prompt)
+        generated_text = ranked[0]["text"]
+        best_score = ranked[0]["score"]
+        logger.info(
+            f"Selected candidate: rank_score={ranked[0]['rank_score']:.3f}, "
+            f"character_presence={ranked[0]['character_presence']:.1%}"
+        )
     else:
-        twist_applied = None
+        logger.info("Step 6: Generating story")
+        with stage("generation"):
+            generated_text = _generate_with_plotcraft_fallback(
+                generation_prompt,
+                genre,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                prompt_prefix=_generation_prefix(genre),
+                seed=seed,
+                deadline=deadline,
+                characters=focus_chars,
+                monitor=monitor,
+                context_header=context_header,
+            )
     
-    # STEP 6: Generate
-    logger.info("Step 6: Generating story")
-    generated_text = _generate_with_plotcraft_fallback(
-        generation_prompt,
-        genre,
-        max_tokens=max_tokens,
-        temperature=temperature,
-    )
+    # Client gone: stop here. Out of time: keep the partial story and skip further passes
+    deadline.raise_if_cancelled()
+    
+    # STEP 9 (early): a first pass aborted at the presence checkpoint restarts with the focus prompt now
+    character_focus_required = False
+    if monitor is not None and monitor.aborted:
+        logger.warning(
+            f"Character focus lost after {monitor.tokens_at_abort} tokens "
+            f"({monitor.ratio:.1%} of {len(persisted_chars)} characters present). Restarting with character focus."
+        )
+        character_focus_stats.record_early_abort(max_tokens - monitor.tokens_at_abort)
+        regenerate = not deadline()
+        character_focus_stats.record(biased=focus_chars is not None, met=False, regenerated=regenerate)
+        if regenerate:
+            with stage("regeneration"):
+                generated_text = _regenerate_for_character_focus(
+                    generation_prompt,
+                    genre,
+                    persisted_chars,
+                    main_character=persisted_chars[0],
+                    max_tokens=max_tokens,
+                    seed=seed,
+                    deadline=deadline,
+                    bias_characters=focus_chars,
+                    context_header=context_header,
+                )
+            character_focus_required = True
+            deadline.raise_if_cancelled()
     
     # STEP 7: Optionally refine
     refined = False
-    if refine:
+    if refine and not deadline():
         logger.info("Step 7: Refining story")
-        generated_text = _refine_story(generated_text, genre, temperature=temperature * 0.7)
+        with stage("refine"):
+            generated_text = _refine_story(
+                generated_text, genre, temperature=temperature * 0.7, seed=seed, deadline=deadline
+            )
         refined = True
+        deadline.raise_if_cancelled()
     
     # STEP 9: Check character focus
-    all_present, presence_ratio = _check_character_presence(generated_text, persisted_chars)
-    character_focus_required = False
+    with stage("presence_check"):
+        all_present, presence_ratio = _check_character_presence(generated_text, persisted_chars)
     
-    if persisted_chars and not all_present and presence_ratio < 0.5:
+    # Best-of-N already ranked candidates by character presence; no sequential second pass.
+    # An early-aborted first pass was already restarted above.
+    first_pass = candidates == 1 and not (monitor is not None and monitor.aborted)
+    focus_lost = bool(persisted_chars) and not all_present and presence_ratio < 0.5
+    regenerate = first_pass and focus_lost and not deadline()
+    if first_pass and persisted_chars:
+        character_focus_stats.record(biased=focus_chars is not None, met=not focus_lost, regenerated=regenerate)
+    if regenerate:
         logger.warning(
             f"Character focus deteriorated: {presence_ratio:.1%} of {len(persisted_chars)} characters present. "
             f"Performing second-pass regeneration."
         )
-        generated_text = _regenerate_for_character_focus(
-            generation_prompt,
-            genre,
-            persisted_chars,
-            main_character=persisted_chars[0],
-            max_tokens=max_tokens,
-        )
+        with stage("regeneration"):
+            generated_text = _regenerate_for_character_focus(
+                generation_prompt,
+                genre,
+                persisted_chars,
+                main_character=persisted_chars[0],
+                max_tokens=max_tokens,
+                seed=seed,
+                deadline=deadline,
+                bias_characters=focus_chars,
+                context_header=context_header,
+            )
         character_focus_required = True
+        deadline.raise_if_cancelled()
     
     # STEP 8: Optionally score
     score = None
     if measure:
         logger.info("Step 8: Scoring story")
-        full_story = cleaned_prompt + " " + generated_text
-        score = calculate_score(full_story)
+        if best_score is not None and not refined:
+            score = best_score  # computed on the same full story during ranking
+        else:
+            full_story = cleaned_prompt + " " + generated_text
+            with stage("scoring"):
+                score = calculate_score(full_story)
     
+    deadline_exceeded = deadline.exceeded
+    if deadline_exceeded:
+        logger.warning("Story pipeline hit its deadline; returning partial output")
     logger.info(f"Story pipeline complete. Generated {len(generated_text)} characters.")
     
+    generated = {
+        "generated_text": generated_text.strip(),
+        "refined": refined,
+        "score": score,
+        "character_focus_required": character_focus_required,
+    }
+    # A partial result depends on timing, and a fallback's output is not the keyed model's
+    if cache_key is not None and not deadline_exceeded:
+        served_by = set(generation_backends())
+        if served_by - {model.split(":", 1)[0]}:
+            logger.info(f"Result not cached: keyed for {model} but served by {', '.join(sorted(served_by))}")
+        else:
+            with stage("cache_store"):
+                result_cache.put(cache_key, generated)
+    
     return {
         "genre": genre,
         "detected_characters": detected_chars,
         "persisted_characters": persisted_chars,
         "twist_applied": twist_applied,
-        "generated_text": generated_text.strip(),
-        "refined": refined,
-        "score": score,
-        "character_focus_required": character_focus_required,
+        **generated,
+        "cached": False,
+        "deadline_exceeded": deadline_exceeded,
+    }
+
+
+def generate_story_stream(
+    user_id: str,
+    prompt: str,
+    genre: str = "scifi",
+    twist: Optional[str] = None,
+    measure: bool = True,
+    temperature: float = 0.8,
+    max_tokens: int = 300,
+    deadline: Optional[Deadline] = None,
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    Streaming variant of generate_story_pipeline.
+    
+    Yields (event, payload) pairs in order:
+    - "metadata": genre, detected/persisted characters and twist, before generation
+    - "token": {"text": str} for each decoded chunk as it is produced
+    - "score": {"score": int} once generation finishes (only if measure=True)
+    - "done": final generated_text and character presence ratio
+    
+    Refinement and character-focus regeneration rewrite the whole continuation,
+    so they are not applied to streamed output. Generation stops when
+    `deadline` passes (the done event then has deadline_exceeded=True) or is
+    cancelled, e.g. because the client disconnected (raises GenerationCancelled).
+    
+    Raises:
+        ValueError: If prompt is empty or invalid
+        GenerationCancelled: If the deadline was cancelled
+    """
+    if deadline is None:
+        deadline = Deadline(settings.REQUEST_TIMEOUT)
+    logger.info(f"Starting streaming story pipeline for user {user_id} (genre: {genre})")
+    prompt, genre, temperature, max_tokens = _normalize_inputs(prompt, genre, temperature, max_tokens)
+    
+    prepared = _prepare_generation(user_id, prompt, genre, twist)
+    persisted_chars = prepared["persisted_characters"]
+    yield "metadata", {
+        "genre": genre,
+        "detected_characters": prepared["detected_characters"],
+        "persisted_characters": persisted_chars,
+        "twist_applied": prepared["twist_applied"],
+    }
+    
+    logger.info("Step 6: Streaming story")
+    chunks: List[str] = []
+    for chunk in _stream_with_plotcraft_fallback(
+        prepared["generation_prompt"],
+        genre,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        prompt_prefix=_generation_prefix(genre),
+        deadline=deadline,
+        characters=_biased_characters(persisted_chars),
+    ):
+        chunks.append(chunk)
+        yield "token", {"text": chunk}
+    deadline.raise_if_cancelled()
+    generated_text = "".join(chunks).strip()
+    
+    if measure:
+        logger.info("Step 8: Scoring story")
+        full_story = prepared["cleaned_prompt"] + " " + generated_text
+        yield "score", {"score": calculate_score(full_story)}
+    
+    _, presence_ratio = _check_character_presence(generated_text, persisted_chars)
+    logger.info(f"Streaming pipeline complete. Generated {len(generated_text)} characters.")
+    yield "done", {
+        "generated_text": generated_text,
+        "character_presence": round(presence_ratio, 3),
+        "deadline_exceeded": deadline.exceeded,
     }
 
 
@@ -463,10 +1474,7 @@ def continue_story_pipeline(story: str, genre: str, characters: List[str]) -> Tu
     
     Returns (continuation, score) tuple.
     """
-    prompt = f"""You are a creative AI storyteller.
-
-Continue this {genre} story.
-Maintain consistency with these characters: {characters}.
+    prompt = _legacy_continue_prefix(genre) + f"""{characters}.
 Do not repeat the original text.
 
 Story:
@@ -475,7 +1483,9 @@ Story:
 Continuation:
 """
     
-    continuation = _generate_with_plotcraft_fallback(prompt, genre, max_tokens=800)
+    continuation = _generate_with_plotcraft_fallback(
+        prompt, genre, max_tokens=800, prompt_prefix=_legacy_continue_prefix(genre)
+    )
     full_text = clean_text(story) + " " + continuation
     score = calculate_score(full_text)
     return continuation, score
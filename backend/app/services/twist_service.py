@@ -82,6 +82,30 @@ def apply_twist_to_prompt(
     if not base_prompt or not base_prompt.strip():
         raise ValueError("base_prompt cannot be empty")
     
+    # Append instruction to prompt
+    enhanced_prompt = f"{base_prompt}\n\n{twist_directive(twist_type, main_character)}"
+    
+    logger.info(f"Applied twist '{twist_type}' to prompt" + 
+                (f" (character: {main_character})" if main_character else ""))
+    
+    return enhanced_prompt
+
+
+def twist_directive(twist_type: str, main_character: Optional[str] = None) -> str:
+    """
+    Build the "[Story direction: ...]" line for a twist.
+    
+    Used on its own by the story pipeline's prompt builder, which places and
+    budgets it as a separate prompt section.
+    
+    Args:
+        twist_type: One of [unexpected, reversal, revelation, betrayal, discovery];
+            unknown types fall back to 'unexpected'
+        main_character: Optional character name. If provided, twist impacts this character.
+    
+    Returns:
+        Twist directive text
+    """
     # Normalize twist type
     twist_type = twist_type.strip().lower()
     
@@ -98,13 +122,7 @@ def apply_twist_to_prompt(
         char = main_character.strip()
         instruction = f"{instruction} This twist should directly impact {char}."
     
-    # Append instruction to prompt
-    enhanced_prompt = f"{base_prompt}\n\n[Story direction: {instruction}]"
-    
-    logger.info(f"Applied twist '{twist_type}' to prompt" + 
-                (f" (character: {main_character})" if main_character else ""))
-    
-    return enhanced_prompt
+    return f"[Story direction: {instruction}]"
 
 
 def validate_twist_type(twist_type: str) -> bool:
@@ -0,0 +1,195 @@
+"""
+Token-budgeted prompt assembly.
+
+Generation prompts are built from sections: an instruction header, the
+character line, an optional twist directive and the story so far, joined by
+fixed template glue. PromptBuilder measures every section with the serving
+model's tokenizer and gives each one an explicit token budget. Headers and
+directives keep their start, and the story keeps its most recent tokens. The
+assembled prompt always leaves at least `min_generation` tokens of the
+context window free to generate into.
+
+Template fragments repeat across requests, so their token ids are cached per
+backend (keyed by the caller's cache key, e.g. the model version).
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Hashable, List, Sequence, Tuple
+
+# Tokenized fragments kept per process (all backends together)
+FRAGMENT_CACHE_ENTRIES = 1024
+
+
+@dataclass(frozen=True)
+class PromptBudget:
+    """Token budget per prompt section, plus the generation room that must stay free."""
+
+    header: int = 48
+    characters: int = 48
+    twist: int = 64
+    story: int = 224
+    min_generation: int = 128
+
+    def scaled(self, factor: float) -> "PromptBudget":
+        """The same budget in other units (e.g. words instead of tokens)."""
+        return PromptBudget(*(max(1, int(value * factor)) for value in (
+            self.header, self.characters, self.twist, self.story, self.min_generation
+        )))
+
+
+@dataclass
+class BuiltPrompt:
+    """An assembled prompt and how the context window was spent."""
+
+    text: str
+    prompt_tokens: int
+    generation_budget: int  # context_size - prompt_tokens
+    section_tokens: Dict[str, int] = field(default_factory=dict)
+    truncated: List[str] = field(default_factory=list)  # sections cut to fit their budget
+
+
+def _head_words(head: str, longer: str) -> str:
+    """
+    A section cut after its first tokens. `longer` is the same cut one token
+    later; if that token continues the last word, the partial word is dropped.
+    """
+    following = longer[len(head) : len(head) + 1] if longer.startswith(head) else " "
+    if following and not following.isspace() and len(head.split()) > 1:
+        head = head.rsplit(None, 1)[0]
+    return head.rstrip() + "\n" if head.strip() else ""
+
+
+def _tail_words(tail: str, longer: str) -> str:
+    """A story cut to its last tokens; `longer` starts one token earlier (see _head_words)."""
+    preceding = longer[-len(tail) - 1 : -len(tail)] if tail and longer.endswith(tail) else " "
+    if preceding and not preceding.isspace() and len(tail.split()) > 1:
+        tail = tail.split(None, 1)[1]
+    return tail.strip()
+
+
+class _FragmentCache:
+    """Bounded LRU of token ids per (backend key, template fragment)."""
+
+    def __init__(self, max_entries: int = FRAGMENT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, str], Tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, text: str, encode: Callable[[str], Sequence]) -> Tuple:
+        with self._lock:
+            ids = self._entries.get((key, text))
+            if ids is not None:
+                self._entries.move_to_end((key, text))
+                return ids
+        ids = tuple(encode(text))
+        with self._lock:
+            self._entries[(key, text)] = ids
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return ids
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+fragment_cache = _FragmentCache()
+
+
+class PromptBuilder:
+    """
+    Assemble prompts section by section within token budgets.
+
+    Args:
+        encode: Text to token ids for the active tokenizer
+        decode: Token ids back to text (only used for sections that are cut)
+        context_size: The model's context window in tokens
+        budget: Per-section budgets and the minimum generation room
+        cache_key: Identifies the tokenizer for the fragment cache
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[str], Sequence],
+        decode: Callable[[Sequence], str],
+        context_size: int,
+        budget: PromptBudget = PromptBudget(),
+        cache_key: Hashable = None,
+    ):
+        self.encode = encode
+        self.decode = decode
+        self.context_size = context_size
+        self.budget = replace(budget, min_generation=min(budget.min_generation, context_size - 1))
+        self.cache_key = cache_key
+
+    def fragment(self, text: str) -> Tuple:
+        """Token ids of a template fragment (cached)."""
+        return fragment_cache.get(self.cache_key, text, self.encode) if text else ()
+
+    def build(
+        self,
+        header: str,
+        characters: str = "",
+        twist: str = "",
+        story: str = "",
+        story_label: str = "",
+        footer: str = "",
+    ) -> BuiltPrompt:
+        """
+        Assemble header + characters + twist + story_label + story + footer.
+
+        `story_label` and `footer` are fixed glue and are never cut. The other
+        sections are cut to their budget, and the story additionally to what
+        is left once the minimum generation room is reserved. The final text
+        is re-measured, since joined sections can tokenize slightly
+        differently, and the story is trimmed further if that is needed to
+        keep the guarantee.
+        """
+        available = self.context_size - self.budget.min_generation
+        available -= len(self.fragment(story_label)) + len(self.fragment(footer))
+
+        sections: Dict[str, str] = {}
+        section_tokens: Dict[str, int] = {}
+        truncated: List[str] = []
+        for name, text, limit in (
+            ("header", header, self.budget.header),
+            ("characters", characters, self.budget.characters),
+            ("twist", twist, self.budget.twist),
+        ):
+            ids = self.fragment(text)
+            keep = max(0, min(limit, available))
+            if len(ids) > keep:
+                truncated.append(name)
+                text = _head_words(self.decode(list(ids[:keep])), self.decode(list(ids[: keep + 1]))) if keep else ""
+                ids = ids[:keep]
+            sections[name] = text
+            section_tokens[name] = len(ids)
+            available -= len(ids)
+
+        story_ids = list(self.encode(story)) if story else []
+        keep = max(0, min(self.budget.story, available))
+        while True:
+            story_text = story
+            if len(story_ids) > keep:
+                start = len(story_ids) - keep
+                story_text = (
+                    _tail_words(self.decode(story_ids[start:]), self.decode(story_ids[start - 1 :])) if keep else ""
+                )
+            text = sections["header"] + sections["characters"] + sections["twist"] + story_label + story_text + footer
+            prompt_tokens = len(self.encode(text))
+            overflow = prompt_tokens - (self.context_size - self.budget.min_generation)
+            if overflow <= 0 or keep == 0:
+                break
+            keep = max(0, min(keep, len(story_ids)) - overflow)
+        if len(story_ids) > keep:
+            truncated.append("story")
+        section_tokens["story"] = min(keep, len(story_ids))
+        return BuiltPrompt(
+            text=text,
+            prompt_tokens=prompt_tokens,
+            generation_budget=self.context_size - prompt_tokens,
+            section_tokens=section_tokens,
+            truncated=truncated,
+        )
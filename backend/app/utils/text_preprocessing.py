@@ -1,7 +1,9 @@
 """Text preprocessing helpers for story pipelines."""
 
 import re
-from typing import Optional
+from typing import Callable, List, Optional, Sequence, Tuple
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+")
 
 
 def clean_text(text: Optional[str]) -> str:
@@ -25,3 +27,83 @@ def truncate_text(text: str, max_length: int = 500) -> str:
 def count_words(text: str) -> int:
     """Count words (split on whitespace)."""
     return len(text.split()) if text and text.strip() else 0
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences after ., ! or ? (and any closing quote/bracket)."""
+    if not text or not text.strip():
+        return []
+    return [s.strip() for s in _SENTENCE_END.split(text.strip()) if s.strip()]
+
+
+def sentence_windows(token_counts: Sequence[int], max_tokens: int, overlap_tokens: int = 0) -> List[Tuple[int, int, int]]:
+    """
+    Group consecutive sentences into windows of at most `max_tokens` tokens.
+
+    Each window after the first starts with trailing sentences of the previous
+    one, up to `overlap_tokens`, and always adds at least one new sentence (a
+    sentence longer than `max_tokens` gets a window of its own).
+
+    Args:
+        token_counts: Token count per sentence
+        max_tokens: Token budget per window
+        overlap_tokens: Token budget for sentences repeated from the previous window
+
+    Returns:
+        (start, end, overlap) sentence index ranges; sentences[start:end] form the
+        window and its first `overlap` sentences repeat the previous window.
+    """
+    windows: List[Tuple[int, int, int]] = []
+    start, prev_end, n = 0, 0, len(token_counts)
+    while prev_end < n:
+        end, used = start, 0
+        while end < n and (end <= prev_end or used + token_counts[end] <= max_tokens):
+            used += token_counts[end]
+            end += 1
+        windows.append((start, end, prev_end - start))
+        prev_end = end
+        carried = 0
+        start = end
+        while start - 1 > windows[-1][0] and carried + token_counts[start - 1] <= overlap_tokens:
+            start -= 1
+            carried += token_counts[start]
+    return windows
+
+
+def split_long_sentences(
+    sentences: Sequence[str],
+    token_counts: Sequence[int],
+    max_tokens: int,
+    count_tokens: Callable[[List[str]], List[int]],
+) -> Tuple[List[str], List[int]]:
+    """
+    Split sentences longer than `max_tokens` into word-boundary pieces that fit.
+
+    A long sentence is cut into evenly sized runs of words, and any piece that
+    still measures over `max_tokens` is cut again. Only a single word longer
+    than `max_tokens` is left over budget.
+
+    Args:
+        sentences: Sentences in order
+        token_counts: Token count per sentence
+        max_tokens: Token budget per piece
+        count_tokens: Per-text token counter used to measure the pieces
+
+    Returns:
+        (sentences, token_counts) with every over-long sentence replaced by its pieces.
+    """
+    out_sentences: List[str] = []
+    out_counts: List[int] = []
+    pending = list(zip(sentences, token_counts))[::-1]
+    while pending:
+        sentence, tokens = pending.pop()
+        words = sentence.split()
+        if tokens <= max_tokens or len(words) < 2:
+            out_sentences.append(sentence)
+            out_counts.append(tokens)
+            continue
+        parts = min(len(words), -(-tokens // max_tokens))
+        bounds = [len(words) * i // parts for i in range(parts + 1)]
+        pieces = [" ".join(words[a:b]) for a, b in zip(bounds, bounds[1:])]
+        pending.extend(reversed(list(zip(pieces, count_tokens(pieces)))))
+    return out_sentences, out_counts
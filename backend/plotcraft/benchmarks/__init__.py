@@ -0,0 +1 @@
+# PlotCraft benchmarks package
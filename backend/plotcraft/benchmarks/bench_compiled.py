@@ -0,0 +1,93 @@
+"""
+Compiled (torch.compile, shape-bucketed) vs eager decode benchmark for PlotCraft models.
+
+For each genre and prompt length, decodes with the eager loop
+(decoding.decode) and with a CompiledDecoder whose graphs were compiled up
+front, and reports prefill latency, per-token decode latency and the
+per-token speedup. Per-token latency is (time for N tokens - time for 1
+token) / (N - 1), so the prefill is not counted twice. Compile time for all
+buckets is reported separately: it is paid once at startup, not per request.
+
+Usage (from backend/):
+    python -m plotcraft.benchmarks.bench_compiled
+    python -m plotcraft.benchmarks.bench_compiled --genres horror --prompt-tokens 50 200
+    python -m plotcraft.benchmarks.bench_compiled --random-init --buckets 256 512
+"""
+
+import argparse
+import time
+
+import torch
+
+from plotcraft.src.compiled import DEFAULT_BUCKETS, CompiledDecoder
+from plotcraft.src.decoding import DecodeState, decode
+from plotcraft.src.model import build_model
+from plotcraft.src.plotcraft_generator import _ensure_loaded
+
+SAMPLING = dict(temperature=0.8, top_k=40, top_p=0.95, repetition_penalty=1.2, no_repeat_ngram_size=3)
+
+
+def _load(genre: str, args):
+    if args.random_init:
+        torch.manual_seed(0)
+        return build_model(args.vocab_size, 512).eval(), torch.device("cpu"), args.vocab_size
+    model, tokenizer, device = _ensure_loaded(genre)
+    return model, device, tokenizer.vocab_size()
+
+
+def _time(fn, prompt, max_new_tokens, repeats):
+    best = float("inf")
+    for seed in range(repeats):
+        torch.manual_seed(seed)
+        state = DecodeState(input_ids=prompt, max_new_tokens=max_new_tokens, **SAMPLING)
+        start = time.perf_counter()
+        fn(state)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _latency_ms(fn, prompt, args):
+    """(prefill ms, per-token decode ms)"""
+    first = _time(fn, prompt, 1, args.repeats)
+    full = _time(fn, prompt, args.max_new_tokens, args.repeats)
+    return first * 1000, (full - first) / (args.max_new_tokens - 1) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compiled vs eager PlotCraft decoding")
+    parser.add_argument("--genres", nargs="+", default=["horror", "scifi"])
+    parser.add_argument("--prompt-tokens", nargs="+", type=int, default=[60, 200])
+    parser.add_argument("--max-new-tokens", type=int, default=100)
+    parser.add_argument("--buckets", nargs="+", type=int, default=list(DEFAULT_BUCKETS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--random-init", action="store_true", help="Use a randomly initialised model")
+    parser.add_argument("--vocab-size", type=int, default=8000, help="Vocab size for --random-init")
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    header = (
+        f"{'genre':<7} {'prompt':>6} {'eager prefill ms':>17} {'compiled prefill ms':>20} "
+        f"{'eager ms/tok':>13} {'compiled ms/tok':>16} {'speedup':>8}"
+    )
+    for genre in args.genres:
+        model, device, vocab_size = _load(genre, args)
+        compiled = CompiledDecoder(model, device, buckets=args.buckets)
+        print(f"{genre}: compiled {len(compiled.buckets)} buckets {compiled.buckets} in {compiled.warmup():.1f}s")
+        if not compiled.compiled:
+            print(f"{genre}: compilation failed, the compiled column is the eager fallback")
+        print(header)
+        print("-" * len(header))
+        for prompt_tokens in args.prompt_tokens:
+            prompt = [(i * 7919 + 1) % vocab_size for i in range(prompt_tokens)]
+            eager_prefill, eager_tok = _latency_ms(lambda s: decode(model, s, device), prompt, args)
+            comp_prefill, comp_tok = _latency_ms(compiled.decode, prompt, args)
+            print(
+                f"{genre:<7} {prompt_tokens:>6} {eager_prefill:>17.1f} {comp_prefill:>20.1f} "
+                f"{eager_tok:>13.2f} {comp_tok:>16.2f} {eager_tok / comp_tok:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Decode throughput benchmark for PlotCraft models.
+
+Compares tokens/sec for HF `model.generate`, the first-party decode loop
+(decoding.decode), the continuous-batching scheduler (batching.py) and, when the
+genre has an exported model.onnx, the ONNX Runtime backend (onnx_backend.py).
+
+Usage (from backend/):
+    python -m plotcraft.benchmarks.bench_decode --genre scifi
+    python -m plotcraft.benchmarks.bench_decode --random-init --vocab-size 8000
+"""
+
+import argparse
+import os
+import time
+
+import torch
+
+from plotcraft.src.batching import BatchScheduler, GenerationJob
+from plotcraft.src.decoding import DecodeState, decode
+from plotcraft.src.model import build_model
+from plotcraft.src.onnx_backend import OnnxModel, onnx_path_for, ort
+from plotcraft.src.plotcraft_generator import _ensure_loaded, _resolve_paths
+
+SAMPLING = dict(temperature=0.8, top_k=40, top_p=0.95, repetition_penalty=1.2, no_repeat_ngram_size=3)
+
+
+def _load(args):
+    if args.random_init:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        torch.manual_seed(0)
+        model = build_model(args.vocab_size, 512).to(device).eval()
+        return model, args.vocab_size, device
+    model, tokenizer, device = _ensure_loaded(args.genre)
+    return model, tokenizer.vocab_size(), device
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    tokens = fn()
+    return tokens, time.perf_counter() - start
+
+
+def bench_hf(model, prompt, args, device):
+    with torch.no_grad():
+        out = model.generate(
+            torch.tensor([prompt], device=device),
+            max_new_tokens=args.max_new_tokens,
+            min_new_tokens=args.max_new_tokens,
+            do_sample=True,
+            pad_token_id=0,
+            **SAMPLING,
+        )
+    return out.shape[1] - len(prompt)
+
+
+def bench_decode(model, prompt, args, device):
+    return len(decode(model, DecodeState(input_ids=prompt, max_new_tokens=args.max_new_tokens, **SAMPLING), device))
+
+
+def bench_batched(model, prompt, args, device):
+    scheduler = BatchScheduler(model, device, name="bench", max_batch_size=args.batch_size)
+    futures = [
+        scheduler.submit(GenerationJob(input_ids=prompt, max_new_tokens=args.max_new_tokens, **SAMPLING))
+        for _ in range(args.batch_size)
+    ]
+    tokens = sum(len(f.result()) for f in futures)
+    scheduler.stop()
+    return tokens
+
+
+def bench_onnx(onnx_model):
+    def run(model, prompt, args, device):
+        state = DecodeState(input_ids=prompt, max_new_tokens=args.max_new_tokens, **SAMPLING)
+        return len(onnx_model.decode(state))
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PlotCraft decode throughput")
+    parser.add_argument("--genre", default="scifi", help="Genre checkpoint to load")
+    parser.add_argument("--random-init", action="store_true", help="Use a randomly initialised model")
+    parser.add_argument("--vocab-size", type=int, default=8000, help="Vocab size for --random-init")
+    parser.add_argument("--prompt-tokens", type=int, default=64)
+    parser.add_argument("--max-new-tokens", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=8, help="Concurrent jobs for the scheduler run")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    model, vocab_size, device = _load(args)
+    prompt = [(i * 7919) % vocab_size for i in range(1, args.prompt_tokens + 1)]
+    print(f"Device: {device} | prompt={args.prompt_tokens} tokens | new={args.max_new_tokens} tokens")
+
+    runs = [
+        ("hf generate", bench_hf),
+        ("decode()", bench_decode),
+        (f"scheduler x{args.batch_size}", bench_batched),
+    ]
+    onnx_path = onnx_path_for(_resolve_paths(args.genre)[0])
+    if not args.random_init and ort is not None and os.path.exists(onnx_path):
+        runs.append(("onnx decode", bench_onnx(OnnxModel(onnx_path))))
+    for label, fn in runs:
+        fn(model, prompt, args, device)  # warm-up
+        best = 0.0
+        for _ in range(args.repeats):
+            tokens, elapsed = _timed(lambda: fn(model, prompt, args, device))
+            best = max(best, tokens / elapsed)
+        print(f"{label:<16} {best:10.1f} tokens/sec")
+
+
+if __name__ == "__main__":
+    main()
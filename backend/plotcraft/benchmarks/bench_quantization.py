@@ -0,0 +1,114 @@
+"""
+Int8 quantization report for PlotCraft genre models.
+
+For each genre checkpoint, compares the fp32 model with its int8 dynamically
+quantized version: prefill latency, decode tokens/sec and validation perplexity
+on the genre's val_blocks (built by build_dataset.py). The perplexity delta is
+the quality cost of serving with PLOTCRAFT_QUANTIZATION=int8.
+
+Usage (from backend/):
+    python -m plotcraft.benchmarks.bench_quantization
+    python -m plotcraft.benchmarks.bench_quantization --genres horror --max-blocks 50
+"""
+
+import argparse
+import math
+import os
+import time
+
+import sentencepiece as spm
+import torch
+
+# Training dependency (requirements-train.txt); needed only for the perplexity columns
+try:
+    from datasets import load_from_disk
+except ImportError:
+    load_from_disk = None  # type: ignore
+
+from plotcraft.src.decoding import DecodeState, decode
+from plotcraft.src.checkpoint_io import load_checkpoint
+from plotcraft.src.plotcraft_generator import SUPPORTED_GENRES, _BASE, _resolve_paths
+from plotcraft.src.quantization import load_quantized
+
+
+def _val_dir(genre: str) -> str:
+    """val_blocks for a genre (scifi was trained from the un-namespaced datasets/)."""
+    namespaced = os.path.join(_BASE, f"datasets_{genre}", "val_blocks")
+    if os.path.isdir(namespaced) or genre != "scifi":
+        return namespaced
+    return os.path.join(_BASE, "datasets", "val_blocks")
+
+
+def perplexity(model, val_path: str, max_blocks: int) -> float:
+    """Mean-loss perplexity over the first `max_blocks` validation blocks."""
+    dataset = load_from_disk(val_path)
+    dataset.set_format(type="torch")
+    total = 0.0
+    count = 0
+    with torch.no_grad():
+        for i in range(min(max_blocks, len(dataset))):
+            inputs = dataset[i]["input_ids"].long().unsqueeze(0)
+            total += model(input_ids=inputs, labels=inputs).loss.item()
+            count += 1
+    return math.exp(total / max(1, count))
+
+
+def latency(model, vocab_size: int, args):
+    """(prefill seconds, decode tokens/sec) for a fixed synthetic prompt."""
+    prompt = [(i * 7919) % vocab_size for i in range(1, args.prompt_tokens + 1)]
+    with torch.no_grad():
+        model(input_ids=torch.tensor([prompt]))  # warm-up
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            model(input_ids=torch.tensor([prompt]))
+        prefill = (time.perf_counter() - start) / args.repeats
+
+    torch.manual_seed(0)
+    start = time.perf_counter()
+    generated = decode(model, DecodeState(input_ids=prompt, max_new_tokens=args.max_new_tokens))
+    return prefill, len(generated) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fp32 and int8 PlotCraft models")
+    parser.add_argument("--genres", nargs="+", default=SUPPORTED_GENRES)
+    parser.add_argument("--max-blocks", type=int, default=100, help="Validation blocks per genre")
+    parser.add_argument("--prompt-tokens", type=int, default=128)
+    parser.add_argument("--max-new-tokens", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    if load_from_disk is None:
+        print("datasets not installed (pip install -r plotcraft/requirements-train.txt); skipping perplexity")
+    header = f"{'genre':<8} {'mode':<5} {'prefill ms':>11} {'decode tok/s':>13} {'val ppl':>9} {'ppl delta':>10}"
+    print(header)
+    print("-" * len(header))
+
+    for genre in args.genres:
+        model_path, tok_path = _resolve_paths(genre)
+        if not (os.path.exists(model_path) and os.path.exists(tok_path)):
+            print(f"{genre:<8} skipped (checkpoint or tokenizer missing)")
+            continue
+        vocab_size = spm.SentencePieceProcessor(model_file=tok_path).vocab_size()
+
+        models = [
+            ("fp32", load_checkpoint(model_path, vocab_size, 512)),
+            ("int8", load_quantized(model_path, vocab_size, 512)),
+        ]
+
+        val_path = _val_dir(genre)
+        base_ppl = None
+        for mode, model in models:
+            prefill, tok_s = latency(model, vocab_size, args)
+            if load_from_disk is not None and os.path.isdir(val_path):
+                ppl = perplexity(model, val_path, args.max_blocks)
+                base_ppl = ppl if base_ppl is None else base_ppl
+                ppl_cols = f"{ppl:>9.2f} {ppl - base_ppl:>+10.2f}"
+            else:
+                ppl_cols = f"{'n/a':>9} {'n/a':>10}"
+            print(f"{genre:<8} {mode:<5} {prefill * 1000:>11.1f} {tok_s:>13.1f} {ppl_cols}")
+
+
+if __name__ == "__main__":
+    main()
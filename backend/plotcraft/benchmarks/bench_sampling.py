@@ -0,0 +1,128 @@
+"""
+Sampling micro-benchmark for PlotCraft decode batches.
+
+Times one sampling step (logits processing + multinomial draw) over a
+heterogeneous batch, where every row has its own temperature / top-k / top-p /
+repetition penalty / n-gram size, three ways:
+
+- hf:        HF's logits processor chain, built and run per row (the only way
+             it supports per-row parameters)
+- per-row:   decoding.process_logits per row, stacked for one multinomial
+             (the scheduler's previous step)
+- fused:     sampling.SamplingBatch over the whole (B, V) matrix
+
+No model is needed; logits are random. Usage (from backend/):
+    python -m plotcraft.benchmarks.bench_sampling
+    python -m plotcraft.benchmarks.bench_sampling --batch-sizes 1 8 32 64 --vocab-size 8000
+    python -m plotcraft.benchmarks.bench_sampling --uniform   # every row uses the serving settings
+"""
+
+import argparse
+import random
+import time
+
+import torch
+from transformers import (
+    LogitsProcessorList,
+    NoRepeatNGramLogitsProcessor,
+    RepetitionPenaltyLogitsProcessor,
+    TemperatureLogitsWarper,
+    TopKLogitsWarper,
+    TopPLogitsWarper,
+)
+
+from plotcraft.src.decoding import DecodeState, process_logits
+from plotcraft.src.sampling import SamplingBatch
+
+# Per-row settings cycled across the batch (the first is the serving default)
+PARAMS = [
+    dict(temperature=0.8, top_k=40, top_p=0.95, repetition_penalty=1.2, no_repeat_ngram_size=3),
+    dict(temperature=1.0, top_k=50, top_p=0.9, repetition_penalty=1.1, no_repeat_ngram_size=2),
+    dict(temperature=0.7, top_k=20, top_p=1.0, repetition_penalty=1.3, no_repeat_ngram_size=3),
+    dict(temperature=1.2, top_k=0, top_p=0.8, repetition_penalty=1.0, no_repeat_ngram_size=0),
+]
+
+
+def _states(batch_size: int, args):
+    rng = random.Random(0)
+    params = PARAMS[:1] if args.uniform else PARAMS
+    states = []
+    for i in range(batch_size):
+        prompt = [rng.randrange(args.vocab_size) for _ in range(args.context)]
+        state = DecodeState(input_ids=prompt, max_new_tokens=args.steps, **params[i % len(params)])
+        state.start()
+        states.append(state)
+    return states
+
+
+def _hf_processors(state: DecodeState) -> LogitsProcessorList:
+    processors = LogitsProcessorList()
+    if state.repetition_penalty != 1.0:
+        processors.append(RepetitionPenaltyLogitsProcessor(state.repetition_penalty))
+    if state.no_repeat_ngram_size > 0:
+        processors.append(NoRepeatNGramLogitsProcessor(state.no_repeat_ngram_size))
+    if state.temperature != 1.0:
+        processors.append(TemperatureLogitsWarper(state.temperature))
+    if state.top_k > 0:
+        processors.append(TopKLogitsWarper(state.top_k))
+    if state.top_p < 1.0:
+        processors.append(TopPLogitsWarper(state.top_p))
+    return processors
+
+
+def step_hf(logits, states, _batch):
+    rows = []
+    for i, state in enumerate(states):
+        ids = torch.tensor([state.tokens])
+        rows.append(_hf_processors(state)(ids, logits[i : i + 1].clone())[0].softmax(dim=-1))
+    return torch.multinomial(torch.stack(rows), num_samples=1).squeeze(1)
+
+
+def step_per_row(logits, states, _batch):
+    rows = [process_logits(logits[i].clone(), state).softmax(dim=-1) for i, state in enumerate(states)]
+    return torch.multinomial(torch.stack(rows), num_samples=1).squeeze(1)
+
+
+def step_fused(logits, states, batch):
+    return batch.sample(logits.clone(), states)
+
+
+def _time(step, batch_size: int, args) -> float:
+    """Mean milliseconds per sampling step."""
+    states = _states(batch_size, args)
+    batch = SamplingBatch.from_states(states, args.vocab_size, torch.device("cpu"))
+    generator = torch.Generator().manual_seed(0)
+    logits = [torch.randn(batch_size, args.vocab_size, generator=generator) * 3 for _ in range(args.steps)]
+    torch.manual_seed(0)
+    start = time.perf_counter()
+    with torch.no_grad():
+        for scores in logits:
+            for state, token in zip(states, step(scores, states, batch).tolist()):
+                state.append(token)
+    return (time.perf_counter() - start) * 1000 / args.steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched vs per-row sampling")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--vocab-size", type=int, default=8000)
+    parser.add_argument("--context", type=int, default=256, help="Prompt tokens per row")
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--uniform", action="store_true", help="Give every row the serving settings")
+    args = parser.parse_args()
+
+    header = f"{'batch':>5} {'hf ms':>9} {'per-row ms':>11} {'fused ms':>9} {'vs hf':>7} {'vs per-row':>11}"
+    print(header)
+    print("-" * len(header))
+    for batch_size in args.batch_sizes:
+        hf = _time(step_hf, batch_size, args)
+        per_row = _time(step_per_row, batch_size, args)
+        fused = _time(step_fused, batch_size, args)
+        print(
+            f"{batch_size:>5} {hf:>9.2f} {per_row:>11.2f} {fused:>9.2f} "
+            f"{hf / fused:>6.1f}x {per_row / fused:>10.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Prompt-lookup speculative decoding benchmark for PlotCraft models.
+
+For each genre, decodes story prompts that name characters and places with the
+plain loop (decoding.decode) and with speculative_decode, and reports accepted
+draft tokens per verification step, generated tokens per forward pass and the
+end-to-end speedup. Runs once with the serving sampling settings and once with
+the n-gram ban off, since no_repeat_ngram_size=3 caps verbatim copies at two
+tokens.
+
+Usage (from backend/):
+    python -m plotcraft.benchmarks.bench_speculative
+    python -m plotcraft.benchmarks.bench_speculative --genres horror --max-new-tokens 300
+    python -m plotcraft.benchmarks.bench_speculative --random-init   # overhead only
+
+An untrained model does not copy from its prompt, so --random-init shows the
+cost of drafting and verification, not the speedup.
+"""
+
+import argparse
+import time
+
+import torch
+
+from plotcraft.src.decoding import DecodeState, decode
+from plotcraft.src.model import build_model
+from plotcraft.src.plotcraft_generator import _ensure_loaded
+from plotcraft.src.speculative import SpeculativeStats, speculative_decode
+
+PROMPTS = {
+    "horror": (
+        "Margaret Holloway locked the cellar door of Blackwood Manor and listened. "
+        "Below her, something scratched at the boards. Margaret Holloway had heard that sound "
+        "once before, the night her brother Thomas vanished from Blackwood Manor."
+    ),
+    "scifi": (
+        "Captain Elena Voss brought the Meridian out of jump above Kepler Station. "
+        "The station did not answer. Captain Elena Voss ordered Lieutenant Okafor to sweep "
+        "Kepler Station for life signs while the Meridian held position."
+    ),
+}
+
+SAMPLING = dict(temperature=0.8, top_k=40, top_p=0.95, repetition_penalty=1.2)
+
+
+def _load(genre: str, args):
+    if args.random_init:
+        torch.manual_seed(0)
+        return build_model(args.vocab_size, 512).eval(), None, torch.device("cpu")
+    return _ensure_loaded(genre)
+
+
+def _encode(tokenizer, text: str, vocab_size: int):
+    if tokenizer is not None:
+        return tokenizer.encode(text, out_type=int)
+    # --random-init: one id per distinct word, keeping the prompt's repetitions
+    ids = {}
+    return [ids.setdefault(word, (len(ids) * 7919 + 1) % vocab_size) for word in text.split()]
+
+
+def _run(fn, prompt, no_repeat, args):
+    best = float("inf")
+    for seed in range(args.repeats):
+        torch.manual_seed(seed)
+        state = DecodeState(
+            input_ids=prompt, max_new_tokens=args.max_new_tokens, no_repeat_ngram_size=no_repeat, **SAMPLING
+        )
+        start = time.perf_counter()
+        fn(state)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt-lookup speculative decoding")
+    parser.add_argument("--genres", nargs="+", default=list(PROMPTS))
+    parser.add_argument("--max-new-tokens", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--random-init", action="store_true", help="Use a randomly initialised model")
+    parser.add_argument("--vocab-size", type=int, default=8000, help="Vocab size for --random-init")
+    args = parser.parse_args()
+
+    header = (
+        f"{'genre':<7} {'ngram ban':>9} {'decode tok/s':>13} {'spec tok/s':>11} "
+        f"{'accepted/step':>14} {'tokens/fwd':>11} {'speedup':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for genre in args.genres:
+        model, tokenizer, device = _load(genre, args)
+        vocab_size = args.vocab_size if tokenizer is None else tokenizer.vocab_size()
+        prompt = _encode(tokenizer, PROMPTS[genre], vocab_size)
+
+        for no_repeat in (3, 0):
+            baseline = _run(lambda s: decode(model, s, device), prompt, no_repeat, args)
+            stats = SpeculativeStats()
+            spec = _run(lambda s: speculative_decode(model, s, device, stats=stats), prompt, no_repeat, args)
+            forwards = stats.steps + args.repeats  # verification steps + one prefill per run
+            print(
+                f"{genre:<7} {no_repeat:>9} {args.max_new_tokens / baseline:>13.1f} "
+                f"{args.max_new_tokens / spec:>11.1f} {stats.accepted / max(1, stats.steps):>14.2f} "
+                f"{stats.tokens / forwards:>11.2f} {baseline / spec:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
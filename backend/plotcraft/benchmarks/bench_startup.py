@@ -0,0 +1,122 @@
+"""
+Cold-load benchmark for PlotCraft genre checkpoints.
+
+Each load runs in a fresh Python process so peak RSS is not polluted by
+earlier runs. Modes:
+    legacy       random-init build_model + full torch.load (the old loader)
+    mmap         meta-device skeleton + torch.load(mmap=True) of model.pt
+    safetensors  meta-device skeleton + model.safetensors (needs a conversion:
+                 python -m plotcraft.src.checkpoint_io)
+
+"peak RSS" is the process high-water mark; "load RSS" is the part added by
+the load itself (peak minus RSS after importing torch/transformers).
+
+Usage (from backend/):
+    python -m plotcraft.benchmarks.bench_startup
+    python -m plotcraft.benchmarks.bench_startup --genres horror --repeats 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MODES = ("legacy", "mmap", "safetensors")
+
+
+def _rss_mb() -> float:
+    """Current resident set size in MB (Linux /proc; falls back to peak)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def child(mode: str, genre: str) -> None:
+    """Load one genre once and print timings as JSON (runs in a subprocess)."""
+    import time
+
+    import sentencepiece as spm
+    import torch
+    from transformers.utils import logging as hf_logging
+
+    from plotcraft.src.checkpoint_io import load_checkpoint
+    from plotcraft.src.model import build_model
+    from plotcraft.src.plotcraft_generator import _resolve_paths
+
+    hf_logging.set_verbosity_error()
+    model_path, tok_path = _resolve_paths(genre)
+    vocab_size = spm.SentencePieceProcessor(model_file=tok_path).vocab_size()
+    base_rss = _rss_mb()
+
+    start = time.perf_counter()
+    if mode == "legacy":
+        model = build_model(vocab_size, 512)
+        model.load_state_dict(torch.load(model_path, map_location="cpu"))
+        model.eval()
+    else:
+        model = load_checkpoint(model_path, vocab_size, 512, prefer_safetensors=mode == "safetensors")
+    elapsed = time.perf_counter() - start
+
+    # Touch every weight once so mapped pages are counted like a first request would
+    with torch.no_grad():
+        model(input_ids=torch.tensor([[1, 2, 3]]))
+    print(json.dumps({
+        "load_s": elapsed,
+        "peak_mb": _peak_rss_mb(),
+        "load_mb": _peak_rss_mb() - base_rss,
+    }))
+
+
+def run(mode: str, genre: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "plotcraft.benchmarks.bench_startup", "--child", mode, genre],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    from plotcraft.src.checkpoint_io import safetensors_path_for
+    from plotcraft.src.plotcraft_generator import SUPPORTED_GENRES, _resolve_paths
+
+    parser = argparse.ArgumentParser(description="Benchmark PlotCraft checkpoint cold-load time and memory")
+    parser.add_argument("--genres", nargs="+", default=SUPPORTED_GENRES)
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh processes per mode (best time reported)")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "GENRE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    header = f"{'genre':<8} {'mode':<12} {'load ms':>9} {'peak RSS MB':>12} {'load RSS MB':>12}"
+    print(header)
+    print("-" * len(header))
+    for genre in args.genres:
+        model_path, tok_path = _resolve_paths(genre)
+        if not (os.path.exists(model_path) and os.path.exists(tok_path)):
+            print(f"{genre:<8} skipped (checkpoint or tokenizer missing)")
+            continue
+        for mode in MODES:
+            if mode == "safetensors" and not os.path.exists(safetensors_path_for(model_path)):
+                print(f"{genre:<8} {mode:<12} skipped (run python -m plotcraft.src.checkpoint_io)")
+                continue
+            results = [run(mode, genre) for _ in range(args.repeats)]
+            best = min(results, key=lambda r: r["load_s"])
+            peak = min(r["peak_mb"] for r in results)
+            load = min(r["load_mb"] for r in results)
+            print(f"{genre:<8} {mode:<12} {best['load_s'] * 1000:>9.1f} {peak:>12.1f} {load:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
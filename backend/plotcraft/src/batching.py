@@ -0,0 +1,329 @@
+"""
+Continuous batching for PlotCraft generation.
+
+One BatchScheduler runs per genre model. Requests submitted from any thread are
+merged into a single running decode batch at the token-step level: new sequences
+are prefilled and admitted between steps, finished sequences are retired, and every
+sequence keeps its own sampling parameters (temperature, top_k, top_p,
+repetition_penalty, no_repeat_ngram_size, max_new_tokens).
+
+The batch KV cache is kept left-padded so all rows share one sequence axis; an
+attention mask hides the padding and per-row position ids keep each sequence's
+positions identical to an unbatched decode. N-gram bookkeeping and the
+preallocated KV cache are shared with the single-sequence loop in decoding.py;
+logits processing runs on the whole batch at once (sampling.SamplingBatch).
+"""
+
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import torch
+except ImportError:
+    torch = None  # type: ignore
+
+from .compiled import DEFAULT_BUCKETS, CompiledRunner
+from .decoding import DecodeState, KVCache, prefill
+from .sampling import SamplingBatch
+from .speculative import SpeculativeRunner
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on rows decoded together in one forward pass
+DEFAULT_MAX_BATCH_SIZE = 8
+
+
+@dataclass
+class GenerationJob(DecodeState):
+    """A single generation request tracked by the scheduler."""
+
+    future: Future = field(default_factory=Future)
+
+
+class BatchScheduler:
+    """
+    Token-level continuous batching scheduler for one PlotCraft model.
+
+    Jobs are submitted from request threads and decoded together on a single
+    background thread that owns the model and the batch KV cache.
+    """
+
+    def __init__(self, model, device, name: str = "", max_batch_size: int = DEFAULT_MAX_BATCH_SIZE):
+        self.model = model
+        self.device = device
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._pending: "queue.Queue[GenerationJob]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._draining = False
+
+        # Batch state (scheduler thread only)
+        self._active: List[GenerationJob] = []
+        self._cache: Optional[KVCache] = None
+        self._mask: Optional["torch.Tensor"] = None
+        self._next_logits: Optional["torch.Tensor"] = None
+        self._sampling: Optional[SamplingBatch] = None
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def submit(self, job: GenerationJob) -> Future:
+        """Queue a job for decoding and return its future (resolves to generated ids)."""
+        if self._stopped or self._draining:
+            raise RuntimeError(f"Scheduler for '{self.name}' has been stopped")
+        self._ensure_thread()
+        self._pending.put(job)
+        return job.future
+
+    def stop(self, drain: bool = False) -> None:
+        """
+        Stop the scheduler thread.
+
+        With drain=False queued and in-flight jobs are cancelled; with
+        drain=True no new jobs are accepted and the thread exits once every
+        already-submitted job has finished.
+        """
+        if drain:
+            self._draining = True
+        else:
+            self._stopped = True
+        self._pending.put(None)  # type: ignore[arg-type]  # wake the loop
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped or self._draining
+
+    @property
+    def active_count(self) -> int:
+        return len(self._active)
+
+    # ------------------------------------------------------------------
+    # Scheduler loop
+    # ------------------------------------------------------------------
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"plotcraft-batch-{self.name}", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            # Block only when idle; otherwise admit whatever is waiting between steps
+            if not self._active:
+                if self._draining and self._pending.empty():
+                    break
+                job = self._pending.get()
+                if job is None:
+                    continue  # wake-up from stop(); the loop condition decides
+                self._admit(job)
+            while len(self._active) < self.max_batch_size:
+                try:
+                    job = self._pending.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    continue
+                self._admit(job)
+            if not self._active:
+                continue
+            try:
+                with torch.no_grad():
+                    self._step()
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"Batch decode step failed ({self.name}): {e}", exc_info=True)
+                self._fail_active(e)
+
+        self._fail_active(RuntimeError("Scheduler stopped"))
+        while True:
+            try:
+                job = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None and not job.future.done():
+                job.future.set_exception(RuntimeError("Scheduler stopped"))
+
+    def _fail_active(self, error: Exception) -> None:
+        for job in self._active:
+            if not job.future.done():
+                job.future.set_exception(error)
+        self._active = []
+        self._cache = None
+        self._mask = None
+        self._next_logits = None
+        self._sampling = None
+
+    def _admit(self, job: GenerationJob) -> None:
+        """Prefill a new job and merge its KV cache into the running batch."""
+        if job.future.done():
+            return
+        # Nothing to generate, or cancelled / past its deadline while queued: skip the prefill
+        if job.max_new_tokens <= 0 or job.should_stop():
+            job.future.set_result([])
+            return
+        try:
+            job.start()
+            with torch.no_grad():
+                prefill_cache, logits = prefill(self.model, job, self.device)
+        except Exception as e:  # noqa: BLE001
+            logger.error(f"Prefill failed ({self.name}): {e}")
+            job.future.set_exception(e)
+            return
+
+        mask = torch.ones((1, len(job.tokens)), dtype=torch.long, device=self.device)
+
+        if not self._active:
+            self._cache, self._mask, self._next_logits = prefill_cache, mask, logits
+            self._sampling = SamplingBatch(logits.shape[-1], self.device)
+        else:
+            layers = prefill_cache.tensors()
+            batch_layers = self._cache.tensors()
+            width = self._mask.shape[1]
+            new_width = mask.shape[1]
+            if new_width < width:
+                layers = [(self._left_pad(k, width), self._left_pad(v, width)) for k, v in layers]
+                mask = self._left_pad(mask, width)
+            elif new_width > width:
+                batch_layers = [
+                    (self._left_pad(k, new_width), self._left_pad(v, new_width)) for k, v in batch_layers
+                ]
+                self._mask = self._left_pad(self._mask, new_width)
+            self._cache = KVCache.from_tensors(
+                [
+                    (torch.cat([bk, k], dim=0), torch.cat([bv, v], dim=0))
+                    for (bk, bv), (k, v) in zip(batch_layers, layers)
+                ],
+                self._cache.capacity,
+            )
+            self._mask = torch.cat([self._mask, mask], dim=0)
+            self._next_logits = torch.cat([self._next_logits, logits], dim=0)
+
+        self._active.append(job)
+        self._sampling.add(job)
+        logger.debug(f"Admitted job into '{self.name}' batch (size={len(self._active)})")
+
+    @staticmethod
+    def _left_pad(t: "torch.Tensor", width: int) -> "torch.Tensor":
+        """Left-pad the sequence axis of a KV tensor (B,H,T,D) or mask (B,T) with zeros."""
+        seq_dim = 2 if t.dim() == 4 else 1
+        pad = width - t.shape[seq_dim]
+        if pad <= 0:
+            return t
+        shape = list(t.shape)
+        shape[seq_dim] = pad
+        return torch.cat([t.new_zeros(shape), t], dim=seq_dim)
+
+    def _step(self) -> None:
+        """Sample one token for every active job, retire finished ones, then advance the batch."""
+        next_tokens = self._sampling.sample(self._next_logits, self._active).tolist()
+
+        keep: List[int] = []
+        for i, (job, token_id) in enumerate(zip(self._active, next_tokens)):
+            job.append(token_id)
+            if job.finished:
+                job.future.set_result(list(job.generated))
+            else:
+                keep.append(i)
+
+        if not keep:
+            self._active, self._cache, self._mask, self._next_logits = [], None, None, None
+            self._sampling = None
+            return
+        if len(keep) < len(self._active):
+            self._retire(keep)
+
+        last = torch.tensor([[job.tokens[-1]] for job in self._active], device=self.device)
+        positions = self._mask.sum(dim=1, keepdim=True)
+        mask = torch.cat([self._mask, torch.ones_like(last)], dim=1)
+        out = self.model(
+            input_ids=last,
+            attention_mask=mask,
+            position_ids=positions,
+            past_key_values=self._cache.model_cache,
+            use_cache=True,
+        )
+        self._mask = mask
+        self._next_logits = out.logits[:, -1, :].to(dtype=torch.float32)
+
+    def _retire(self, keep: List[int]) -> None:
+        """Drop finished rows from the batch and trim padding no row still needs."""
+        idx = torch.tensor(keep, device=self.device)
+        self._active = [self._active[i] for i in keep]
+        self._mask = self._mask.index_select(0, idx)
+        self._next_logits = self._next_logits.index_select(0, idx)
+        self._sampling.select(keep)
+
+        used = self._mask.any(dim=0).nonzero()
+        start = int(used[0]) if used.numel() else 0
+        self._mask = self._mask[:, start:]
+        self._cache = KVCache.from_tensors(
+            [
+                (k.index_select(0, idx)[:, :, start:], v.index_select(0, idx)[:, :, start:])
+                for k, v in self._cache.tensors()
+            ],
+            self._cache.capacity,
+        )
+
+
+# One scheduler per loaded genre model
+_schedulers: Dict[str, BatchScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(
+    name: str,
+    model,
+    device,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    speculative: bool = False,
+    compiled: bool = False,
+    compile_buckets: Iterable[int] = DEFAULT_BUCKETS,
+):
+    """
+    Return the scheduler for a genre, creating it if the model or mode changed or none exists.
+
+    With speculative=True the genre is served by a SpeculativeRunner
+    (per-request prompt-lookup decoding, see speculative.py), otherwise with
+    compiled=True by a CompiledRunner (per-request decoding through
+    torch.compile'd graphs per shape bucket, see compiled.py), instead of a
+    BatchScheduler; all of them expose submit / stop / stopped.
+    """
+    if speculative:
+        kind = SpeculativeRunner
+    elif compiled:
+        kind = CompiledRunner
+    else:
+        kind = BatchScheduler
+    with _schedulers_lock:
+        scheduler = _schedulers.get(name)
+        if scheduler is None or type(scheduler) is not kind or scheduler.model is not model or scheduler.stopped:
+            if scheduler is not None:
+                scheduler.stop(drain=True)
+            if kind is SpeculativeRunner:
+                scheduler = SpeculativeRunner(model, device, name=name)
+            elif kind is CompiledRunner:
+                scheduler = CompiledRunner(model, device, name=name, buckets=compile_buckets)
+            else:
+                scheduler = BatchScheduler(model, device, name=name, max_batch_size=max_batch_size)
+            _schedulers[name] = scheduler
+        return scheduler
+
+
+def stop_schedulers(name: Optional[str] = None, drain: bool = False) -> None:
+    """Stop one genre's scheduler, or all of them (see BatchScheduler.stop)."""
+    with _schedulers_lock:
+        names = [name] if name else list(_schedulers)
+        for n in names:
+            scheduler = _schedulers.pop(n, None)
+            if scheduler is not None:
+                scheduler.stop(drain=drain)
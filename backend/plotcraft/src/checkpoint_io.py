@@ -0,0 +1,175 @@
+"""
+Checkpoint loading for PlotCraft models without a throwaway random init.
+
+The model skeleton is built on the meta device (no weight allocation or
+initialisation) and the checkpoint tensors are assigned into it directly.
+Weights come from model.safetensors when a fresh conversion exists next to
+model.pt, otherwise from model.pt opened with torch.load(mmap=True). Either
+way tensors are mapped from disk rather than read into a second full copy, so
+peak memory stays close to one copy of the weights.
+
+model.pt stays the source of truth: the safetensors file records the size and
+mtime of the model.pt it was converted from and is ignored once they differ.
+
+Usage (from backend/):
+    python -m plotcraft.src.checkpoint_io            # convert every genre
+    python -m plotcraft.src.checkpoint_io --genres horror
+"""
+
+import argparse
+import logging
+import os
+from typing import Dict, Optional
+
+try:
+    import torch
+except ImportError:
+    torch = None  # type: ignore
+
+try:
+    from safetensors import safe_open
+    from safetensors.torch import load_file, save_file
+except ImportError:
+    safe_open = None  # type: ignore
+    load_file = None  # type: ignore
+    save_file = None  # type: ignore
+
+from .model import build_model
+
+logger = logging.getLogger(__name__)
+
+SAFETENSORS_NAME = "model.safetensors"
+
+
+def checkpoint_version(model_path: str) -> str:
+    """Cheap identity for a checkpoint file (size + mtime)."""
+    stat = os.stat(model_path)
+    return f"{stat.st_size}-{int(stat.st_mtime)}"
+
+
+def safetensors_path_for(model_path: str) -> str:
+    """Where the safetensors conversion of a checkpoint lives (next to model.pt)."""
+    return os.path.join(os.path.dirname(model_path), SAFETENSORS_NAME)
+
+
+def _read_torch_state_dict(model_path: str, device) -> Dict[str, "torch.Tensor"]:
+    try:
+        return torch.load(model_path, map_location=device, mmap=True, weights_only=True)
+    except RuntimeError as e:
+        # Pre-zipfile (legacy) torch.save files cannot be memory-mapped
+        logger.warning(f"Cannot mmap {model_path} ({e}); reading it fully")
+        return torch.load(model_path, map_location=device, weights_only=True)
+
+
+def _fresh_safetensors(model_path: str) -> Optional[str]:
+    """The safetensors conversion of model_path if it exists and matches it."""
+    path = safetensors_path_for(model_path)
+    if safe_open is None or not os.path.exists(path):
+        return None
+    with safe_open(path, framework="pt") as f:
+        source = (f.metadata() or {}).get("source")
+    if source != checkpoint_version(model_path):
+        logger.warning(f"Ignoring stale {path} (model.pt changed); re-run checkpoint_io to convert")
+        return None
+    return path
+
+
+def load_state_dict(model_path: str, device=None, prefer_safetensors: bool = True) -> Dict[str, "torch.Tensor"]:
+    """
+    Read a checkpoint's tensors, memory-mapped from disk where possible.
+
+    Prefers a fresh model.safetensors next to model_path unless
+    prefer_safetensors is False. Tied weights dropped at conversion (see
+    convert_checkpoint) are absent from the result.
+    """
+    device = device if device is not None else torch.device("cpu")
+    path = _fresh_safetensors(model_path) if prefer_safetensors else None
+    if path is not None:
+        logger.info(f"Loading weights from {path}")
+        return load_file(path, device=str(device))
+    return _read_torch_state_dict(model_path, device)
+
+
+def load_checkpoint(
+    model_path: str,
+    vocab_size: int,
+    block_size: int = 512,
+    device=None,
+    prefer_safetensors: bool = True,
+) -> "torch.nn.Module":
+    """
+    Build a PlotCraft model directly from checkpoint weights.
+
+    Args:
+        model_path: checkpoints/{genre}/best_model/model.pt
+        vocab_size: Tokenizer vocabulary size
+        block_size: Model context window
+        device: Target device (default CPU)
+        prefer_safetensors: Use a fresh model.safetensors when one exists
+
+    Returns:
+        GPT2LMHeadModel in eval mode on `device`.
+
+    Raises:
+        RuntimeError: If the checkpoint does not cover every model weight
+    """
+    device = device if device is not None else torch.device("cpu")
+    with torch.device("meta"):
+        model = build_model(vocab_size, block_size)
+    state_dict = load_state_dict(model_path, device, prefer_safetensors)
+    result = model.load_state_dict(state_dict, strict=False, assign=True)
+    # Re-point lm_head at wte (assign replaces parameters, and safetensors omits the tied copy)
+    model.tie_weights()
+    missing = [name for name, p in model.named_parameters() if p.is_meta]
+    if missing or result.unexpected_keys:
+        raise RuntimeError(
+            f"Checkpoint {model_path} does not match the model "
+            f"(missing: {missing}, unexpected: {result.unexpected_keys})"
+        )
+    return model.eval()
+
+
+def convert_checkpoint(model_path: str) -> str:
+    """
+    Write model.safetensors next to a model.pt checkpoint.
+
+    Tensors sharing storage (GPT-2's tied wte / lm_head) are stored once, as
+    safetensors requires; load_checkpoint re-ties them.
+
+    Returns:
+        The safetensors path.
+    """
+    if save_file is None:
+        raise RuntimeError("safetensors not installed")
+    state_dict = _read_torch_state_dict(model_path, torch.device("cpu"))
+    unique: Dict[str, "torch.Tensor"] = {}
+    seen = set()
+    for name, tensor in state_dict.items():
+        if tensor.data_ptr() in seen:
+            continue
+        seen.add(tensor.data_ptr())
+        unique[name] = tensor.contiguous()
+
+    path = safetensors_path_for(model_path)
+    save_file(unique, path, metadata={"source": checkpoint_version(model_path)})
+    logger.info(f"Converted {model_path} to {path}")
+    return path
+
+
+def main() -> None:
+    from .plotcraft_generator import SUPPORTED_GENRES, _resolve_paths
+
+    parser = argparse.ArgumentParser(description="Convert PlotCraft checkpoints to safetensors")
+    parser.add_argument("--genres", nargs="+", default=SUPPORTED_GENRES)
+    args = parser.parse_args()
+
+    for genre in args.genres:
+        model_path, _ = _resolve_paths(genre)
+        if not os.path.exists(model_path):
+            print(f"{genre}: skipped (checkpoint missing)")
+            continue
+        print(f"{genre}: {convert_checkpoint(model_path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+torch.compile'd decode path for PlotCraft models on CPU.
+
+Eager decoding pays Python / dispatcher overhead for every op of every layer
+on every token. Here the GPT-2 forward is compiled with static shapes and the
+compiled graphs are reused across requests:
+
+- Each request gets a transformers StaticCache whose length is the smallest
+  shape bucket that fits prompt + max_new_tokens, so the KV shapes never change
+  while decoding.
+- The prompt is right-padded to the smallest bucket that holds it and
+  prefilled in one call; padding is masked out and later overwritten in the
+  cache, and the next-token logits are read at the last real position.
+- Every decode step is a (1, 1) input with an explicit position and a mask
+  over the whole cache, i.e. one graph per cache bucket.
+
+That is one prefill graph per (prompt bucket, cache bucket) pair and one
+decode graph per cache bucket, compiled on first use (or all at once by
+warmup()). If compilation fails for any reason the decoder logs a warning and
+serves every later request eagerly on the same static-cache path.
+
+Sampling reuses decoding.process_logits / sample_token, so the output is
+distributed exactly as decode()'s (logits differ only by float rounding).
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, List, Set, Tuple
+
+try:
+    import torch
+    from transformers import StaticCache
+except ImportError:
+    torch = None  # type: ignore
+    StaticCache = None  # type: ignore
+
+from .decoding import DecodeState, process_logits, sample_token
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (128, 256, 512)
+DEFAULT_WORKERS = 4
+
+
+def _raise_recompile_limit(graphs: int) -> None:
+    """Let dynamo keep one compiled graph per shape bucket instead of falling back to eager."""
+    config = torch._dynamo.config
+    name = "recompile_limit" if hasattr(config, "recompile_limit") else "cache_size_limit"
+    setattr(config, name, getattr(config, name) + graphs)
+
+
+def _rewind(cache, length: int) -> None:
+    """Move the cache's write position back to `length` so the prompt padding is overwritten."""
+    for layer in getattr(cache, "layers", ()):
+        # Static layers count written tokens themselves (older ones index by cache_position)
+        counter = getattr(layer, "cumulative_length", None)
+        if isinstance(counter, torch.Tensor):
+            counter.fill_(length)
+
+
+class CompiledDecoder:
+    """
+    Decodes one sequence at a time through a compiled, shape-bucketed forward.
+
+    Args:
+        model: GPT2LMHeadModel from build_model (in eval mode)
+        device: Device for input tensors
+        buckets: Sequence lengths graphs are compiled for (capped at the model context)
+        compile: Use torch.compile; False serves the same static-cache path eagerly
+    """
+
+    def __init__(self, model, device, buckets: Iterable[int] = DEFAULT_BUCKETS, compile: bool = True):
+        self.model = model
+        self.device = device
+        n_positions = model.config.n_positions
+        self.buckets: Tuple[int, ...] = tuple(sorted({min(b, n_positions) for b in buckets if b > 0} | {n_positions}))
+        self.compiled = False
+        self._forward = model
+        self._warm: Set[Tuple] = set()
+        self._lock = threading.Lock()
+        if compile:
+            try:
+                pairs = len(self.buckets) * (len(self.buckets) + 1) // 2
+                _raise_recompile_limit(pairs + len(self.buckets))
+                self._forward = torch.compile(model, dynamic=False)
+                self.compiled = True
+            except Exception as e:  # noqa: BLE001
+                logger.warning(f"torch.compile unavailable ({e}); decoding eagerly")
+
+    def bucket_for(self, length: int) -> int:
+        """Smallest bucket holding `length` tokens."""
+        for bucket in self.buckets:
+            if bucket >= length:
+                return bucket
+        raise ValueError(f"Sequence of {length} tokens exceeds the model context ({self.buckets[-1]})")
+
+    def _run(self, shape: Tuple, **inputs):
+        """Forward through the compiled graph for `shape`, compiling it (once) on first use."""
+        if self.compiled and shape not in self._warm:
+            with self._lock:
+                if self.compiled and shape not in self._warm:
+                    try:
+                        out = self._forward(**inputs)
+                        self._warm.add(shape)
+                        return out
+                    except Exception as e:  # noqa: BLE001
+                        logger.warning(f"Compiling PlotCraft forward for {shape} failed; falling back to eager: {e}")
+                        self._forward = self.model
+                        self.compiled = False
+        return self._forward(**inputs)
+
+    def _prefill(self, cache, tokens: List[int], length: int) -> "torch.Tensor":
+        """Prefill `tokens` right-padded to their bucket; float32 next-token logits of shape (1, V)."""
+        n = len(tokens)
+        width = self.bucket_for(n)
+        positions = torch.arange(width, device=self.device)
+        out = self._run(
+            ("prefill", width, length),
+            input_ids=torch.tensor([tokens + [0] * (width - n)], device=self.device),
+            position_ids=positions.unsqueeze(0),
+            cache_position=positions,
+            attention_mask=(torch.arange(length, device=self.device) < n).long().unsqueeze(0),
+            past_key_values=cache,
+            use_cache=True,
+        )
+        _rewind(cache, n)
+        return out.logits[:, n - 1, :].to(dtype=torch.float32)
+
+    def _step(self, cache, token_id: int, position: int, length: int) -> "torch.Tensor":
+        """Feed one token at `position`; float32 next-token logits of shape (1, V)."""
+        out = self._run(
+            ("decode", length),
+            input_ids=torch.tensor([[token_id]], device=self.device),
+            position_ids=torch.tensor([[position]], device=self.device),
+            cache_position=torch.tensor([position], device=self.device),
+            attention_mask=(torch.arange(length, device=self.device) <= position).long().unsqueeze(0),
+            past_key_values=cache,
+            use_cache=True,
+        )
+        return out.logits[:, -1, :].to(dtype=torch.float32)
+
+    def decode(self, state: DecodeState) -> List[int]:
+        """
+        Generate tokens for one sequence; same contract as decoding.decode.
+
+        `state.prefix_kv` is ignored: the whole prompt is prefilled in one
+        compiled call.
+        """
+        state.start()
+        if state.max_new_tokens <= 0 or state.should_stop():
+            return []
+        length = self.bucket_for(len(state.tokens) + state.max_new_tokens)
+        cache = StaticCache(config=self.model.config, max_cache_len=length)
+
+        with torch.no_grad():
+            logits = self._prefill(cache, state.tokens, length)
+            while True:
+                scores = process_logits(logits[0].clone(), state)
+                token_id = sample_token(scores.softmax(dim=-1), state)
+                state.append(token_id)
+                if state.finished:
+                    break
+                logits = self._step(cache, token_id, len(state.tokens) - 1, length)
+        return list(state.generated)
+
+    def warmup(self) -> float:
+        """
+        Compile every prefill and decode graph now instead of on first use.
+
+        Returns:
+            Seconds spent.
+        """
+        start = time.perf_counter()
+        with torch.no_grad():
+            for length in self.buckets:
+                for width in self.buckets:
+                    if width > length or not self.compiled:
+                        break
+                    cache = StaticCache(config=self.model.config, max_cache_len=length)
+                    self._prefill(cache, [0] * width, length)
+                    if width == length:
+                        # Decode graphs are shape-identical at any position
+                        _rewind(cache, 0)
+                        self._step(cache, 0, 0, length)
+        elapsed = time.perf_counter() - start
+        if self.compiled:
+            logger.info(f"Compiled PlotCraft graphs for buckets {self.buckets} in {elapsed:.1f}s")
+        return elapsed
+
+
+class CompiledRunner:
+    """
+    Serves one PlotCraft model with a CompiledDecoder on a small thread pool.
+
+    Drop-in for BatchScheduler (submit / stop / stopped): like SpeculativeRunner,
+    each request is decoded on its own rather than batched, trading
+    cross-request batching for cheaper per-token forwards.
+    """
+
+    def __init__(
+        self,
+        model,
+        device,
+        name: str = "",
+        buckets: Iterable[int] = DEFAULT_BUCKETS,
+        max_workers: int = DEFAULT_WORKERS,
+    ):
+        self.model = model
+        self.device = device
+        self.name = name
+        self.decoder = CompiledDecoder(model, device, buckets=buckets)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=f"plotcraft-compiled-{name}")
+        self._stopped = False
+        self._cancelled = False
+
+    @property
+    def compiled(self) -> bool:
+        """False once the runner has fallen back to eager."""
+        return self.decoder.compiled
+
+    def warmup(self) -> float:
+        """Compile every shape bucket (see CompiledDecoder.warmup); returns seconds spent."""
+        return self.decoder.warmup()
+
+    def submit(self, job) -> Future:
+        """Decode a GenerationJob on the pool; resolves job.future with generated ids."""
+        if self._stopped:
+            raise RuntimeError(f"Compiled runner for '{self.name}' has been stopped")
+
+        def _run() -> None:
+            if job.future.done():
+                return
+            if self._cancelled:
+                job.future.set_exception(RuntimeError("Compiled runner stopped"))
+                return
+            try:
+                job.future.set_result(self.decoder.decode(job))
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"Compiled decode failed ({self.name}): {e}")
+                job.future.set_exception(e)
+
+        self._pool.submit(_run)
+        return job.future
+
+    def stop(self, drain: bool = False) -> None:
+        """Stop accepting jobs; queued decodes fail unless `drain` (running ones finish)."""
+        self._stopped = True
+        self._cancelled = not drain
+        self._pool.shutdown(wait=False)
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped
@@ -0,0 +1,435 @@
+"""
+First-party incremental decode loop for PlotCraft GPT-2 models.
+
+Replaces HF `model.generate` for the models built by `model.build_model`:
+
+- KVCache owns past_key_values in buffers preallocated to the model context, so
+  each step writes one column in place instead of re-concatenating the cache.
+- DecodeState keeps per-sequence sampling parameters plus an incremental n-gram
+  table, so the no-repeat-ngram ban is an O(1) lookup per step instead of a
+  rescan of the whole history. A seeded state samples from its own generator,
+  so decode() output does not depend on other threads' use of the global RNG.
+- decode() runs prefill + per-token sampling with hooks for stop criteria and
+  streaming (`on_token`). prefill() can start from reused KV for a leading
+  slice of the prompt (see prefix_cache.py).
+- continuation_logprobs() scores several continuations of one prompt in a
+  single batched forward pass (used to rerank best-of-N candidates).
+
+Sampling matches HF generate's processor order (repetition penalty, n-gram ban,
+temperature, top-k, top-p), so under a fixed seed decode() reproduces
+`model.generate(do_sample=True, ...)` token for token.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    import torch
+    from transformers import DynamicCache
+except ImportError:
+    torch = None  # type: ignore
+    DynamicCache = None  # type: ignore
+
+try:
+    from transformers.cache_utils import DynamicLayer
+except ImportError:  # transformers < 4.56: no per-layer cache objects
+    DynamicLayer = None  # type: ignore
+
+from .character_bias import CharacterBias
+
+logger = logging.getLogger(__name__)
+
+StopCriterion = Callable[[List[int]], bool]
+
+
+# ---------------------------------------------------------------------------
+# KV cache
+# ---------------------------------------------------------------------------
+
+if DynamicLayer is not None:
+
+    class _BufferedLayer(DynamicLayer):
+        """Cache layer that appends into a preallocated buffer (grows by doubling)."""
+
+        def __init__(self, capacity: int):
+            super().__init__()
+            self.capacity = capacity
+            self.length = 0
+            self._k: Optional["torch.Tensor"] = None
+            self._v: Optional["torch.Tensor"] = None
+
+        def lazy_initialization(self, key_states, value_states) -> None:
+            self.dtype, self.device = key_states.dtype, key_states.device
+            batch, heads, _, dim = key_states.shape
+            self._k = key_states.new_zeros((batch, heads, self.capacity, dim))
+            self._v = value_states.new_zeros((batch, heads, self.capacity, dim))
+            self.length = 0
+            self.keys, self.values = self._k[:, :, :0], self._v[:, :, :0]
+            self.is_initialized = True
+
+        def update(self, key_states, value_states, *args, **kwargs):
+            if not self.is_initialized:
+                self.lazy_initialization(key_states, value_states)
+            end = self.length + key_states.shape[-2]
+            if end > self._k.shape[2]:
+                self._grow(end)
+            self._k[:, :, self.length : end] = key_states
+            self._v[:, :, self.length : end] = value_states
+            self.set_length(end)
+            return self.keys, self.values
+
+        def _grow(self, needed: int) -> None:
+            capacity = max(needed, 2 * self._k.shape[2])
+            k = self._k.new_zeros(self._k.shape[:2] + (capacity, self._k.shape[3]))
+            v = self._v.new_zeros(k.shape)
+            k[:, :, : self.length] = self._k[:, :, : self.length]
+            v[:, :, : self.length] = self._v[:, :, : self.length]
+            self._k, self._v = k, v
+
+        def set_length(self, length: int) -> None:
+            self.length = length
+            self.keys, self.values = self._k[:, :, :length], self._v[:, :, :length]
+
+        def crop(self, max_length: int) -> None:
+            if max_length < 0:
+                max_length = self.length + max_length
+            if self.is_initialized and max_length < self.length:
+                self.set_length(max_length)
+
+else:
+    _BufferedLayer = None  # type: ignore
+
+
+def cache_tensors(past_key_values) -> List[Tuple["torch.Tensor", "torch.Tensor"]]:
+    """
+    Per-layer (key, value) tensors of an HF past_key_values, across transformers versions.
+
+    Newer caches hold `layers`, older DynamicCaches `key_cache` / `value_cache`
+    lists, and the legacy format is a tuple of (key, value) tuples.
+    """
+    layers = getattr(past_key_values, "layers", None)
+    if layers is not None:
+        return [(layer.keys, layer.values) for layer in layers]
+    if hasattr(past_key_values, "key_cache"):
+        return list(zip(past_key_values.key_cache, past_key_values.value_cache))
+    return [(k, v) for k, v in past_key_values]
+
+
+class KVCache:
+    """
+    Explicitly managed past_key_values for one decode (batch of rows).
+
+    Pass `model_cache` as `past_key_values`; the model appends into the owned
+    buffers in place. `tensors()` exposes per-layer (key, value) views for row
+    manipulation, and `from_tensors()` rebuilds a cache from such views.
+    """
+
+    def __init__(self, num_layers: int, capacity: int):
+        self.num_layers = num_layers
+        self.capacity = capacity
+        self.model_cache = DynamicCache()
+        if _BufferedLayer is not None:
+            self.model_cache.layers = [_BufferedLayer(capacity) for _ in range(num_layers)]
+
+    @classmethod
+    def for_model(cls, model) -> "KVCache":
+        """Empty cache sized to the model's layer count and context window."""
+        return cls(model.config.n_layer, model.config.n_positions)
+
+    @classmethod
+    def from_tensors(
+        cls, layers: List[Tuple["torch.Tensor", "torch.Tensor"]], capacity: int
+    ) -> "KVCache":
+        """Build a cache pre-filled with per-layer (key, value) tensors."""
+        cache = cls(len(layers), max(capacity, layers[0][0].shape[2] if layers else 0))
+        for idx, (k, v) in enumerate(layers):
+            cache.model_cache.update(k, v, idx)
+        return cache
+
+    def tensors(self) -> List[Tuple["torch.Tensor", "torch.Tensor"]]:
+        """Per-layer (key, value) views of the filled part of the cache."""
+        return cache_tensors(self.model_cache)
+
+    @property
+    def length(self) -> int:
+        return self.model_cache.get_seq_length()
+
+    def crop(self, length: int) -> None:
+        """Drop cached positions beyond `length` (e.g. rejected draft tokens)."""
+        self.model_cache.crop(length)
+
+
+# ---------------------------------------------------------------------------
+# Per-sequence state and sampling
+# ---------------------------------------------------------------------------
+
+@dataclass
+class DecodeState:
+    """Sampling parameters and incremental decode state for one sequence."""
+
+    input_ids: List[int]
+    max_new_tokens: int
+    temperature: float = 0.8
+    top_k: int = 40
+    top_p: float = 0.95
+    repetition_penalty: float = 1.2
+    no_repeat_ngram_size: int = 3
+    # Hooks: stop criteria see the generated ids after each token; on_token streams them
+    stop_criteria: List[StopCriterion] = field(default_factory=list)
+    on_token: Optional[Callable[[int], None]] = None
+    # Precomputed per-layer (key, value) for input_ids[:n]; only the rest is prefilled
+    prefix_kv: Optional[List[Tuple["torch.Tensor", "torch.Tensor"]]] = None
+    # Sample from a private RNG seeded with this instead of the global one (decode() only)
+    seed: Optional[int] = None
+    # Steer toward character names (see character_bias.py); shared spec, per-state progress
+    character_bias: Optional[CharacterBias] = None
+
+    tokens: List[int] = field(default_factory=list)
+    generated: List[int] = field(default_factory=list)
+    seen: Set[int] = field(default_factory=set)
+    ngrams: Dict[Tuple[int, ...], Set[int]] = field(default_factory=dict)
+    stopped: bool = False
+    generator: Optional["torch.Generator"] = None
+    pending_names: Set[int] = field(default_factory=set)
+
+    def start(self) -> None:
+        """Initialise decode state from the prompt."""
+        self.tokens = list(self.input_ids)
+        self.generated = []
+        self.seen = set(self.tokens)
+        self.ngrams = {}
+        self.stopped = False
+        self.generator = None
+        self.pending_names = set(range(len(self.character_bias.names))) if self.character_bias else set()
+        n = self.no_repeat_ngram_size
+        if n > 0:
+            for i in range(len(self.tokens) - n + 1):
+                gram = self.tokens[i : i + n]
+                self.ngrams.setdefault(tuple(gram[:-1]), set()).add(gram[-1])
+
+    def append(self, token_id: int) -> None:
+        """Record a sampled token, update the n-gram table and run the hooks."""
+        self.tokens.append(token_id)
+        self.generated.append(token_id)
+        self.seen.add(token_id)
+        n = self.no_repeat_ngram_size
+        if n > 0 and len(self.tokens) >= n:
+            gram = self.tokens[-n:]
+            self.ngrams.setdefault(tuple(gram[:-1]), set()).add(gram[-1])
+        if self.pending_names:
+            self.pending_names -= self.character_bias.completed(self.generated, self.pending_names)
+        if self.on_token is not None:
+            try:
+                self.on_token(token_id)
+            except Exception as e:  # noqa: BLE001
+                logger.warning(f"Token callback failed: {e}")
+        if self.should_stop():
+            self.stopped = True
+
+    def should_stop(self) -> bool:
+        """Whether any stop criterion fires on the tokens generated so far."""
+        return any(criterion(self.generated) for criterion in self.stop_criteria)
+
+    def banned_tokens(self) -> Set[int]:
+        """Tokens that would complete an already-seen n-gram."""
+        n = self.no_repeat_ngram_size
+        if n <= 0 or len(self.tokens) + 1 < n:
+            return set()
+        prefix = tuple(self.tokens[len(self.tokens) - (n - 1) :]) if n > 1 else ()
+        return self.ngrams.get(prefix, set())
+
+    def logit_biases(self) -> Dict[int, float]:
+        """Per-token logit bias for the next step (character steering), if any."""
+        if self.character_bias is None:
+            return {}
+        return self.character_bias.biases(self.generated, self.pending_names)
+
+    @property
+    def finished(self) -> bool:
+        return self.stopped or len(self.generated) >= self.max_new_tokens
+
+
+def process_logits(scores: "torch.Tensor", state: DecodeState) -> "torch.Tensor":
+    """
+    Apply one sequence's sampling parameters to its float32 next-token logits.
+
+    Mirrors the order used by HF generate: repetition penalty, n-gram ban,
+    (character logit bias,) temperature, top-k, top-p. `scores` is modified
+    in place.
+    """
+    if state.repetition_penalty != 1.0 and state.seen:
+        idx = torch.tensor(sorted(state.seen), device=scores.device)
+        picked = scores[idx]
+        scores[idx] = torch.where(
+            picked < 0, picked * state.repetition_penalty, picked / state.repetition_penalty
+        )
+    banned = state.banned_tokens()
+    if banned:
+        scores[torch.tensor(sorted(banned), device=scores.device)] = -float("inf")
+    biases = state.logit_biases()
+    if biases:
+        idx = torch.tensor(list(biases), device=scores.device)
+        scores[idx] += torch.tensor(list(biases.values()), dtype=scores.dtype, device=scores.device)
+    if state.temperature != 1.0:
+        scores = scores / state.temperature
+    if state.top_k > 0:
+        k = min(state.top_k, scores.size(-1))
+        threshold = torch.topk(scores, k)[0][-1]
+        scores = scores.masked_fill(scores < threshold, -float("inf"))
+    if state.top_p < 1.0:
+        sorted_logits, sorted_idx = torch.sort(scores, descending=False)
+        cumulative = sorted_logits.softmax(dim=-1).cumsum(dim=-1)
+        remove = cumulative <= (1 - state.top_p)
+        remove[-1:] = False
+        scores = scores.masked_fill(remove.scatter(0, sorted_idx, remove), -float("inf"))
+    return scores
+
+
+def sample_token(probs: "torch.Tensor", state: DecodeState) -> int:
+    """Draw one token id from (V,) probabilities, using the state's own RNG when it is seeded."""
+    generator = None
+    if state.seed is not None:
+        if state.generator is None or state.generator.device != probs.device:
+            state.generator = torch.Generator(device=probs.device).manual_seed(state.seed)
+        generator = state.generator
+    return int(torch.multinomial(probs.unsqueeze(0), num_samples=1, generator=generator))
+
+
+# ---------------------------------------------------------------------------
+# Decode loop
+# ---------------------------------------------------------------------------
+
+def prefill(model, state: DecodeState, device) -> Tuple[KVCache, "torch.Tensor"]:
+    """
+    Run the prompt through the model, reusing `state.prefix_kv` when present.
+
+    Returns:
+        (cache holding the whole prompt, float32 next-token logits of shape (1, V))
+    """
+    start = 0
+    if state.prefix_kv:
+        start = state.prefix_kv[0][0].shape[2]
+        cache = KVCache.from_tensors(state.prefix_kv, model.config.n_positions)
+    else:
+        cache = KVCache.for_model(model)
+    out = model(
+        input_ids=torch.tensor([state.tokens[start:]], device=device),
+        attention_mask=torch.ones((1, len(state.tokens)), dtype=torch.long, device=device),
+        past_key_values=cache.model_cache,
+        use_cache=True,
+    )
+    return cache, out.logits[:, -1, :].to(dtype=torch.float32)
+
+
+def decode(model, state: DecodeState, device=None) -> List[int]:
+    """
+    Generate tokens for one sequence with an explicitly managed KV cache.
+
+    Args:
+        model: GPT2LMHeadModel from build_model (in eval mode)
+        state: Prompt, sampling parameters and hooks; reset by this call
+        device: Device for input tensors (defaults to the model's)
+
+    Returns:
+        Generated token ids (prompt excluded).
+    """
+    if device is None:
+        device = next(model.parameters()).device
+    state.start()
+    if state.max_new_tokens <= 0 or state.should_stop():
+        return []
+
+    with torch.no_grad():
+        cache, logits = prefill(model, state, device)
+        while True:
+            scores = process_logits(logits[0].clone(), state)
+            token_id = sample_token(scores.softmax(dim=-1), state)
+            state.append(token_id)
+            if state.finished:
+                break
+            out = model(
+                input_ids=torch.tensor([[token_id]], device=device),
+                attention_mask=torch.ones((1, len(state.tokens)), dtype=torch.long, device=device),
+                past_key_values=cache.model_cache,
+                use_cache=True,
+            )
+            logits = out.logits[:, -1, :].to(dtype=torch.float32)
+    return list(state.generated)
+
+
+def continuation_logprobs(
+    model,
+    prompt_ids: List[int],
+    continuations: List[List[int]],
+    device=None,
+    prefix_kv: Optional[List[Tuple["torch.Tensor", "torch.Tensor"]]] = None,
+) -> List[float]:
+    """
+    Mean per-token log-likelihood of each continuation of one prompt.
+
+    The prompt is run once and its KV shared by every row; the continuations
+    are then scored together in one forward pass. Rows are right-padded, which
+    causal attention makes invisible to the real tokens.
+
+    Args:
+        model: GPT2LMHeadModel from build_model (in eval mode)
+        prompt_ids: Prompt token ids (non-empty)
+        continuations: Generated ids per candidate
+        device: Device for input tensors (defaults to the model's)
+        prefix_kv: Precomputed per-layer (key, value) for prompt_ids[:-1], if any
+
+    Returns:
+        Mean log p(token | prefix) per continuation (0.0 for empty ones), under
+        the raw model distribution (no temperature or sampling filters).
+    """
+    if not continuations:
+        return []
+    if device is None:
+        device = next(model.parameters()).device
+    rows = len(continuations)
+    width = 1 + max(len(c) for c in continuations)
+
+    with torch.no_grad():
+        if prefix_kv is None and len(prompt_ids) > 1:
+            prefix_kv = prompt_kv(model, prompt_ids[:-1], device)
+        if prefix_kv:
+            cache = KVCache.from_tensors(
+                [(k.expand(rows, -1, -1, -1), v.expand(rows, -1, -1, -1)) for k, v in prefix_kv],
+                model.config.n_positions,
+            )
+        else:
+            cache = KVCache.for_model(model)
+        input_ids = torch.tensor(
+            [[prompt_ids[-1], *c] + [0] * (width - 1 - len(c)) for c in continuations], device=device
+        )
+        out = model(
+            input_ids=input_ids,
+            attention_mask=torch.ones((rows, cache.length + width), dtype=torch.long, device=device),
+            past_key_values=cache.model_cache,
+            use_cache=True,
+        )
+        logprobs = out.logits[:, :-1].to(dtype=torch.float32).log_softmax(dim=-1)
+        picked = logprobs.gather(2, input_ids[:, 1:].unsqueeze(2)).squeeze(2)
+
+    lengths = [len(c) for c in continuations]
+    return [float(picked[i, :n].mean()) if n else 0.0 for i, n in enumerate(lengths)]
+
+
+def prompt_kv(
+    model,
+    prompt_ids: List[int],
+    device=None,
+    prefix_kv: Optional[List[Tuple["torch.Tensor", "torch.Tensor"]]] = None,
+) -> List[Tuple["torch.Tensor", "torch.Tensor"]]:
+    """Per-layer (key, value) for `prompt_ids` (usable as DecodeState.prefix_kv), extending `prefix_kv`."""
+    if prefix_kv and prefix_kv[0][0].shape[2] >= len(prompt_ids):
+        n = len(prompt_ids)
+        return [(k[:, :, :n], v[:, :, :n]) for k, v in prefix_kv]
+    if device is None:
+        device = next(model.parameters()).device
+    state = DecodeState(input_ids=prompt_ids, max_new_tokens=0, prefix_kv=prefix_kv)
+    state.start()
+    with torch.no_grad():
+        cache, _ = prefill(model, state, device)
+    return cache.tensors()
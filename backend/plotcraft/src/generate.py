@@ -46,11 +46,16 @@ vocab_size = sp.vocab_size()
 # =========================================
 # LOAD MODEL
 # =========================================
-model = build_model(vocab_size, 512).to(device)
+# Build the skeleton on the meta device and map the weights straight from disk
+# (no random init, no second in-memory copy of the state_dict)
+with torch.device("meta"):
+    model = build_model(vocab_size, 512)
 
 model.load_state_dict(
-    torch.load(BEST_MODEL_PATH, map_location=device)
+    torch.load(BEST_MODEL_PATH, map_location=device, mmap=True, weights_only=True),
+    assign=True,
 )
+model.tie_weights()
 
 model.eval()
 print("Model loaded successfully.\n")
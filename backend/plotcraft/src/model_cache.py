@@ -0,0 +1,214 @@
+"""
+Memory-budgeted cache for loaded PlotCraft models.
+
+Entries are sized when loaded and evicted (least recently or least frequently
+used) once the total exceeds a byte budget. Pinned entries are never evicted.
+Loads are single-flight: concurrent first requests for the same key wait for
+one load instead of each reading the checkpoint.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EVICTION_POLICIES = ("lru", "lfu")
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    hits: int = 0
+
+
+class ModelCache:
+    """
+    Byte-budgeted model cache with LRU/LFU eviction, pinning and single-flight loads.
+
+    Args:
+        max_bytes: Budget for all entries; 0 disables eviction
+        policy: "lru" or "lfu"
+        size_of: Returns an entry's size in bytes
+        on_evict: Called with (key, value) after an entry is evicted
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 0,
+        policy: str = "lru",
+        size_of: Callable[[Any], int] = lambda value: 0,
+        on_evict: Optional[Callable[[str, Any], None]] = None,
+    ):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy '{policy}'. Use one of {EVICTION_POLICIES}")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self._size_of = size_of
+        self._on_evict = on_evict
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+        self._pinned: set = set()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    # ------------------------------------------------------------------
+    # Lookup and loading
+    # ------------------------------------------------------------------
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for `key`, loading it once if absent.
+
+        Concurrent callers for a key that is being loaded wait for that load
+        and receive its result (or its exception).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._touch(key, entry)
+                return entry.value
+            pending = self._loading.get(key)
+            if pending is None:
+                self._misses += 1
+                pending = self._loading[key] = Future()
+                owner = True
+            else:
+                self._hits += 1
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            pending.set_exception(e)
+            raise
+
+        evicted = self._insert(key, value)
+        pending.set_result(value)
+        self._notify_evicted(evicted)
+        return value
+
+    def _touch(self, key: str, entry: _Entry) -> None:
+        self._hits += 1
+        entry.hits += 1
+        self._entries.move_to_end(key)
+
+    def _insert(self, key: str, value: Any) -> List[tuple]:
+        size = self._size_of(value)
+        with self._lock:
+            del self._loading[key]
+            self._entries[key] = _Entry(value, size)
+            self._bytes += size
+            evicted = self._evict_over_budget(keep=key)
+        if size > self.max_bytes > 0:
+            logger.warning(f"Model '{key}' ({size} bytes) alone exceeds the cache budget ({self.max_bytes} bytes)")
+        return evicted
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+
+    def _evict_over_budget(self, keep: Optional[str] = None) -> List[tuple]:
+        """Pop victims until within budget (lock held); returns evicted (key, value) pairs."""
+        evicted = []
+        while self.max_bytes > 0 and self._bytes > self.max_bytes:
+            candidates = [k for k in self._entries if k != keep and k not in self._pinned]
+            if not candidates:
+                break
+            if self.policy == "lfu":
+                # min() keeps the first (least recently used) key among equal counts
+                victim = min(candidates, key=lambda k: self._entries[k].hits)
+            else:
+                victim = candidates[0]
+            entry = self._entries.pop(victim)
+            self._bytes -= entry.size
+            self._evictions += 1
+            evicted.append((victim, entry.value))
+            logger.info(f"Evicted model '{victim}' ({entry.size} bytes, policy={self.policy})")
+        return evicted
+
+    def _notify_evicted(self, evicted: Iterable[tuple]) -> None:
+        if self._on_evict is None:
+            return
+        for key, value in evicted:
+            try:
+                self._on_evict(key, value)
+            except Exception as e:  # noqa: BLE001
+                logger.warning(f"Eviction callback failed for '{key}': {e}")
+
+    def pop(self, key: str) -> Optional[Any]:
+        """Remove one entry without calling on_evict; returns its value."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self._bytes -= entry.size
+            return entry.value
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    # ------------------------------------------------------------------
+    # Configuration
+    # ------------------------------------------------------------------
+
+    def configure(self, max_bytes: Optional[int] = None, policy: Optional[str] = None) -> None:
+        """Change the budget or policy; shrinking the budget evicts immediately."""
+        if policy is not None and policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy '{policy}'. Use one of {EVICTION_POLICIES}")
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if policy is not None:
+                self.policy = policy
+            evicted = self._evict_over_budget()
+        self._notify_evicted(evicted)
+
+    def pin(self, key: str) -> None:
+        """Never evict `key` (it may be pinned before it is loaded)."""
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key: str) -> None:
+        with self._lock:
+            self._pinned.discard(key)
+            evicted = self._evict_over_budget()
+        self._notify_evicted(evicted)
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        """Budget, usage, counters and per-entry size / hit counts."""
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "max_bytes": self.max_bytes,
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "pinned": sorted(self._pinned),
+                "entries": {
+                    key: {"bytes": entry.size, "hits": entry.hits} for key, entry in self._entries.items()
+                },
+            }
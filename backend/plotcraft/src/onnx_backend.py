@@ -0,0 +1,183 @@
+"""
+ONNX Runtime backend for PlotCraft generation.
+
+Runs graphs exported by onnx_export.py with numpy + onnxruntime only, so a
+serving image does not need torch for PlotCraft. Decoding reuses DecodeState
+(incremental n-gram table, stop criteria, on_token streaming) and applies the
+same sampling knobs in the same order as decoding.process_logits: repetition
+penalty, n-gram ban, temperature, top-k, top-p.
+
+OnnxModel.submit() follows the BatchScheduler contract (returns the job's
+future, resolving to generated ids), but requests are decoded independently on
+a small thread pool rather than batched.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None  # type: ignore
+
+from .decoding import DecodeState
+
+logger = logging.getLogger(__name__)
+
+ONNX_NAME = "model.onnx"
+DEFAULT_WORKERS = 4
+
+
+def onnx_path_for(model_path: str) -> str:
+    """Where the ONNX export of a checkpoint lives (next to model.pt)."""
+    return os.path.join(os.path.dirname(model_path), ONNX_NAME)
+
+
+def cache_names(num_layers: int, kind: str = "past") -> List[str]:
+    """Flat KV input/output names: {kind}_key_0, {kind}_value_0, {kind}_key_1, ..."""
+    return [f"{kind}_{part}_{i}" for i in range(num_layers) for part in ("key", "value")]
+
+
+def process_logits_np(scores: np.ndarray, state: DecodeState) -> np.ndarray:
+    """
+    numpy counterpart of decoding.process_logits for one sequence.
+
+    Returns a new float32 array; `scores` is left untouched.
+    """
+    scores = scores.astype(np.float32, copy=True)
+    if state.repetition_penalty != 1.0 and state.seen:
+        idx = np.fromiter(sorted(state.seen), dtype=np.int64)
+        picked = scores[idx]
+        scores[idx] = np.where(
+            picked < 0, picked * state.repetition_penalty, picked / state.repetition_penalty
+        )
+    banned = state.banned_tokens()
+    if banned:
+        scores[np.fromiter(sorted(banned), dtype=np.int64)] = -np.inf
+    biases = state.logit_biases()
+    if biases:
+        scores[np.fromiter(biases, dtype=np.int64)] += np.fromiter(biases.values(), dtype=np.float32)
+    if state.temperature != 1.0:
+        scores = scores / np.float32(state.temperature)
+    if state.top_k > 0:
+        k = min(state.top_k, scores.shape[-1])
+        threshold = np.partition(scores, -k)[-k]
+        scores[scores < threshold] = -np.inf
+    if state.top_p < 1.0:
+        order = np.argsort(scores, kind="stable")
+        cumulative = np.cumsum(_softmax(scores[order]))
+        remove = cumulative <= (1 - state.top_p)
+        remove[-1] = False
+        scores[order[remove]] = -np.inf
+    return scores
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    shifted = np.exp(scores - np.max(scores))
+    return shifted / shifted.sum()
+
+
+class OnnxModel:
+    """An exported PlotCraft genre model served with ONNX Runtime."""
+
+    def __init__(self, path: str, max_workers: int = DEFAULT_WORKERS, seed: Optional[int] = None):
+        if ort is None:
+            raise RuntimeError("onnxruntime not installed")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.path = path
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.n_positions = int(metadata.get("n_positions", 512))
+        past_inputs = [i for i in self.session.get_inputs() if i.name.startswith("past_")]
+        self.num_layers = len(past_inputs) // 2
+        _, self.n_head, _, self.head_dim = past_inputs[0].shape
+        self._past_names = cache_names(self.num_layers)
+        self._output_names = ["logits", *cache_names(self.num_layers, "present")]
+
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="plotcraft-onnx")
+        self._seeds = np.random.SeedSequence(seed)
+        self._seed_lock = threading.Lock()
+        self._cancelled = False
+
+    def empty_past(self, batch: int = 1) -> List[np.ndarray]:
+        """Zero-length KV inputs for a prefill."""
+        shape = (batch, self.n_head, 0, self.head_dim)
+        return [np.zeros(shape, dtype=np.float32) for _ in self._past_names]
+
+    def forward(self, input_ids: List[List[int]], past: List[np.ndarray]):
+        """Run one step; returns (logits (B,T,V), presents)."""
+        feeds: Dict[str, np.ndarray] = {"input_ids": np.asarray(input_ids, dtype=np.int64)}
+        feeds.update(zip(self._past_names, past))
+        logits, *presents = self.session.run(self._output_names, feeds)
+        return logits, presents
+
+    def decode(self, state: DecodeState, rng: Optional[np.random.Generator] = None) -> List[int]:
+        """Generate tokens for one sequence (same contract as decoding.decode, including state.seed)."""
+        if rng is None:
+            rng = np.random.default_rng(state.seed) if state.seed is not None else self._rng()
+        state.start()
+        if state.max_new_tokens <= 0 or state.should_stop():
+            return []
+
+        logits, past = self.forward([state.tokens], self.empty_past())
+        while True:
+            probs = _softmax(process_logits_np(logits[0, -1], state)).astype(np.float64)
+            token_id = int(rng.choice(probs.shape[0], p=probs / probs.sum()))
+            state.append(token_id)
+            if state.finished:
+                break
+            logits, past = self.forward([[token_id]], past)
+        return list(state.generated)
+
+    def continuation_logprobs(self, prompt_ids: List[int], continuations: List[List[int]]) -> List[float]:
+        """Mean per-token log-likelihood of each continuation (see decoding.continuation_logprobs)."""
+        if not continuations:
+            return []
+        rows = len(continuations)
+        width = 1 + max(len(c) for c in continuations)
+        if len(prompt_ids) > 1:
+            _, past = self.forward([prompt_ids[:-1]], self.empty_past())
+            past = [np.repeat(p, rows, axis=0) for p in past]
+        else:
+            past = self.empty_past(rows)
+        input_ids = [[prompt_ids[-1], *c] + [0] * (width - 1 - len(c)) for c in continuations]
+        logits, _ = self.forward(input_ids, past)
+        logits = logits[:, :-1].astype(np.float32)
+        shifted = logits - logits.max(axis=-1, keepdims=True)
+        logprobs = shifted - np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+        targets = np.asarray(input_ids, dtype=np.int64)[:, 1:, None]
+        picked = np.take_along_axis(logprobs, targets, axis=2)[:, :, 0]
+        return [float(picked[i, : len(c)].mean()) if c else 0.0 for i, c in enumerate(continuations)]
+
+    def submit(self, job) -> Future:
+        """Decode a GenerationJob on the pool; resolves job.future with generated ids."""
+        def _run() -> None:
+            if job.future.done():
+                return
+            if self._cancelled:
+                job.future.set_exception(RuntimeError("ONNX model stopped"))
+                return
+            try:
+                job.future.set_result(self.decode(job))
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"ONNX decode failed ({self.path}): {e}")
+                job.future.set_exception(e)
+
+        self._pool.submit(_run)
+        return job.future
+
+    def stop(self, drain: bool = False) -> None:
+        """Stop accepting jobs; queued decodes fail unless `drain` (running ones finish)."""
+        self._cancelled = not drain
+        self._pool.shutdown(wait=False)
+
+    def _rng(self) -> np.random.Generator:
+        with self._seed_lock:
+            return np.random.default_rng(self._seeds.spawn(1)[0])
@@ -0,0 +1,141 @@
+"""
+Export PlotCraft checkpoints to ONNX graphs with KV-cache inputs/outputs.
+
+The exported graph takes `input_ids` (batch, seq) plus `past_key_{i}` /
+`past_value_{i}` (batch, heads, past, head_dim) for every layer, and returns
+`logits` (batch, seq, vocab) plus the matching `present_key_{i}` /
+`present_value_{i}`. An empty past (past=0) is a prefill; feeding the presents
+back with one new token is a decode step. onnx_backend.py runs these graphs
+with ONNX Runtime.
+
+Usage (from backend/):
+    python -m plotcraft.src.onnx_export            # every genre with a checkpoint
+    python -m plotcraft.src.onnx_export --genres horror
+
+Requires torch, onnx and onnxscript (export time only; see requirements-train.txt).
+"""
+
+import argparse
+import logging
+import os
+import sentencepiece as spm
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+from .checkpoint_io import load_checkpoint
+from .onnx_backend import cache_names, onnx_path_for
+from .plotcraft_generator import SUPPORTED_GENRES, _resolve_paths
+
+logger = logging.getLogger(__name__)
+
+
+class GPT2WithPast(nn.Module):
+    """
+    Export-friendly GPT-2 forward with explicit per-layer KV tensors.
+
+    Reuses the submodules of a PlotCraft GPT2LMHeadModel, so it computes the
+    same function as the HF forward without HF's cache objects in the graph.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.n_head = model.config.n_head
+        self.head_dim = model.config.n_embd // model.config.n_head
+
+    def forward(self, input_ids, *past):
+        transformer = self.model.transformer
+        batch, seq_len = input_ids.shape
+        past_len = past[0].shape[2]
+
+        positions = torch.arange(past_len, past_len + seq_len, device=input_ids.device).unsqueeze(0)
+        hidden = transformer.wte(input_ids) + transformer.wpe(positions)
+
+        # Causal mask over [past | new] keys for the new queries
+        query_pos = torch.arange(seq_len, device=input_ids.device).unsqueeze(1) + past_len
+        key_pos = torch.arange(past_len + seq_len, device=input_ids.device).unsqueeze(0)
+        mask = key_pos <= query_pos
+
+        presents = []
+        for i, block in enumerate(transformer.h):
+            q, k, v = block.attn.c_attn(block.ln_1(hidden)).split(hidden.shape[-1], dim=2)
+            q, k, v = (x.view(batch, seq_len, self.n_head, self.head_dim).transpose(1, 2) for x in (q, k, v))
+            k = torch.cat([past[2 * i], k], dim=2)
+            v = torch.cat([past[2 * i + 1], v], dim=2)
+            attn = F.scaled_dot_product_attention(q, k, v, attn_mask=mask)
+            hidden = hidden + block.attn.c_proj(attn.transpose(1, 2).reshape(hidden.shape))
+            hidden = hidden + block.mlp(block.ln_2(hidden))
+            presents += [k, v]
+
+        logits = self.model.lm_head(transformer.ln_f(hidden))
+        return (logits, *presents)
+
+
+def export_onnx(model, output_path: str) -> str:
+    """
+    Export an eval-mode PlotCraft model to ONNX.
+
+    Args:
+        model: GPT2LMHeadModel from build_model with weights loaded
+        output_path: Destination .onnx file
+
+    Returns:
+        The output path.
+    """
+    import onnx
+    from torch.export import Dim
+
+    config = model.config
+    wrapper = GPT2WithPast(model.eval()).eval()
+    past_names = cache_names(config.n_layer)
+    head_dim = config.n_embd // config.n_head
+
+    batch = Dim("batch")
+    seq = Dim("seq", max=config.n_positions)
+    past = Dim("past", min=0, max=config.n_positions)
+    example_past = tuple(torch.zeros(1, config.n_head, 3, head_dim) for _ in past_names)
+
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            (torch.tensor([[1, 2]]), *example_past),
+            output_path,
+            input_names=["input_ids", *past_names],
+            output_names=["logits", *cache_names(config.n_layer, "present")],
+            dynamic_shapes=({0: batch, 1: seq}, tuple({0: batch, 2: past} for _ in past_names)),
+            dynamo=True,
+            external_data=False,
+        )
+
+    # Record the context window so the runtime can cap generation without torch
+    proto = onnx.load(output_path)
+    for key, value in (("n_positions", config.n_positions), ("vocab_size", config.vocab_size)):
+        entry = proto.metadata_props.add()
+        entry.key, entry.value = key, str(value)
+    onnx.save(proto, output_path)
+    logger.info(f"Exported ONNX graph to {output_path}")
+    return output_path
+
+
+def export_checkpoint(model_path: str, tokenizer_path: str) -> str:
+    """Load a genre checkpoint and export it next to model.pt."""
+    vocab_size = spm.SentencePieceProcessor(model_file=tokenizer_path).vocab_size()
+    return export_onnx(load_checkpoint(model_path, vocab_size, 512), onnx_path_for(model_path))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export PlotCraft checkpoints to ONNX")
+    parser.add_argument("--genres", nargs="+", default=SUPPORTED_GENRES)
+    args = parser.parse_args()
+
+    for genre in args.genres:
+        model_path, tok_path = _resolve_paths(genre)
+        if not (os.path.exists(model_path) and os.path.exists(tok_path)):
+            print(f"{genre}: skipped (checkpoint or tokenizer missing)")
+            continue
+        print(f"{genre}: {export_checkpoint(model_path, tok_path)}")
+
+
+if __name__ == "__main__":
+    main()
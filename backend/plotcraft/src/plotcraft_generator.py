@@ -4,24 +4,58 @@ PlotCraft story generator for API use.
 Lazy-loads trained genre-specific models (action, horror, scifi) and SentencePiece tokenizers.
 Provides generate_text() for FastAPI story pipeline to generate multi-genre story continuations.
 Implements intelligent caching, fallback mechanisms, and GPU support.
+Loaded models live in a memory-budgeted cache with LRU/LFU eviction, pinning
+and single-flight loading (see model_cache.py).
+Concurrent requests for the same genre are merged into one decode batch by a
+per-genre continuous-batching scheduler (see batching.py); alternatively each
+request can be decoded with prompt-lookup speculative decoding (speculative.py)
+or through torch.compile'd graphs per padded shape bucket (compiled.py).
+generate_candidates() samples N continuations in one batch and scores each by
+model log-likelihood for best-of-N reranking; generate_batch() continues several
+different prompts in one batch. generate_long_text() keeps generating past the
+context window in chunks, each prompted with a compact header plus the story tail.
+Seeded requests are decoded on their own with a private RNG, so a seed plus the
+inputs fully determine the output (model_version() identifies the weights).
+Static prompt template prefixes are prefilled once per model and reused (see prefix_cache.py).
+share_model() / attach_shared_model() let worker processes serve genres whose
+weights a supervisor loaded once into shared memory (see worker_pool.py).
+Passing `characters` steers sampling toward those names with a decaying logit
+bias and completes multi-piece names once started (see character_bias.py).
+On CPU hosts models can be served int8 dynamically quantized (quantization.py)
+or as exported ONNX graphs on ONNX Runtime without torch (onnx_backend.py); both
+are selected with configure().
 
 If checkpoint/tokenizer are missing, raises PlotCraftUnavailable so callers can fall back
 to alternative generation methods.
 """
 
 import os
+import hashlib
 import logging
-from typing import Dict, Tuple, Optional
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Optional
 
 # Optional deps: torch and sentencepiece only needed when model is used
 try:
     import torch
-    import sentencepiece as spm
 except ImportError:
     torch = None  # type: ignore
+try:
+    import sentencepiece as spm
+except ImportError:
     spm = None  # type: ignore
 
-from .model import build_model
+from .batching import GenerationJob, get_scheduler, stop_schedulers
+from .character_bias import DEFAULT_DECAY, DEFAULT_STRENGTH, CharacterBias
+from .checkpoint_io import checkpoint_version, load_checkpoint
+from .compiled import DEFAULT_BUCKETS, CompiledRunner
+from .decoding import KVCache, StopCriterion, continuation_logprobs, decode, prompt_kv
+from .model_cache import ModelCache
+from .onnx_backend import OnnxModel, onnx_path_for
+from .prefix_cache import PrefixCache
+from .quantization import QUANTIZATION_MODES, load_quantized
+from .streaming import TokenStream
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +67,12 @@ _CHECKPOINT_DIR = os.path.join(_BASE, "checkpoints")
 _TOKENIZER_DIR = os.path.join(_BASE, "tokenizer")
 
 SUPPORTED_GENRES = ["action", "horror", "scifi"]
+# Model context window (n_positions); prompt + generated tokens must fit in it
+CONTEXT_SIZE = 512
+# generate_long_text(): story tokens carried into each new chunk, and the least
+# room a chunk must leave to generate before the context is rolled
+ROLLING_TAIL_TOKENS = 256
+MIN_CHUNK_TOKENS = 64
 
 
 class PlotCraftUnavailable(Exception):
@@ -40,8 +80,126 @@ class PlotCraftUnavailable(Exception):
     pass
 
 
-# Cache models per genre to avoid reloading on every request
-_cache: Dict[str, Tuple["torch.nn.Module", "spm.SentencePieceProcessor", "torch.device"]] = {}
+@dataclass
+class GenerationStats:
+    """Token counts of a generate_text() / generate_candidates() call, filled in when passed as `stats`."""
+
+    prompt_tokens: int = 0
+    new_tokens: int = 0  # summed over candidates / prompts for generate_candidates() / generate_batch()
+
+
+def _model_nbytes(model) -> int:
+    """Memory held by a loaded model's weights (torch state_dict or ONNX file)."""
+    if isinstance(model, OnnxModel):
+        return os.path.getsize(model.path)
+    total = 0
+    seen = set()
+    for value in model.state_dict().values():
+        # Dynamically quantized layers store (weight, bias) tuples of packed params
+        tensors = value if isinstance(value, tuple) else (value,)
+        for tensor in tensors:
+            # Tied weights (wte / lm_head) share storage; count them once
+            if isinstance(tensor, torch.Tensor) and tensor.data_ptr() not in seen:
+                seen.add(tensor.data_ptr())
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+# Loaded (model, tokenizer, device) per genre variant (see _variant_key), byte-budgeted
+_cache = ModelCache(
+    size_of=lambda entry: _model_nbytes(entry[0]),
+    on_evict=lambda key, entry: _release(key, entry[0], drain=True),
+)
+# (genre, checkpoint version, tokenizer fingerprint) per loaded variant; keys the prefix cache
+_model_keys: Dict[str, Tuple[str, str, str]] = {}
+# model_version() of each loaded variant, taken when it was loaded
+_loaded_versions: Dict[str, str] = {}
+# Prefilled KV for static prompt-template prefixes, shared by all genres
+prefix_cache = PrefixCache()
+# Serving options applied when a genre is loaded (set via configure())
+_options = {
+    "quantization": "none",
+    "backend": "torch",
+    "speculative": False,
+    "compiled": False,
+    "compile_buckets": DEFAULT_BUCKETS,
+    "character_bias_strength": DEFAULT_STRENGTH,
+    "character_bias_decay": DEFAULT_DECAY,
+}
+# Genres whose models are never evicted
+_pinned_genres: set = set()
+
+BACKENDS = ("torch", "onnx")
+
+
+def configure(
+    quantization: Optional[str] = None,
+    backend: Optional[str] = None,
+    cache_max_bytes: Optional[int] = None,
+    cache_policy: Optional[str] = None,
+    pinned_genres: Optional[Iterable[str]] = None,
+    speculative: Optional[bool] = None,
+    compiled: Optional[bool] = None,
+    compile_buckets: Optional[Iterable[int]] = None,
+    character_bias_strength: Optional[float] = None,
+    character_bias_decay: Optional[float] = None,
+) -> None:
+    """
+    Set serving options for models loaded from now on.
+
+    Args:
+        quantization: "none" (fp32) or "int8" (dynamic quantization, CPU only)
+        backend: "torch" (eager) or "onnx" (ONNX Runtime on exported graphs)
+        cache_max_bytes: Model cache budget in bytes (0 = unbounded)
+        cache_policy: Model cache eviction policy, "lru" or "lfu"
+        pinned_genres: Genres whose loaded models are never evicted
+        speculative: Serve torch models with prompt-lookup speculative decoding
+            (per request, see speculative.py) instead of continuous batching
+        compiled: Serve torch models through torch.compile'd forward graphs, one
+            per padded shape bucket (per request, see compiled.py); falls back
+            to eager if compilation fails. Ignored when speculative is on.
+        compile_buckets: Sequence lengths compiled graphs are specialised for
+        character_bias_strength: Logit bias on the first token of a pending
+            character name at the first generated token (0 disables it)
+        character_bias_decay: Per-token decay factor of that bias
+
+    Raises:
+        ValueError: If the quantization mode, backend or cache policy is unknown
+    """
+    if speculative is not None:
+        _options["speculative"] = bool(speculative)
+    if compiled is not None:
+        _options["compiled"] = bool(compiled)
+    if compile_buckets is not None:
+        _options["compile_buckets"] = tuple(int(b) for b in compile_buckets)
+    if character_bias_strength is not None:
+        _options["character_bias_strength"] = max(0.0, float(character_bias_strength))
+    if character_bias_decay is not None:
+        _options["character_bias_decay"] = min(1.0, max(0.0, float(character_bias_decay)))
+    if cache_max_bytes is not None or cache_policy is not None:
+        _cache.configure(max_bytes=cache_max_bytes, policy=cache_policy)
+    if pinned_genres is not None:
+        _pinned_genres.clear()
+        _pinned_genres.update(_normalize_model_name(g) for g in pinned_genres)
+        for key in _cache.keys():
+            if _genre_of(key) in _pinned_genres:
+                _cache.pin(key)
+            else:
+                _cache.unpin(key)
+    if backend is not None:
+        name = backend.strip().lower()
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown PlotCraft backend '{backend}'. Use one of {BACKENDS}")
+        if name != _options["backend"]:
+            logger.info(f"PlotCraft backend set to {name}")
+        _options["backend"] = name
+    if quantization is not None:
+        mode = quantization.strip().lower()
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode '{quantization}'. Use one of {QUANTIZATION_MODES}")
+        if mode != _options["quantization"]:
+            logger.info(f"PlotCraft quantization set to {mode}")
+        _options["quantization"] = mode
 
 
 def _normalize_model_name(model_name: Optional[str]) -> str:
@@ -69,6 +227,24 @@ def _normalize_model_name(model_name: Optional[str]) -> str:
     return n
 
 
+def _variant_key(model_name: str) -> str:
+    """
+    Cache/scheduler key for a genre under the current serving options.
+
+    fp32 torch models use the bare genre name; other variants are suffixed
+    (e.g. "horror:int8", "horror:onnx") so they can be loaded side by side.
+    """
+    if _options["backend"] == "onnx":
+        return f"{model_name}:onnx"
+    if _options["quantization"] != "none":
+        return f"{model_name}:{_options['quantization']}"
+    return model_name
+
+
+def _genre_of(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
 def _resolve_paths(model_name: str) -> Tuple[str, str]:
     """
     Resolve checkpoint and tokenizer paths for a genre.
@@ -85,12 +261,44 @@ def _resolve_paths(model_name: str) -> Tuple[str, str]:
     return model, tok
 
 
+def model_version(model_name: Optional[str] = None) -> Optional[str]:
+    """
+    Identity of the weights and serving variant that would answer for a genre.
+
+    Changes whenever the checkpoint or tokenizer file changes or a different
+    quantization/backend is configured. Suitable for keying cached outputs.
+
+    Returns:
+        Version string, or None if the genre's checkpoint or tokenizer is missing.
+    """
+    model_name_n = _normalize_model_name(model_name)
+    model_path, tokenizer_path = _resolve_paths(model_name_n)
+    if not (os.path.isfile(model_path) and os.path.isfile(tokenizer_path)):
+        return None
+    return f"{_variant_key(model_name_n)}@{checkpoint_version(model_path)}/{checkpoint_version(tokenizer_path)}"
+
+
+def loaded_version(model_name: Optional[str] = None) -> Optional[str]:
+    """
+    model_version() of the weights currently loaded for a genre.
+
+    Unlike model_version() this neither loads the genre nor touches its
+    files, so it is cheap enough to call on every request.
+
+    Returns:
+        Version string, or None if the genre is not loaded.
+    """
+    key = _variant_key(_normalize_model_name(model_name))
+    return _loaded_versions.get(key) if key in _cache else None
+
+
 def _ensure_loaded(model_name: Optional[str] = None) -> Tuple["torch.nn.Module", "spm.SentencePieceProcessor", "torch.device"]:
     """
     Lazy-load tokenizer and model for a given genre with caching.
     
-    Uses in-memory cache to avoid reloading models on each request.
-    Falls back to scifi if genre not found.
+    Uses the in-memory model cache to avoid reloading models on each request.
+    Concurrent first requests for a genre share one load. Falls back to scifi
+    if genre not found.
     
     Args:
         model_name: Genre name or None (defaults to scifi)
@@ -102,12 +310,16 @@ def _ensure_loaded(model_name: Optional[str] = None) -> Tuple["torch.nn.Module",
         PlotCraftUnavailable: If files not found or loading fails
     """
     model_name_n = _normalize_model_name(model_name)
-    
-    # Return cached model if available
-    if model_name_n in _cache:
-        logger.debug(f"Using cached model for genre: {model_name_n}")
-        return _cache[model_name_n]
+    key = _variant_key(model_name_n)
+    if model_name_n in _pinned_genres:
+        _cache.pin(key)
+    if _options["backend"] == "onnx":
+        return _cache.get_or_load(key, lambda: _load_onnx(model_name_n, key))
+    return _cache.get_or_load(key, lambda: _load_torch(model_name_n, key))
+
 
+def _load_torch(model_name_n: str, key: str) -> Tuple["torch.nn.Module", "spm.SentencePieceProcessor", "torch.device"]:
+    """Load a genre checkpoint with torch (fp32 or int8 per configure())."""
     if torch is None or spm is None:
         raise PlotCraftUnavailable("torch or sentencepiece not installed")
 
@@ -129,18 +341,158 @@ def _ensure_loaded(model_name: Optional[str] = None) -> Tuple["torch.nn.Module",
         vocab_size = tokenizer.vocab_size()
         logger.info(f"Tokenizer loaded. Vocab size: {vocab_size}")
         
-        model = build_model(vocab_size, 512).to(device)
-        state_dict = torch.load(model_path, map_location=device)
-        model.load_state_dict(state_dict)
-        model.eval()
-        logger.info(f"Model loaded and moved to {device}")
+        quantization = _options["quantization"]
+        if quantization == "int8" and device.type != "cpu":
+            logger.warning("int8 quantization is CPU-only; loading fp32 model instead")
+            quantization = "none"
+
+        if quantization == "int8":
+            model = load_quantized(model_path, vocab_size, CONTEXT_SIZE)
+            logger.info("Model loaded as int8 dynamically quantized")
+        else:
+            # Meta-device skeleton + mmapped weights: no random init, no second copy
+            model = load_checkpoint(model_path, vocab_size, CONTEXT_SIZE, device)
+            logger.info(f"Model loaded on {device}")
     except Exception as e:  # noqa: BLE001
         logger.error(f"Failed to load PlotCraft ({model_name_n}): {e}")
         raise PlotCraftUnavailable(f"Failed to load PlotCraft ({model_name_n}): {e}") from e
 
-    _cache[model_name_n] = (model, tokenizer, device)
-    logger.info(f"Model cached for genre: {model_name_n}")
-    return _cache[model_name_n]
+    _model_keys[key] = _model_key(model_name_n, model_path, tokenizer, quantization)
+    _loaded_versions[key] = model_version(model_name_n)
+    logger.info(f"Model loaded for genre: {model_name_n} ({key})")
+    return model, tokenizer, device
+
+
+def _load_onnx(model_name: str, key: str) -> Tuple["OnnxModel", "spm.SentencePieceProcessor", None]:
+    """Load a genre's exported ONNX graph (see onnx_export.py); torch is not needed."""
+    if spm is None:
+        raise PlotCraftUnavailable("sentencepiece not installed")
+
+    model_path, tok_path = _resolve_paths(model_name)
+    onnx_path = onnx_path_for(model_path)
+    if not os.path.exists(onnx_path):
+        logger.error(f"ONNX model not found at {onnx_path}. Run: python -m plotcraft.src.onnx_export")
+        raise PlotCraftUnavailable(f"ONNX model not found at {onnx_path}")
+    if not os.path.exists(tok_path):
+        logger.error(f"Tokenizer not found at {tok_path}. Expected: {tok_path}")
+        raise PlotCraftUnavailable(f"Tokenizer not found at {tok_path}")
+
+    try:
+        logger.info(f"Loading PlotCraft ONNX model for genre: {model_name}")
+        tokenizer = spm.SentencePieceProcessor(model_file=tok_path)
+        model = OnnxModel(onnx_path)
+    except Exception as e:  # noqa: BLE001
+        logger.error(f"Failed to load PlotCraft ONNX ({model_name}): {e}")
+        raise PlotCraftUnavailable(f"Failed to load PlotCraft ONNX ({model_name}): {e}") from e
+
+    _model_keys[key] = _model_key(model_name, onnx_path, tokenizer, "onnx")
+    _loaded_versions[key] = model_version(model_name)
+    logger.info(f"ONNX model loaded for genre: {model_name} ({key})")
+    return model, tokenizer, None
+
+
+def _model_key(model_name: str, model_path: str, tokenizer, quantization: str) -> Tuple[str, str, str]:
+    """Identify a loaded checkpoint + tokenizer so cached KV never crosses versions."""
+    version = f"{checkpoint_version(model_path)}-{quantization}"
+    tokenizer_fingerprint = hashlib.sha1(tokenizer.serialized_model_proto()).hexdigest()[:16]
+    return model_name, version, tokenizer_fingerprint
+
+
+def _prefix_kv(model, tokenizer, device, model_name: str, input_ids, prompt_prefix: Optional[str]):
+    """Reusable KV for the leading prompt tokens shared with a template prefix, if any."""
+    if not prompt_prefix or model_name not in _model_keys or isinstance(model, OnnxModel):
+        return None
+
+    def _compute(prefix_ids):
+        cache = KVCache.for_model(model)
+        with torch.no_grad():
+            model(
+                input_ids=torch.tensor([prefix_ids], device=device),
+                past_key_values=cache.model_cache,
+                use_cache=True,
+            )
+        return cache.tensors()
+
+    prefix_ids = tokenizer.encode(prompt_prefix, out_type=int)
+    return prefix_cache.lookup(_model_keys[model_name], input_ids, prefix_ids, _compute)
+
+
+def preload(model_name: Optional[str] = None) -> None:
+    """
+    Load a genre model into the cache ahead of its first request.
+
+    Raises:
+        PlotCraftUnavailable: If files not found or loading fails
+    """
+    _ensure_loaded(model_name)
+
+
+def share_model(model_name: Optional[str] = None) -> Tuple["torch.nn.Module", bytes, Tuple[str, str, str], str]:
+    """
+    Load a genre and move its weights into shared memory for worker processes.
+
+    Only fp32 torch models can be shared (int8 packed weights and ONNX
+    sessions are process-local).
+
+    Returns:
+        (model, serialized tokenizer, model key, model version) to hand to
+        attach_shared_model() in each worker
+
+    Raises:
+        PlotCraftUnavailable: If files not found, loading fails or the
+            configured variant cannot be shared
+    """
+    if _options["backend"] != "torch" or _options["quantization"] != "none":
+        raise PlotCraftUnavailable("Only fp32 torch models can be shared between worker processes")
+    model_name_n = _normalize_model_name(model_name)
+    model, tokenizer, _ = _ensure_loaded(model_name_n)
+    model.share_memory()
+    key = _variant_key(model_name_n)
+    return model, tokenizer.serialized_model_proto(), _model_keys[key], model_version(model_name_n)
+
+
+def attach_shared_model(model_name: str, model, tokenizer_proto: bytes, model_key: Tuple[str, str, str]) -> None:
+    """
+    Serve a genre from weights another process placed in shared memory (see share_model()).
+
+    The model is pinned in the cache, so this process never evicts it or
+    loads its own copy of the checkpoint.
+
+    Raises:
+        PlotCraftUnavailable: If sentencepiece is not installed
+    """
+    if spm is None:
+        raise PlotCraftUnavailable("sentencepiece not installed")
+    model_name_n = _normalize_model_name(model_name)
+    key = _variant_key(model_name_n)
+    tokenizer = spm.SentencePieceProcessor(model_proto=tokenizer_proto)
+    device = next(model.parameters()).device
+    _model_keys[key] = tuple(model_key)
+    _cache.pin(key)
+    _cache.get_or_load(key, lambda: (model.eval(), tokenizer, device))
+
+
+def warmup(model_name: Optional[str] = None) -> None:
+    """
+    Compile a genre's shape-bucketed graphs ahead of its first request.
+
+    Only does work when compiled serving is configured (see configure());
+    otherwise the genre is just loaded.
+
+    Raises:
+        PlotCraftUnavailable: If files not found or loading fails
+    """
+    model, _, device = _ensure_loaded(model_name)
+    if isinstance(model, OnnxModel) or _options["speculative"] or not _options["compiled"]:
+        return
+    scheduler = get_scheduler(
+        _variant_key(_normalize_model_name(model_name)),
+        model,
+        device,
+        compiled=True,
+        compile_buckets=_options["compile_buckets"],
+    )
+    scheduler.warmup()
 
 
 def is_available() -> bool:
@@ -152,14 +504,17 @@ def is_available() -> bool:
         return False
 
 
-def get_cached_genres() -> Dict[str, bool]:
+def get_cached_genres() -> Dict[str, Any]:
     """
     Get information about which genres are currently cached.
     
     Returns:
-        Dict mapping genre names to boolean indicating if cached
+        Dict with "genres" (genre -> bool, True if any variant is loaded) plus
+        model cache stats: policy, max_bytes, bytes, hits, misses, evictions,
+        pinned keys and per-entry bytes/hits.
     """
-    return {genre: genre in _cache for genre in SUPPORTED_GENRES}
+    loaded = {_genre_of(key) for key in _cache.keys()}
+    return {"genres": {genre: genre in loaded for genre in SUPPORTED_GENRES}, **_cache.stats()}
 
 
 def clear_cache(genre: Optional[str] = None) -> None:
@@ -169,16 +524,150 @@ def clear_cache(genre: Optional[str] = None) -> None:
     Args:
         genre: Specific genre to clear, or None to clear all
     """
-    global _cache
+    keys = [key for key in _cache.keys() if genre is None or _genre_of(key) == genre]
+    for key in keys:
+        entry = _cache.pop(key)
+        if entry is not None:
+            _release(key, entry[0])
     if genre:
-        if genre in _cache:
-            del _cache[genre]
-            logger.info(f"Cleared cache for genre: {genre}")
+        logger.info(f"Cleared cache for genre: {genre}")
     else:
-        _cache.clear()
         logger.info("Cleared all model caches")
 
 
+def _release(key: str, model, drain: bool = False) -> None:
+    """
+    Free everything tied to an unloaded model variant.
+
+    Evictions drain (requests already decoding on the model finish); explicit
+    clear_cache() calls cancel them.
+    """
+    stop_schedulers(key, drain=drain)
+    model_key = _model_keys.pop(key, None)
+    if model_key is not None:
+        prefix_cache.clear(model_key)
+    if isinstance(model, OnnxModel):
+        model.stop(drain=drain)
+
+
+def _prepare_job(
+    prompt: str,
+    max_tokens: int,
+    model_name: Optional[str],
+    temperature: float,
+    top_k: int,
+    top_p: float,
+    repetition_penalty: float,
+    no_repeat_ngram_size: int,
+    prompt_prefix: Optional[str] = None,
+    seed: Optional[int] = None,
+    stop_criteria: Optional[List[StopCriterion]] = None,
+    characters: Optional[List[str]] = None,
+    prompt_ids: Optional[List[int]] = None,
+) -> Tuple[Optional[GenerationJob], "spm.SentencePieceProcessor", object]:
+    """
+    Load the genre model, encode the prompt and build a scheduler job.
+
+    When `prompt_prefix` (the static template text `prompt` starts with) is
+    given, its cached KV is attached so only the remaining tokens are prefilled.
+    Seeded jobs always prefill the whole prompt: a split prefill can differ in
+    the last float bits, which is enough to change a sampled token.
+    `stop_criteria` are checked after every sampled token (and before the
+    prefill), so e.g. a deadline or cancellation ends the decode early and the
+    tokens generated so far are returned. `characters` are names to steer
+    sampling toward (see character_bias.py). `prompt_ids`, when given, are
+    used as the encoded prompt instead of encoding `prompt`.
+
+    Returns (job, tokenizer, scheduler); job is None when the prompt leaves
+    no room in the context window.
+    """
+    if prompt_ids is None and (not prompt or not prompt.strip()):
+        raise ValueError("Prompt cannot be empty")
+
+    model, tokenizer, device = _ensure_loaded(model_name)
+    model_name_n = _normalize_model_name(model_name)
+    key = _variant_key(model_name_n)
+
+    context_size = CONTEXT_SIZE
+    input_ids = list(prompt_ids) if prompt_ids is not None else tokenizer.encode(prompt, out_type=int)
+
+    logger.debug(f"Prompt encoded to {len(input_ids)} tokens")
+
+    # Keep within model context window
+    if len(input_ids) > context_size:
+        logger.warning(f"Prompt too long ({len(input_ids)} tokens). Truncating to {context_size}.")
+        input_ids = input_ids[-context_size:]
+
+    # Total length (input + generated) must not exceed context_size
+    max_new_tokens = min(max_tokens, context_size - len(input_ids))
+    if max_new_tokens <= 0:
+        logger.warning("Prompt uses entire context window. No tokens left for generation.")
+        return None, tokenizer, None
+
+    logger.info(
+        f"Generating text ({model_name_n}): "
+        f"prompt_tokens={len(input_ids)}, max_new_tokens={max_new_tokens}, "
+        f"temp={temperature}, top_p={top_p}"
+    )
+
+    # ONNX models decode on their own pool with the same submit() contract
+    if isinstance(model, OnnxModel):
+        scheduler = model
+    else:
+        scheduler = get_scheduler(
+            key,
+            model,
+            device,
+            speculative=_options["speculative"],
+            compiled=_options["compiled"],
+            compile_buckets=_options["compile_buckets"],
+        )
+    job = GenerationJob(
+        input_ids=input_ids,
+        max_new_tokens=max_new_tokens,
+        temperature=temperature,
+        top_k=top_k,
+        top_p=top_p,
+        repetition_penalty=repetition_penalty,
+        no_repeat_ngram_size=no_repeat_ngram_size,
+        prefix_kv=(
+            # Compiled decodes prefill the whole padded prompt in one call anyway
+            None
+            if seed is not None or isinstance(scheduler, CompiledRunner)
+            else _prefix_kv(model, tokenizer, device, key, input_ids, prompt_prefix)
+        ),
+        seed=seed,
+        stop_criteria=list(stop_criteria or []),
+        character_bias=(
+            CharacterBias.for_names(
+                characters,
+                lambda name: tokenizer.encode(name, out_type=int),
+                strength=_options["character_bias_strength"],
+                decay=_options["character_bias_decay"],
+            )
+            if characters
+            else None
+        ),
+    )
+    return job, tokenizer, scheduler
+
+
+def _decode_seeded(job: GenerationJob, scheduler) -> "Future":
+    """
+    Decode a seeded job on its own instead of in the shared batch.
+
+    Batched logits depend slightly on which other rows share the batch, so
+    only a solo decode with the job's private RNG is reproducible. ONNX models
+    and compiled runners already decode each job alone on their pool.
+    """
+    if isinstance(scheduler, (OnnxModel, CompiledRunner)):
+        return scheduler.submit(job)
+    future: Future = Future()
+    try:
+        future.set_result(decode(scheduler.model, job, scheduler.device))
+    except Exception as e:  # noqa: BLE001
+        future.set_exception(e)
+    return future
 
 
 def generate_text(
@@ -190,13 +679,20 @@ def generate_text(
     top_p: float = 0.95,
     repetition_penalty: float = 1.2,
     no_repeat_ngram_size: int = 3,
+    prompt_prefix: Optional[str] = None,
+    seed: Optional[int] = None,
+    stats: Optional[GenerationStats] = None,
+    stop_criteria: Optional[List[StopCriterion]] = None,
+    characters: Optional[List[str]] = None,
 ) -> str:
     """
     Generate story continuation from a prompt using the PlotCraft model.
     
     Supports multi-genre generation (action, horror, scifi) with fine-grained
     sampling control. Uses nucleus sampling (top_p) for diversity and repetition
-    penalties to avoid repetitive text.
+    penalties to avoid repetitive text. The request is decoded in the genre's
+    shared batch, so concurrent callers share forward passes while keeping their
+    own sampling parameters.
 
     Args:
         prompt: Input text (story prefix or full prompt).
@@ -207,6 +703,17 @@ def generate_text(
         top_p: Nucleus sampling threshold (default: 0.95).
         repetition_penalty: Penalize repetitive tokens (default: 1.2).
         no_repeat_ngram_size: Forbid repeating n-grams of this size (default: 3).
+        prompt_prefix: Static template text the prompt starts with; its KV is
+            prefilled once and reused across requests (output is unchanged).
+        seed: Make the output reproducible: the same seed, prompt, parameters
+            and model_version() always give the same text. Seeded requests
+            are decoded outside the shared batch.
+        stats: Optional GenerationStats to receive prompt / generated token counts.
+        stop_criteria: Callables given the generated ids after each token; decoding
+            stops (keeping the partial output) as soon as one returns True.
+        characters: Character names to steer the continuation toward: each
+            name not generated yet gets a decaying logit bias on its first
+            token, and a started multi-token name is always completed.
 
     Returns:
         Generated continuation text (prompt stripped at token-level).
@@ -219,57 +726,350 @@ def generate_text(
         >>> text = generate_text("Once upon a time", model_name="horror", max_tokens=200)
         >>> print(text)  # "... continued horror story ..."
     """
+    job, tokenizer, scheduler = _prepare_job(
+        prompt,
+        max_tokens=max_tokens,
+        model_name=model_name,
+        temperature=temperature,
+        top_k=top_k,
+        top_p=top_p,
+        repetition_penalty=repetition_penalty,
+        no_repeat_ngram_size=no_repeat_ngram_size,
+        prompt_prefix=prompt_prefix,
+        seed=seed,
+        stop_criteria=stop_criteria,
+        characters=characters,
+    )
+    if job is None:
+        return ""
+
+    if seed is not None:
+        continuation_ids = _decode_seeded(job, scheduler).result()
+    else:
+        # Decoded together with any other in-flight requests for this genre
+        continuation_ids = scheduler.submit(job).result()
+    if stats is not None:
+        stats.prompt_tokens = len(job.input_ids)
+        stats.new_tokens = len(continuation_ids)
+    result = tokenizer.decode(continuation_ids).strip()
+    
+    logger.info(f"Generated {len(result)} characters")
+    return result
+
+
+def generate_long_text(
+    prompt: str,
+    max_tokens: int = 800,
+    model_name: Optional[str] = None,
+    context_header: Optional[str] = None,
+    tail_tokens: int = ROLLING_TAIL_TOKENS,
+    temperature: float = 0.8,
+    top_k: int = 40,
+    top_p: float = 0.95,
+    repetition_penalty: float = 1.2,
+    no_repeat_ngram_size: int = 3,
+    prompt_prefix: Optional[str] = None,
+    seed: Optional[int] = None,
+    stats: Optional[GenerationStats] = None,
+    stop_criteria: Optional[List[StopCriterion]] = None,
+    characters: Optional[List[str]] = None,
+) -> str:
+    """
+    Generate up to `max_tokens` even past the context window, with a sliding context.
+
+    The first chunk continues `prompt` exactly like generate_text() (unless
+    the prompt leaves less than MIN_CHUNK_TOKENS of room). Every following
+    chunk is prompted with `context_header` (e.g. genre and characters) plus
+    the last `tail_tokens` tokens of the story so far, prompt included, and
+    fills the rest of the window. The header's KV is prefilled once and reused
+    from the prefix cache; the tail sits at new positions in every chunk, so
+    it is prefilled again (one batched forward pass per chunk). Chunks carry
+    token ids rather than re-encoded text, so the story is never re-tokenized.
+
+    Takes the same arguments as generate_text(); `stats.prompt_tokens` sums
+    every chunk's prompt. With a `seed`, chunk i is decoded with seed + i.
+    `stop_criteria` see each chunk's generated ids, and when one ends a chunk
+    early no further chunk is started.
+
+    Raises:
+        PlotCraftUnavailable: If model/tokenizer are not present or load fails.
+        ValueError: If prompt is empty.
+    """
     if not prompt or not prompt.strip():
         raise ValueError("Prompt cannot be empty")
-    
-    model, tokenizer, device = _ensure_loaded(model_name)
-    model_name_n = _normalize_model_name(model_name)
+    _, tokenizer, _ = _ensure_loaded(model_name)
+    header_ids = tokenizer.encode(context_header, out_type=int) if context_header else []
+    tail_tokens = max(1, min(tail_tokens, CONTEXT_SIZE - len(header_ids) - MIN_CHUNK_TOKENS))
+    story_ids = tokenizer.encode(prompt, out_type=int)
 
-    context_size = 512  # model n_positions
-    input_ids = tokenizer.encode(prompt, out_type=int)
-    
-    logger.debug(f"Prompt encoded to {len(input_ids)} tokens")
-    
-    # Keep within model context window
-    if len(input_ids) > context_size:
-        logger.warning(f"Prompt too long ({len(input_ids)} tokens). Truncating to {context_size}.")
-        input_ids = input_ids[-context_size:]
+    generated: List[int] = []
+    prompt_tokens = 0
+    chunk_ids: Optional[List[int]] = story_ids if CONTEXT_SIZE - len(story_ids) >= MIN_CHUNK_TOKENS else None
+    chunk_prefix = prompt_prefix
+    chunks = 0
+    while len(generated) < max_tokens:
+        if chunk_ids is None:
+            chunk_ids = header_ids + (story_ids + generated)[-tail_tokens:]
+            chunk_prefix = context_header
+        job, _, scheduler = _prepare_job(
+            prompt,
+            max_tokens=max_tokens - len(generated),
+            model_name=model_name,
+            temperature=temperature,
+            top_k=top_k,
+            top_p=top_p,
+            repetition_penalty=repetition_penalty,
+            no_repeat_ngram_size=no_repeat_ngram_size,
+            prompt_prefix=chunk_prefix,
+            seed=None if seed is None else seed + chunks,
+            stop_criteria=stop_criteria,
+            characters=characters,
+            prompt_ids=chunk_ids,
+        )
+        if job is None:
+            break
+        if job.seed is not None:
+            ids = _decode_seeded(job, scheduler).result()
+        else:
+            ids = scheduler.submit(job).result()
+        generated.extend(ids)
+        prompt_tokens += len(job.input_ids)
+        chunks += 1
+        if len(ids) < job.max_new_tokens:
+            break  # a stop criterion ended the chunk
+        chunk_ids = None
 
-    # Total length (input + generated) must not exceed context_size
-    max_new_tokens = min(max_tokens, context_size - len(input_ids))
-    if max_new_tokens <= 0:
-        logger.warning("Prompt uses entire context window. No tokens left for generation.")
-        return ""
+    if stats is not None:
+        stats.prompt_tokens = prompt_tokens
+        stats.new_tokens = len(generated)
+    result = tokenizer.decode(generated).strip()
+    logger.info(f"Generated {len(generated)} tokens in {chunks} chunk(s) ({_normalize_model_name(model_name)})")
+    return result
+
+
+def generate_candidates(
+    prompt: str,
+    num_candidates: int,
+    max_tokens: int = 800,
+    model_name: Optional[str] = None,
+    temperature: float = 0.8,
+    top_k: int = 40,
+    top_p: float = 0.95,
+    repetition_penalty: float = 1.2,
+    no_repeat_ngram_size: int = 3,
+    prompt_prefix: Optional[str] = None,
+    seed: Optional[int] = None,
+    stats: Optional[GenerationStats] = None,
+    stop_criteria: Optional[List[StopCriterion]] = None,
+    characters: Optional[List[str]] = None,
+) -> List[Tuple[str, float]]:
+    """
+    Sample several continuations of one prompt together and score each one.
 
-    input_tensor = torch.tensor([input_ids]).to(device)
+    Takes the same arguments as generate_text() plus `num_candidates`
+    (`stats.new_tokens` then counts every candidate's tokens). The
+    prompt is prefilled once and its KV shared by every candidate, the
+    candidates are decoded side by side in the genre's batch, and their
+    log-likelihoods come from one extra batched forward pass, so wall-clock
+    cost stays close to a single generation. With a `seed`, candidate i is
+    decoded on its own with seed + i (see generate_text), trading the shared
+    batch for reproducibility.
 
-    pad_id = tokenizer.pad_id()
-    if pad_id is None or pad_id < 0:
-        pad_id = 0
+    Returns:
+        (text, mean token log-likelihood under the model) per candidate, in
+        sampling order; empty if the prompt leaves no room to generate.
 
-    logger.info(
-        f"Generating text ({model_name_n}): "
-        f"prompt_tokens={len(input_ids)}, max_new_tokens={max_new_tokens}, "
-        f"temp={temperature}, top_p={top_p}"
+    Raises:
+        PlotCraftUnavailable: If model/tokenizer are not present or load fails.
+        ValueError: If prompt is empty.
+    """
+    job, tokenizer, scheduler = _prepare_job(
+        prompt,
+        max_tokens=max_tokens,
+        model_name=model_name,
+        temperature=temperature,
+        top_k=top_k,
+        top_p=top_p,
+        repetition_penalty=repetition_penalty,
+        no_repeat_ngram_size=no_repeat_ngram_size,
+        prompt_prefix=prompt_prefix,
+        seed=seed,
+        stop_criteria=stop_criteria,
+        characters=characters,
     )
-    
-    with torch.no_grad():
-        output = model.generate(
-            input_tensor,
-            max_new_tokens=max_new_tokens,
-            do_sample=True,
+    if job is None:
+        return []
+
+    input_ids = job.input_ids
+    shared_kv = None
+    if seed is not None:
+        futures = [
+            _decode_seeded(replace(job, future=Future(), seed=seed + i), scheduler)
+            for i in range(max(1, num_candidates))
+        ]
+    else:
+        if not isinstance(scheduler, (OnnxModel, CompiledRunner)) and len(input_ids) > 1:
+            # Every candidate then prefills only the last prompt token
+            shared_kv = prompt_kv(scheduler.model, input_ids[:-1], scheduler.device, prefix_kv=job.prefix_kv)
+        futures = [
+            scheduler.submit(replace(job, future=Future(), prefix_kv=shared_kv or job.prefix_kv))
+            for _ in range(max(1, num_candidates))
+        ]
+    continuations = [f.result() for f in futures]
+    if stats is not None:
+        stats.prompt_tokens = len(input_ids)
+        stats.new_tokens = sum(len(ids) for ids in continuations)
+
+    if isinstance(scheduler, OnnxModel):
+        logprobs = scheduler.continuation_logprobs(input_ids, continuations)
+    else:
+        logprobs = continuation_logprobs(
+            scheduler.model, input_ids, continuations, scheduler.device, prefix_kv=shared_kv
+        )
+    logger.info(f"Generated {len(continuations)} candidates ({_normalize_model_name(model_name)})")
+    return [(tokenizer.decode(ids).strip(), lp) for ids, lp in zip(continuations, logprobs)]
+
+
+def generate_batch(
+    prompts: List[str],
+    max_tokens: int = 800,
+    model_name: Optional[str] = None,
+    temperature: float = 0.8,
+    top_k: int = 40,
+    top_p: float = 0.95,
+    repetition_penalty: float = 1.2,
+    no_repeat_ngram_size: int = 3,
+    prompt_prefix: Optional[str] = None,
+    seed: Optional[int] = None,
+    stats: Optional[GenerationStats] = None,
+    stop_criteria: Optional[List[StopCriterion]] = None,
+    characters: Optional[List[str]] = None,
+) -> List[str]:
+    """
+    Generate one continuation per prompt, all decoded together.
+
+    Takes the same arguments as generate_text() (`stats` sums over prompts).
+    Every prompt is submitted to the genre's batch at once, so total latency
+    tracks the longest continuation rather than the sum of them. With a
+    `seed`, prompt i is decoded on its own with seed + i.
+
+    Returns:
+        Continuation text per prompt, in order ("" for a prompt that leaves
+        no room in the context window).
+
+    Raises:
+        PlotCraftUnavailable: If model/tokenizer are not present or load fails.
+        ValueError: If a prompt is empty.
+    """
+    prepared = [
+        _prepare_job(
+            prompt,
+            max_tokens=max_tokens,
+            model_name=model_name,
+            temperature=temperature,
             top_k=top_k,
             top_p=top_p,
-            temperature=temperature,
             repetition_penalty=repetition_penalty,
             no_repeat_ngram_size=no_repeat_ngram_size,
-            pad_token_id=pad_id,
+            prompt_prefix=prompt_prefix,
+            seed=None if seed is None else seed + i,
+            stop_criteria=stop_criteria,
+            characters=characters,
         )
+        for i, prompt in enumerate(prompts)
+    ]
+    futures = []
+    for job, _, scheduler in prepared:
+        if job is None:
+            futures.append(None)
+        elif job.seed is not None:
+            futures.append(_decode_seeded(job, scheduler))
+        else:
+            futures.append(scheduler.submit(job))
+    continuations = [f.result() if f is not None else [] for f in futures]
+    if stats is not None:
+        stats.prompt_tokens = sum(len(job.input_ids) for job, _, _ in prepared if job is not None)
+        stats.new_tokens = sum(len(ids) for ids in continuations)
+    logger.info(f"Generated {len(prompts)} continuations in one batch ({_normalize_model_name(model_name)})")
+    return [tokenizer.decode(ids).strip() for (_, tokenizer, _), ids in zip(prepared, continuations)]
 
-    out_ids = output[0].tolist()
-    continuation_ids = out_ids[len(input_ids) :]
-    result = tokenizer.decode(continuation_ids).strip()
-    
-    logger.info(f"Generated {len(result)} characters")
-    return result
 
+def count_tokens(texts: List[str], model_name: Optional[str] = None) -> List[int]:
+    """
+    Number of tokens each text encodes to with a genre's tokenizer (loads the genre).
+
+    Raises:
+        PlotCraftUnavailable: If model/tokenizer are not present or load fails.
+    """
+    _, tokenizer, _ = _ensure_loaded(model_name)
+    return [len(tokenizer.encode(text, out_type=int)) if text else 0 for text in texts]
+
+
+def encode_text(text: str, model_name: Optional[str] = None) -> List[int]:
+    """
+    Token ids of `text` under a genre's tokenizer (loads the genre).
+
+    Raises:
+        PlotCraftUnavailable: If model/tokenizer are not present or load fails.
+    """
+    _, tokenizer, _ = _ensure_loaded(model_name)
+    return tokenizer.encode(text, out_type=int) if text else []
+
+
+def decode_tokens(token_ids: List[int], model_name: Optional[str] = None) -> str:
+    """
+    Text of generated token ids under a genre's tokenizer (loads the genre).
+
+    Raises:
+        PlotCraftUnavailable: If model/tokenizer are not present or load fails.
+    """
+    _, tokenizer, _ = _ensure_loaded(model_name)
+    return tokenizer.decode(list(token_ids))
+
+
+def stream_text(
+    prompt: str,
+    max_tokens: int = 800,
+    model_name: Optional[str] = None,
+    temperature: float = 0.8,
+    top_k: int = 40,
+    top_p: float = 0.95,
+    repetition_penalty: float = 1.2,
+    no_repeat_ngram_size: int = 3,
+    prompt_prefix: Optional[str] = None,
+    stop_criteria: Optional[List[StopCriterion]] = None,
+    characters: Optional[List[str]] = None,
+) -> Iterator[str]:
+    """
+    Stream a story continuation as decoded text deltas.
+
+    Takes the same arguments as generate_text(). Loading and validation happen
+    eagerly, so PlotCraftUnavailable / ValueError are raised by this call rather
+    than on first iteration; the returned iterator then yields text as tokens
+    are sampled. SentencePiece pieces are decoded incrementally so partial
+    pieces never garble the output.
+
+    Raises:
+        PlotCraftUnavailable: If model/tokenizer are not present or load fails.
+        ValueError: If prompt is empty.
+    """
+    job, tokenizer, scheduler = _prepare_job(
+        prompt,
+        max_tokens=max_tokens,
+        model_name=model_name,
+        temperature=temperature,
+        top_k=top_k,
+        top_p=top_p,
+        repetition_penalty=repetition_penalty,
+        no_repeat_ngram_size=no_repeat_ngram_size,
+        prompt_prefix=prompt_prefix,
+        stop_criteria=stop_criteria,
+        characters=characters,
+    )
+    if job is None:
+        return iter(())
+
+    stream = TokenStream(tokenizer)
+    job.on_token = stream.on_token
+    stream.attach(scheduler.submit(job))
+    return iter(stream)
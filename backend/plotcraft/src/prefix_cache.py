@@ -0,0 +1,144 @@
+"""
+Shared-prefix KV cache for static prompt templates.
+
+Story prompts start with fixed boilerplate ("Continue this horror story in a
+compelling and coherent way.", the refinement header, ...). PrefixCache keeps
+the prefilled past_key_values for such prefixes so each request only runs its
+own tokens through the model.
+
+Reuse is token-exact: callers encode the full prompt as usual and only the
+longest run of leading tokens shared with the cached prefix encoding is reused,
+so tokenizer merges across the template boundary never change the input. Entries
+are keyed by model key (genre, checkpoint version, tokenizer fingerprint) plus
+the prefix token ids, and evicted least-recently-used beyond a byte budget.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+try:
+    import torch
+except ImportError:
+    torch = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+KVTensors = List[Tuple["torch.Tensor", "torch.Tensor"]]
+
+# Default memory budget for cached prefixes (all models together)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def kv_nbytes(layers: KVTensors) -> int:
+    """Memory held by per-layer (key, value) tensors."""
+    return sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in layers)
+
+
+def common_prefix_length(a: Sequence[int], b: Sequence[int]) -> int:
+    """Number of leading ids shared by two token sequences."""
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class PrefixCache:
+    """
+    Bounded LRU of prefilled KV tensors for template prefixes.
+
+    Cached tensors are never handed to a model directly; callers copy the
+    slice they need into their own cache before decoding.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[Hashable, Tuple[int, ...]], KVTensors]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(
+        self,
+        model_key: Hashable,
+        prefix_ids: Sequence[int],
+        compute: Callable[[List[int]], KVTensors],
+    ) -> KVTensors:
+        """
+        Return KV tensors for `prefix_ids`, prefilling them with `compute` on a miss.
+
+        Args:
+            model_key: Identifies the model weights and tokenizer
+            prefix_ids: Token ids of the template prefix
+            compute: Runs the model over prefix ids and returns per-layer (key, value)
+
+        Returns:
+            Per-layer (key, value) tensors covering every prefix token.
+        """
+        key = (model_key, tuple(prefix_ids))
+        with self._lock:
+            layers = self._entries.get(key)
+            if layers is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return layers
+            self._misses += 1
+
+        layers = [(k.detach().clone(), v.detach().clone()) for k, v in compute(list(prefix_ids))]
+        size = kv_nbytes(layers)
+        if size > self.max_bytes:
+            logger.debug(f"Prefix of {len(prefix_ids)} tokens exceeds cache budget; not cached")
+            return layers
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = layers
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= kv_nbytes(evicted)
+        return layers
+
+    def lookup(
+        self,
+        model_key: Hashable,
+        input_ids: Sequence[int],
+        prefix_ids: Sequence[int],
+        compute: Callable[[List[int]], KVTensors],
+    ) -> Optional[KVTensors]:
+        """
+        KV tensors for the leading tokens `input_ids` shares with `prefix_ids`.
+
+        At least one input token is always left for the caller to prefill so it
+        gets next-token logits. Returns None when nothing can be reused.
+        """
+        n = min(common_prefix_length(input_ids, prefix_ids), len(input_ids) - 1)
+        if n <= 0:
+            return None
+        layers = self.get(model_key, prefix_ids, compute)
+        return [(k[:, :, :n], v[:, :, :n]) for k, v in layers]
+
+    def clear(self, model_key: Optional[Hashable] = None) -> None:
+        """Drop every entry, or only those belonging to one model."""
+        with self._lock:
+            if model_key is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            for key in [k for k in self._entries if k[0] == model_key]:
+                self._bytes -= kv_nbytes(self._entries.pop(key))
+
+    def stats(self) -> Dict[str, int]:
+        """Entry count, memory use and hit/miss counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
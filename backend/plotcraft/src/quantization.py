@@ -0,0 +1,155 @@
+"""
+Int8 dynamic quantization for PlotCraft GPT-2 models (CPU serving).
+
+GPT-2 implements its attention and MLP projections with transformers' Conv1D,
+which torch's dynamic quantization does not recognise, so those modules are
+first swapped for equivalent nn.Linear layers. Every Linear (including the LM
+head) is then quantized to int8 weights with activations quantized on the fly.
+
+The int8 weights (raw int8 values plus per-tensor scale / zero point) and the
+remaining float weights are saved next to the fp32 checkpoint as
+model.int8.safetensors, tagged with the source checkpoint's size/mtime, so
+later startups map the int8 weights from disk instead of re-quantizing.
+Quantized tensors are stored as plain tensors because pickling them
+(torch.save) looks up torch.qscheme objects across sys.modules, which fails
+once lazily-imported transformers submodules are loaded.
+"""
+
+import logging
+import os
+from typing import Dict, Optional
+
+try:
+    import torch
+    from torch import nn
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicQuantizedLinear
+    from torch.ao.quantization import quantize_dynamic
+    from safetensors import safe_open
+    from safetensors.torch import load_file, save_file
+    from transformers.pytorch_utils import Conv1D
+except ImportError:
+    torch = None  # type: ignore
+    nn = None  # type: ignore
+    DynamicQuantizedLinear = None  # type: ignore
+    quantize_dynamic = None  # type: ignore
+    safe_open = None  # type: ignore
+    load_file = None  # type: ignore
+    save_file = None  # type: ignore
+    Conv1D = None  # type: ignore
+
+from .checkpoint_io import checkpoint_version, load_checkpoint
+from .model import build_model
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("none", "int8")
+ARTIFACT_NAME = "model.int8.safetensors"
+
+
+def quantized_artifact_path(model_path: str) -> str:
+    """Where the int8 artifact for a checkpoint is cached."""
+    return os.path.join(os.path.dirname(model_path), ARTIFACT_NAME)
+
+
+def _conv1d_to_linear(module: "nn.Module") -> None:
+    """Replace transformers Conv1D layers with equivalent nn.Linear in place."""
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            linear = nn.Linear(in_features, out_features)
+            linear.weight.data = child.weight.data.t().contiguous()
+            linear.bias.data = child.bias.data
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+
+
+def quantize_model(model: "nn.Module") -> "nn.Module":
+    """Return an int8 dynamically quantized copy of a (CPU, eval-mode) PlotCraft model."""
+    _conv1d_to_linear(model)
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8).eval()
+
+
+def load_quantized(model_path: str, vocab_size: int, block_size: int = 512) -> "nn.Module":
+    """
+    Load a checkpoint as an int8 model, reusing the cached artifact when valid.
+
+    Args:
+        model_path: fp32 checkpoint (checkpoints/{genre}/best_model/model.pt)
+        vocab_size: Tokenizer vocabulary size
+        block_size: Model context window
+
+    Returns:
+        Quantized GPT2LMHeadModel in eval mode (CPU only).
+    """
+    artifact_path = quantized_artifact_path(model_path)
+    source = checkpoint_version(model_path)
+
+    tensors = _read_artifact(artifact_path, source)
+    if tensors is not None:
+        model = _int8_skeleton(vocab_size, block_size)
+        _load_int8_tensors(model, tensors)
+        logger.info(f"Loaded int8 artifact from {artifact_path}")
+        return model.eval()
+
+    logger.info(f"Quantizing {model_path} to int8 (no valid artifact)")
+    model = quantize_model(load_checkpoint(model_path, vocab_size, block_size))
+    try:
+        save_file(_int8_tensors(model), artifact_path, metadata={"source": source})
+        logger.info(f"Saved int8 artifact to {artifact_path}")
+    except OSError as e:
+        logger.warning(f"Could not cache int8 artifact at {artifact_path}: {e}")
+    return model
+
+
+def _int8_skeleton(vocab_size: int, block_size: int) -> "nn.Module":
+    """int8 module structure without random init (every weight is overwritten from the artifact)."""
+    with torch.device("meta"):
+        model = build_model(vocab_size, block_size)
+    model.to_empty(device="cpu")
+    for tensor in model.state_dict().values():
+        tensor.zero_()
+    return quantize_model(model.eval())
+
+
+def _int8_tensors(model: "nn.Module") -> Dict[str, "torch.Tensor"]:
+    """Flatten a quantized model into plain tensors (see module docstring)."""
+    tensors = {name: p.detach().contiguous() for name, p in model.named_parameters()}
+    for name, module in model.named_modules():
+        if isinstance(module, DynamicQuantizedLinear):
+            weight, bias = module._weight_bias()
+            tensors[f"{name}.int8_weight"] = weight.int_repr().contiguous()
+            tensors[f"{name}.int8_scale"] = torch.tensor(weight.q_scale(), dtype=torch.float64)
+            tensors[f"{name}.int8_zero_point"] = torch.tensor(weight.q_zero_point(), dtype=torch.int64)
+            if bias is not None:
+                tensors[f"{name}.bias"] = bias.detach().contiguous()
+    return tensors
+
+
+def _load_int8_tensors(model: "nn.Module", tensors: Dict[str, "torch.Tensor"]) -> None:
+    for name, module in model.named_modules():
+        if isinstance(module, DynamicQuantizedLinear):
+            weight = torch._make_per_tensor_quantized_tensor(
+                tensors.pop(f"{name}.int8_weight"),
+                tensors.pop(f"{name}.int8_scale").item(),
+                tensors.pop(f"{name}.int8_zero_point").item(),
+            )
+            module.set_weight_bias(weight, tensors.pop(f"{name}.bias", None))
+    # Quantized modules reject partial state_dicts, so set the float weights directly
+    with torch.no_grad():
+        for name, tensor in tensors.items():
+            model.get_parameter(name).copy_(tensor)
+
+
+def _read_artifact(path: str, source: str) -> Optional[Dict[str, "torch.Tensor"]]:
+    """The artifact's tensors if it exists and was built from `source`."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with safe_open(path, framework="pt") as f:
+            if (f.metadata() or {}).get("source") != source:
+                return None
+        return load_file(path)
+    except Exception as e:  # noqa: BLE001
+        logger.warning(f"Ignoring unreadable int8 artifact {path}: {e}")
+        return None
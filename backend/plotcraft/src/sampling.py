@@ -0,0 +1,164 @@
+"""
+Batched sampling for PlotCraft decode batches.
+
+decoding.process_logits handles one sequence at a time, so a continuous batch
+of B rows paid B rounds of small tensor ops (and B topk / sort calls) per
+token. SamplingBatch keeps each row's parameters as (B,) tensors and applies
+repetition penalty, n-gram ban, character logit bias, temperature, top-k and top-p to the whole
+(B, V) logits matrix at once, with a different setting on every row.
+
+Per-row state is incremental: the repetition-penalty "seen" set is a (B, V)
+boolean mask updated with one scatter per step, and n-gram bans come from each
+row's DecodeState table (an O(1) lookup, see decoding.py). Results match
+process_logits row for row, in the same HF processor order.
+"""
+
+from typing import List, Sequence
+
+try:
+    import torch
+except ImportError:
+    torch = None  # type: ignore
+
+from .decoding import DecodeState
+
+
+class SamplingBatch:
+    """
+    Per-row sampling parameters and repetition state for a decode batch.
+
+    Rows follow the scheduler's batch: `add` when a sequence is admitted,
+    `select` when rows are retired, `update` after every sampled step.
+    """
+
+    def __init__(self, vocab_size: int, device):
+        self.vocab_size = vocab_size
+        self.device = device
+        self.temperature = torch.empty(0, device=device)
+        self.top_k = torch.empty(0, dtype=torch.long, device=device)
+        self.top_p_cutoff = torch.empty(0, device=device)  # 1 - top_p, or -1 when top-p is off
+        self.penalty = torch.empty(0, device=device)
+        self.seen = torch.zeros((0, vocab_size), dtype=torch.bool, device=device)
+
+    def __len__(self) -> int:
+        return self.temperature.shape[0]
+
+    @classmethod
+    def from_states(cls, states: Sequence[DecodeState], vocab_size: int, device) -> "SamplingBatch":
+        """Build a batch for already-started states (one row each)."""
+        batch = cls(vocab_size, device)
+        for state in states:
+            batch.add(state)
+        return batch
+
+    def add(self, state: DecodeState) -> None:
+        """Append a row for a started DecodeState."""
+        k = state.top_k if 0 < state.top_k < self.vocab_size else self.vocab_size
+        seen = torch.zeros((1, self.vocab_size), dtype=torch.bool, device=self.device)
+        if state.seen:
+            seen[0, torch.tensor(sorted(state.seen), device=self.device)] = True
+        self.temperature = torch.cat([self.temperature, self._row(state.temperature)])
+        self.top_k = torch.cat([self.top_k, self._row(k, torch.long)])
+        cutoff = 1 - state.top_p if state.top_p < 1.0 else -1.0
+        self.top_p_cutoff = torch.cat([self.top_p_cutoff, self._row(cutoff)])
+        self.penalty = torch.cat([self.penalty, self._row(state.repetition_penalty)])
+        self.seen = torch.cat([self.seen, seen])
+
+    def select(self, rows: List[int]) -> None:
+        """Keep only `rows` (in that order)."""
+        idx = torch.tensor(rows, dtype=torch.long, device=self.device)
+        self.temperature = self.temperature.index_select(0, idx)
+        self.top_k = self.top_k.index_select(0, idx)
+        self.top_p_cutoff = self.top_p_cutoff.index_select(0, idx)
+        self.penalty = self.penalty.index_select(0, idx)
+        self.seen = self.seen.index_select(0, idx)
+
+    def update(self, tokens: "torch.Tensor") -> None:
+        """Mark the tokens just sampled (one per row) as seen."""
+        self.seen[torch.arange(len(self), device=self.device), tokens] = True
+
+    def process(self, scores: "torch.Tensor", states: Sequence[DecodeState]) -> "torch.Tensor":
+        """
+        Apply every row's sampling parameters to (B, V) float32 logits.
+
+        Args:
+            scores: Next-token logits, one row per state; modified in place
+            states: The rows' DecodeStates (for their n-gram tables)
+
+        Returns:
+            Processed logits with filtered tokens set to -inf.
+        """
+        neg_inf = -float("inf")
+        if bool((self.penalty != 1.0).any()):
+            rows, cols = self.seen.nonzero(as_tuple=True)
+            picked, penalty = scores[rows, cols], self.penalty[rows]
+            scores[rows, cols] = torch.where(picked < 0, picked * penalty, picked / penalty)
+
+        rows: List[int] = []
+        cols: List[int] = []
+        for i, state in enumerate(states):
+            banned = state.banned_tokens()
+            rows.extend([i] * len(banned))
+            cols.extend(banned)
+        if cols:
+            scores[torch.tensor(rows, device=scores.device), torch.tensor(cols, device=scores.device)] = neg_inf
+
+        rows, cols = [], []
+        values: List[float] = []
+        for i, state in enumerate(states):
+            for token_id, bias in state.logit_biases().items():
+                rows.append(i)
+                cols.append(token_id)
+                values.append(bias)
+        if cols:
+            idx = (torch.tensor(rows, device=scores.device), torch.tensor(cols, device=scores.device))
+            scores[idx] += torch.tensor(values, dtype=scores.dtype, device=scores.device)
+
+        scores = scores / self.temperature.unsqueeze(1)
+
+        # Rows whose top-p candidates are known from top-k (sorted ascending, with ids)
+        candidates = None
+        limited = (self.top_k < self.vocab_size).nonzero().squeeze(1)
+        if limited.numel():
+            rows = scores.index_select(0, limited)
+            top_vals, top_idx = torch.topk(rows, int(self.top_k[limited].max()), dim=-1)
+            threshold = top_vals.gather(1, (self.top_k[limited] - 1).unsqueeze(1))
+            keep = rows >= threshold
+            scores[limited] = rows.masked_fill(~keep, neg_inf)
+            # Without ties past the largest k, a row's survivors are exactly its leading top_idx entries
+            exact = (keep.sum(dim=1) <= top_vals.shape[1]) & (self.top_p_cutoff[limited] >= 0)
+            if bool(exact.any()):
+                candidates = (
+                    limited[exact],
+                    top_vals[exact].masked_fill(top_vals[exact] < threshold[exact], neg_inf).flip(1),
+                    top_idx[exact].flip(1),
+                )
+
+        nucleus = self.top_p_cutoff >= 0
+        if candidates is not None:
+            # Only top-k survivors carry probability mass, so filter the (rows, k) candidates
+            self._top_p(scores, *candidates)
+            nucleus[candidates[0]] = False
+        full = nucleus.nonzero().squeeze(1)
+        if full.numel():
+            self._top_p(scores, full, *torch.sort(scores.index_select(0, full), dim=-1, descending=False))
+        return scores
+
+    def sample(self, scores: "torch.Tensor", states: Sequence[DecodeState]) -> "torch.Tensor":
+        """Process (B, V) logits and draw one token per row; returns (B,) ids and marks them seen."""
+        probs = self.process(scores, states).softmax(dim=-1)
+        tokens = torch.multinomial(probs, num_samples=1).squeeze(1)
+        self.update(tokens)
+        return tokens
+
+    def _top_p(
+        self, scores: "torch.Tensor", rows: "torch.Tensor", sorted_logits: "torch.Tensor", sorted_idx: "torch.Tensor"
+    ) -> None:
+        """Nucleus-filter `rows` of `scores` in place, given their logits sorted ascending."""
+        cumulative = sorted_logits.softmax(dim=-1).cumsum(dim=-1)
+        remove = cumulative <= self.top_p_cutoff[rows].unsqueeze(1)
+        remove[:, -1] = False
+        scores[rows] = scores.index_select(0, rows).scatter(1, sorted_idx, sorted_logits.masked_fill(remove, -float("inf")))
+
+    def _row(self, value, dtype=None) -> "torch.Tensor":
+        return torch.tensor([value], dtype=dtype or torch.float32, device=self.device)
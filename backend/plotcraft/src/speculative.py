@@ -0,0 +1,244 @@
+"""
+Prompt-lookup speculative decoding for PlotCraft models.
+
+Story continuations often repeat names, places and phrases from the prompt or
+from earlier output. Each step drafts the tokens that followed the most recent
+earlier occurrence of the current suffix n-gram, then verifies the previous
+token plus the whole draft in one forward pass and rolls the KV cache back to
+the accepted prefix (KVCache.crop).
+
+Verification is speculative sampling with a deterministic draft: a draft token
+is accepted with the probability the model assigns to it (after the usual
+repetition penalty / n-gram ban / temperature / top-k / top-p processing), and
+on rejection the token is resampled from the same distribution with the draft
+removed. Every emitted token is therefore distributed exactly as in decode();
+only the RNG consumption differs, so a fixed seed gives a different sample.
+
+With no_repeat_ngram_size=N a verbatim copy can never extend past N-1 tokens
+(the N-th would complete a seen n-gram and is banned), so drafts are cut to
+what the ban allows instead of spending verification on certain rejections.
+"""
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+try:
+    import torch
+except ImportError:
+    torch = None  # type: ignore
+
+from .decoding import DecodeState, prefill, process_logits
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DRAFT_TOKENS = 8
+DEFAULT_MAX_NGRAM = 3
+DEFAULT_WORKERS = 4
+
+
+@dataclass
+class SpeculativeStats:
+    """Counters for one or more speculative decodes."""
+
+    steps: int = 0  # verification forward passes (after prefill)
+    drafted: int = 0
+    accepted: int = 0
+    tokens: int = 0
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted / self.drafted if self.drafted else 0.0
+
+    @property
+    def tokens_per_step(self) -> float:
+        """Generated tokens per forward pass, counting the prefill as one."""
+        return self.tokens / (self.steps + 1) if self.tokens else 0.0
+
+
+def propose_draft(
+    tokens: List[int],
+    num_draft: int = DEFAULT_DRAFT_TOKENS,
+    max_ngram: int = DEFAULT_MAX_NGRAM,
+    no_repeat_ngram_size: int = 0,
+) -> List[int]:
+    """
+    Draft the continuation of the longest recent suffix n-gram seen earlier.
+
+    Args:
+        tokens: Prompt + generated ids so far
+        num_draft: Maximum draft length
+        max_ngram: Longest suffix n-gram to match
+        no_repeat_ngram_size: The decode's n-gram ban; limits match + draft length
+
+    Returns:
+        Draft token ids (possibly empty).
+    """
+    if no_repeat_ngram_size > 0:
+        max_ngram = min(max_ngram, no_repeat_ngram_size - 2)
+    for n in range(min(max_ngram, len(tokens) - 1), 0, -1):
+        limit = num_draft if no_repeat_ngram_size <= 0 else min(num_draft, no_repeat_ngram_size - 1 - n)
+        if limit <= 0:
+            continue
+        suffix = tokens[-n:]
+        # Most recent earlier occurrence, excluding the suffix itself
+        for start in range(len(tokens) - n - 1, -1, -1):
+            if tokens[start : start + n] == suffix:
+                return tokens[start + n : start + n + limit]
+    return []
+
+
+def accept_or_resample(probs: "torch.Tensor", draft_token: int) -> Tuple[int, bool]:
+    """
+    Verify one draft token against the model's next-token distribution.
+
+    The draft proposes `draft_token` with probability 1, so it is accepted
+    with probability p(draft_token); otherwise a token is sampled from p with
+    the draft removed. The returned token is distributed exactly as p.
+
+    Returns:
+        (token id, whether the draft was accepted)
+    """
+    if float(torch.rand(())) < float(probs[draft_token]):
+        return draft_token, True
+    residual = probs.clone()
+    residual[draft_token] = 0
+    return int(torch.multinomial(residual.unsqueeze(0), num_samples=1)), False
+
+
+def _sample(scores: "torch.Tensor") -> int:
+    return int(torch.multinomial(scores.softmax(dim=-1).unsqueeze(0), num_samples=1))
+
+
+def speculative_decode(
+    model,
+    state: DecodeState,
+    device=None,
+    num_draft: int = DEFAULT_DRAFT_TOKENS,
+    max_ngram: int = DEFAULT_MAX_NGRAM,
+    stats: Optional[SpeculativeStats] = None,
+) -> List[int]:
+    """
+    Generate tokens for one sequence with prompt-lookup drafts.
+
+    Same contract as decoding.decode (hooks, stop criteria, prefix_kv).
+
+    Args:
+        model: GPT2LMHeadModel from build_model (in eval mode)
+        state: Prompt, sampling parameters and hooks; reset by this call
+        device: Device for input tensors (defaults to the model's)
+        num_draft: Maximum draft tokens verified per forward pass
+        max_ngram: Longest suffix n-gram used to find a draft
+        stats: Optional counters updated in place
+
+    Returns:
+        Generated token ids (prompt excluded).
+    """
+    if device is None:
+        device = next(model.parameters()).device
+    if stats is None:
+        stats = SpeculativeStats()
+    state.start()
+    if state.max_new_tokens <= 0 or state.should_stop():
+        return []
+    n_positions = model.config.n_positions
+
+    with torch.no_grad():
+        cache, logits = prefill(model, state, device)
+        state.append(_sample(process_logits(logits[0].clone(), state)))
+        while not state.finished:
+            # The last sampled token is not cached yet; it leads the verification input
+            room = min(
+                num_draft,
+                state.max_new_tokens - len(state.generated) - 1,
+                n_positions - len(state.tokens),
+            )
+            draft = propose_draft(state.tokens, room, max_ngram, state.no_repeat_ngram_size) if room > 0 else []
+            base = cache.length
+            out = model(
+                input_ids=torch.tensor([[state.tokens[-1], *draft]], device=device),
+                attention_mask=torch.ones((1, len(state.tokens) + len(draft)), dtype=torch.long, device=device),
+                past_key_values=cache.model_cache,
+                use_cache=True,
+            )
+            rows = out.logits[0].to(dtype=torch.float32)
+
+            accepted = 0
+            for i in range(len(draft) + 1):
+                scores = process_logits(rows[i].clone(), state)
+                if i == len(draft):
+                    # Every draft token was accepted: the last row yields one more for free
+                    state.append(_sample(scores))
+                    break
+                token_id, ok = accept_or_resample(scores.softmax(dim=-1), draft[i])
+                state.append(token_id)
+                accepted += ok
+                if not ok or state.finished:
+                    break
+
+            # Keep the verified input token and the accepted drafts; drop rejected KV
+            cache.crop(base + 1 + accepted)
+            stats.steps += 1
+            stats.drafted += len(draft)
+            stats.accepted += accepted
+
+    stats.tokens += len(state.generated)
+    return list(state.generated)
+
+
+class SpeculativeRunner:
+    """
+    Serves one PlotCraft model with speculative_decode on a small thread pool.
+
+    Drop-in for BatchScheduler (submit / stop / stopped): each request is
+    decoded on its own rather than batched, trading cross-request batching for
+    fewer forward passes per request. Best at low concurrency.
+    """
+
+    def __init__(self, model, device, name: str = "", max_workers: int = DEFAULT_WORKERS):
+        self.model = model
+        self.device = device
+        self.name = name
+        self.stats = SpeculativeStats()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=f"plotcraft-spec-{name}")
+        self._stats_lock = threading.Lock()
+        self._stopped = False
+        self._cancelled = False
+
+    def submit(self, job) -> Future:
+        """Decode a GenerationJob on the pool; resolves job.future with generated ids."""
+        if self._stopped:
+            raise RuntimeError(f"Speculative runner for '{self.name}' has been stopped")
+
+        def _run() -> None:
+            if job.future.done():
+                return
+            if self._cancelled:
+                job.future.set_exception(RuntimeError("Speculative runner stopped"))
+                return
+            stats = SpeculativeStats()
+            try:
+                job.future.set_result(speculative_decode(self.model, job, self.device, stats=stats))
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"Speculative decode failed ({self.name}): {e}")
+                job.future.set_exception(e)
+            with self._stats_lock:
+                self.stats.steps += stats.steps
+                self.stats.drafted += stats.drafted
+                self.stats.accepted += stats.accepted
+                self.stats.tokens += stats.tokens
+
+        self._pool.submit(_run)
+        return job.future
+
+    def stop(self, drain: bool = False) -> None:
+        """Stop accepting jobs; queued decodes fail unless `drain` (running ones finish)."""
+        self._stopped = True
+        self._cancelled = not drain
+        self._pool.shutdown(wait=False)
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped
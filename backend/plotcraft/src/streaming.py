@@ -0,0 +1,85 @@
+"""
+Token streaming helpers for PlotCraft generation.
+
+IncrementalDecoder turns a growing list of SentencePiece ids into text deltas
+without garbling partial pieces, and TokenStream adapts a scheduler job's token
+callback into a blocking iterator of those deltas.
+"""
+
+import queue
+from concurrent.futures import Future
+from typing import Iterator, List, Optional
+
+
+class IncrementalDecoder:
+    """
+    Incrementally decode SentencePiece ids into text.
+
+    SentencePiece drops the leading space of the first piece in a decode call and
+    byte-fallback pieces only form valid UTF-8 once the whole character has been
+    emitted. Each step therefore decodes a window that starts at the previously
+    emitted piece and only returns the new suffix; text ending in a replacement
+    character is held back until the next piece completes it.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.ids: List[int] = []
+        self._prefix_offset = 0
+        self._read_offset = 0
+
+    def push(self, token_id: int) -> str:
+        """Add one id and return any newly completed text (possibly empty)."""
+        self.ids.append(token_id)
+        prefix_text = self.tokenizer.decode(self.ids[self._prefix_offset : self._read_offset])
+        new_text = self.tokenizer.decode(self.ids[self._prefix_offset :])
+        if len(new_text) > len(prefix_text) and not new_text.endswith("\ufffd"):
+            self._prefix_offset = self._read_offset
+            self._read_offset = len(self.ids)
+            return new_text[len(prefix_text) :]
+        return ""
+
+    def flush(self) -> str:
+        """Return whatever text is still held back (end of stream)."""
+        prefix_text = self.tokenizer.decode(self.ids[self._prefix_offset : self._read_offset])
+        new_text = self.tokenizer.decode(self.ids[self._prefix_offset :])
+        self._read_offset = len(self.ids)
+        return new_text[len(prefix_text) :] if len(new_text) > len(prefix_text) else ""
+
+
+class TokenStream:
+    """
+    Blocking iterator over text deltas for one scheduler job.
+
+    Pass `on_token` as the job's token callback; iteration yields decoded text as
+    tokens arrive and re-raises the job's exception if decoding fails.
+    """
+
+    _DONE = object()
+
+    def __init__(self, tokenizer):
+        self._decoder = IncrementalDecoder(tokenizer)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._future: Optional[Future] = None
+
+    def on_token(self, token_id: int) -> None:
+        self._queue.put(token_id)
+
+    def attach(self, future: Future) -> None:
+        """Bind the job future; the stream ends when it resolves."""
+        self._future = future
+        future.add_done_callback(lambda _: self._queue.put(self._DONE))
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            item = self._queue.get()
+            if item is self._DONE:
+                break
+            delta = self._decoder.push(item)
+            if delta:
+                yield delta
+        tail = self._decoder.flush()
+        if tail:
+            yield tail
+        if self._future is not None and self._future.exception() is not None:
+            raise self._future.exception()
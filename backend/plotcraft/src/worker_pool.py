@@ -0,0 +1,737 @@
+"""
+Multi-process PlotCraft serving with model weights in shared memory.
+
+One Python process cannot keep a many-core inference host busy: the GIL
+serialises the Python side of every decode step, and at batch size 1 torch's
+per-op overhead dominates. Running more API processes instead loads every
+genre model once per process. The worker pool splits the two:
+
+- A supervisor process loads each genre checkpoint once and moves its weights
+  into shared memory (plotcraft_generator.share_model()).
+- N worker processes are spawned with those models. torch.multiprocessing
+  passes shared tensors by handle, so every worker maps the same pages and no
+  weights are copied. Workers take jobs from one local queue and run them
+  through plotcraft_generator as usual (their own batching schedulers and
+  torch intra-op threads).
+- API processes talk to the supervisor over a local socket
+  (multiprocessing.connection: a Unix socket path or host:port, authenticated
+  with an auth key) through WorkerPoolClient, whose methods mirror
+  plotcraft_generator's. Tokenizer calls and model versions are answered by
+  the supervisor directly, without a worker.
+
+Stop criteria are arbitrary callables, so they stay in the API process. For
+single-sequence calls the worker streams generated token ids back, the client
+evaluates its criteria on them (and on a timer, for deadlines), and a firing
+criterion cancels the job through a shared flag that the worker's decode checks
+after every token. A decode therefore stops a few tokens after the criterion
+fires rather than at exactly that token.
+
+A worker that dies is restarted; the jobs it was running fail with
+PlotCraftUnavailable, so callers fall back as for any PlotCraft failure.
+
+multiprocessing.connection unpickles every message it receives, so anyone
+holding the auth key can run code in the supervisor. There is no default key:
+the supervisor, its CLI and the client refuse to start without one.
+
+Usage (from backend/):
+    PLOTCRAFT_WORKER_POOL_AUTHKEY=<secret> python -m plotcraft.src.worker_pool --address /tmp/plotcraft-pool.sock --workers 16
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import queue
+import signal
+import threading
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    import torch
+    import torch.multiprocessing as torch_mp
+except ImportError:
+    torch = None  # type: ignore
+    torch_mp = None  # type: ignore
+
+from . import plotcraft_generator
+from .plotcraft_generator import GenerationStats, PlotCraftUnavailable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = "/tmp/plotcraft-pool.sock"
+# Seconds between stop-criterion checks while a job runs, and between worker liveness checks
+POLL_INTERVAL = 0.01
+# Seconds a client waits for the supervisor to answer a call it handles itself
+SUPERVISOR_TIMEOUT = 5.0
+MONITOR_INTERVAL = 1.0
+
+# Calls run on a worker; single-sequence ones stream their token ids back
+WORKER_METHODS = ("generate_text", "generate_long_text", "generate_candidates", "generate_batch", "stream_text", "warmup")
+TOKEN_STREAMING_METHODS = ("generate_text", "generate_long_text")
+# Calls the supervisor answers itself
+SUPERVISOR_METHODS = ("count_tokens", "encode_text", "decode_tokens", "model_version", "preload", "stats")
+
+Address = Union[str, Tuple[str, int]]
+
+
+def parse_address(address: str) -> Address:
+    """"host:port" for localhost TCP, anything else is a Unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and host and port.isdigit() and "/" not in address:
+        return host, int(port)
+    return address
+
+
+def _require_authkey(authkey: Union[str, bytes, None]) -> bytes:
+    """
+    The auth key as bytes.
+
+    Raises:
+        ValueError: If no auth key is set
+    """
+    if not authkey:
+        raise ValueError(
+            "The PlotCraft worker pool needs a secret auth key (PLOTCRAFT_WORKER_POOL_AUTHKEY); "
+            "its connections unpickle whatever authenticated peers send"
+        )
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+# ---------------------------------------------------------------------------
+# Worker processes
+# ---------------------------------------------------------------------------
+
+
+class _JobControl:
+    """
+    Stop criterion a worker adds to every job: forwards new token ids to the
+    supervisor (when the client watches them) and ends the decode once the
+    job's cancel flag is set.
+    """
+
+    def __init__(self, job_id: int, slot: int, cancel_flags, events, forward_tokens: bool):
+        self.job_id = job_id
+        self.slot = slot
+        self.cancel_flags = cancel_flags
+        self.events = events
+        self.forward_tokens = forward_tokens
+        self._sent = 0
+
+    def __call__(self, generated: Optional[List[int]] = None) -> bool:
+        if self.forward_tokens and generated is not None:
+            if len(generated) < self._sent:
+                self._sent = 0  # a new chunk of generate_long_text()
+            if len(generated) > self._sent:
+                self.events.put(("tokens", self.job_id, self._sent, list(generated[self._sent :])))
+                self._sent = len(generated)
+        return bool(self.cancel_flags[self.slot])
+
+
+def _run_job(method: str, kwargs: Dict[str, Any], control: _JobControl) -> Tuple[Any, Tuple[int, int]]:
+    """Run one call on this worker's models; returns (value, (prompt_tokens, new_tokens))."""
+    if method == "warmup":
+        plotcraft_generator.warmup(kwargs.get("model_name"))
+        return None, (0, 0)
+    if method == "stream_text":
+        chunks = plotcraft_generator.stream_text(stop_criteria=[control], **kwargs)
+        control.events.put(("ready", control.job_id))
+        for chunk in chunks:
+            control.events.put(("chunk", control.job_id, chunk))
+        return None, (0, 0)
+    stats = GenerationStats()
+    value = getattr(plotcraft_generator, method)(stats=stats, stop_criteria=[control], **kwargs)
+    return value, (stats.prompt_tokens, stats.new_tokens)
+
+
+def _worker_main(
+    index: int,
+    models: Dict[str, Tuple[Any, bytes, Tuple[str, str, str]]],
+    jobs,
+    events,
+    cancel_flags,
+    threads: int,
+    concurrency: int,
+    options: Dict[str, Any],
+) -> None:
+    """Entry point of a worker process: attach the shared models, then serve jobs until a None sentinel."""
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s worker-{index} %(name)s %(levelname)s %(message)s")
+    torch.set_num_threads(max(1, threads))
+    plotcraft_generator.configure(**options)
+    for genre, (model, tokenizer_proto, model_key) in models.items():
+        plotcraft_generator.attach_shared_model(genre, model, tokenizer_proto, model_key)
+
+    def serve() -> None:
+        while True:
+            item = jobs.get()
+            if item is None:
+                return
+            job_id, slot, method, kwargs, forward_tokens = item
+            events.put(("started", job_id, index))
+            control = _JobControl(job_id, slot, cancel_flags, events, forward_tokens)
+            try:
+                value, counts = _run_job(method, kwargs, control)
+                events.put(("result", job_id, value, counts))
+            except Exception as e:  # noqa: BLE001
+                events.put(("error", job_id, type(e).__name__, str(e)))
+
+    # Several jobs per worker let its batching scheduler merge them into one decode batch
+    servers = [threading.Thread(target=serve, name=f"worker-{index}-{i}") for i in range(max(1, concurrency))]
+    for server in servers:
+        server.start()
+    for server in servers:
+        server.join()
+
+
+# ---------------------------------------------------------------------------
+# Supervisor
+# ---------------------------------------------------------------------------
+
+
+class _PendingJob:
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.worker: Optional[int] = None
+        self.events: "queue.Queue" = queue.Queue()
+
+
+class WorkerPool:
+    """
+    Supervisor of worker processes that share each genre model's weights.
+
+    Args:
+        genres: Genres to load and serve; genres that fail to load are skipped
+        workers: Number of worker processes
+        threads_per_worker: torch intra-op threads per worker
+        jobs_per_worker: Jobs a worker runs concurrently (batched together)
+        max_jobs: Jobs accepted at once across the pool (queued + running);
+            further requests wait for a slot
+        options: plotcraft_generator.configure() options for every process
+    """
+
+    def __init__(
+        self,
+        genres: List[str],
+        workers: int,
+        threads_per_worker: int = 1,
+        jobs_per_worker: int = 1,
+        max_jobs: Optional[int] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ):
+        if torch_mp is None:
+            raise PlotCraftUnavailable("torch not installed")
+        self.genres = genres
+        self.workers = max(1, workers)
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.jobs_per_worker = max(1, jobs_per_worker)
+        self.max_jobs = max(1, max_jobs or self.workers * self.jobs_per_worker * 4)
+        self.options = dict(options or {})
+
+        self._ctx = torch_mp.get_context("spawn")
+        self._jobs = self._ctx.Queue()
+        self._events = self._ctx.Queue()
+        self._cancel_flags = self._ctx.Array("b", self.max_jobs, lock=False)
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        for slot in range(self.max_jobs):
+            self._free_slots.put(slot)
+
+        self._models: Dict[str, Tuple[Any, bytes, Tuple[str, str, str]]] = {}
+        self._versions: Dict[str, str] = {}
+        self._processes: List[Any] = []
+        self._pending: Dict[int, _PendingJob] = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._listener: Optional[Listener] = None
+        self._completed = 0
+        self._failed = 0
+        self._restarts = 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> "WorkerPool":
+        """
+        Load every genre into shared memory and spawn the workers.
+
+        Raises:
+            PlotCraftUnavailable: If no genre could be loaded
+        """
+        plotcraft_generator.configure(**self.options)
+        for genre in self.genres:
+            try:
+                model, tokenizer_proto, model_key, version = plotcraft_generator.share_model(genre)
+            except PlotCraftUnavailable as e:
+                logger.warning(f"Worker pool: genre '{genre}' not served: {e}")
+                continue
+            self._models[genre] = (model, tokenizer_proto, model_key)
+            self._versions[genre] = version
+            logger.info(f"Worker pool: {genre} loaded into shared memory ({version})")
+        if not self._models:
+            raise PlotCraftUnavailable(f"No PlotCraft genre could be loaded for the worker pool ({self.genres})")
+
+        self._processes = [self._spawn(i) for i in range(self.workers)]
+        threading.Thread(target=self._dispatch_events, name="worker-pool-events", daemon=True).start()
+        threading.Thread(target=self._monitor_workers, name="worker-pool-monitor", daemon=True).start()
+        logger.info(
+            f"Worker pool started: {self.workers} workers x {self.threads_per_worker} threads, "
+            f"genres={list(self._models)}"
+        )
+        return self
+
+    def _spawn(self, index: int):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                index,
+                self._models,
+                self._jobs,
+                self._events,
+                self._cancel_flags,
+                self.threads_per_worker,
+                self.jobs_per_worker,
+                self.options,
+            ),
+            name=f"plotcraft-worker-{index}",
+            # Not daemonic: compiled decoding may start its own compile workers
+            daemon=False,
+        )
+        process.start()
+        return process
+
+    def close(self) -> None:
+        """Stop accepting connections and shut the workers down (running jobs finish first)."""
+        self._closed.set()
+        if self._listener is not None:
+            self._listener.close()
+        for _ in range(self.workers * self.jobs_per_worker):
+            self._jobs.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._events.put(None)
+        logger.info("Worker pool stopped")
+
+    def _monitor_workers(self) -> None:
+        """Restart dead workers and fail the jobs they were running."""
+        while not self._closed.wait(MONITOR_INTERVAL):
+            for index, process in enumerate(self._processes):
+                if process.is_alive() or self._closed.is_set():
+                    continue
+                logger.error(f"Worker {index} exited with code {process.exitcode}; restarting it")
+                with self._lock:
+                    self._restarts += 1
+                    lost = [job_id for job_id, job in self._pending.items() if job.worker == index]
+                for job_id in lost:
+                    self._finish(("error", job_id, "PlotCraftUnavailable", f"PlotCraft worker {index} exited"))
+                self._processes[index] = self._spawn(index)
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def _dispatch_events(self) -> None:
+        """Route worker events to the connection waiting on each job."""
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            kind, job_id = event[0], event[1]
+            if kind == "started":
+                with self._lock:
+                    job = self._pending.get(job_id)
+                    if job is not None:
+                        job.worker = event[2]
+            elif kind in ("result", "error"):
+                self._finish(event)
+            else:
+                with self._lock:
+                    job = self._pending.get(job_id)
+                if job is not None:
+                    job.events.put(event)
+
+    def _finish(self, event: tuple) -> None:
+        with self._lock:
+            job = self._pending.pop(event[1], None)
+            if job is None:
+                return  # already failed by the monitor
+            if event[0] == "result":
+                self._completed += 1
+            else:
+                self._failed += 1
+        self._free_slots.put(job.slot)
+        job.events.put(event)
+
+    def _submit(self, method: str, kwargs: Dict[str, Any], forward_tokens: bool) -> Tuple[int, _PendingJob]:
+        model_name = kwargs.get("model_name")
+        genre = plotcraft_generator._normalize_model_name(model_name)
+        if genre not in self._models:
+            raise PlotCraftUnavailable(f"Genre '{genre}' is not served by this worker pool")
+        slot = self._free_slots.get()
+        self._cancel_flags[slot] = 0
+        job_id = next(self._job_ids)
+        job = _PendingJob(slot)
+        with self._lock:
+            self._pending[job_id] = job
+        self._jobs.put((job_id, slot, method, kwargs, forward_tokens))
+        return job_id, job
+
+    def stats(self) -> Dict[str, Any]:
+        """Worker liveness, load and job counters."""
+        with self._lock:
+            in_flight = len(self._pending)
+            completed, failed, restarts = self._completed, self._failed, self._restarts
+        return {
+            "workers": self.workers,
+            "workers_alive": sum(process.is_alive() for process in self._processes),
+            "threads_per_worker": self.threads_per_worker,
+            "genres": self._versions,
+            "max_jobs": self.max_jobs,
+            "in_flight": in_flight,
+            "completed": completed,
+            "failed": failed,
+            "restarts": restarts,
+        }
+
+    # ------------------------------------------------------------------
+    # Serving API processes
+    # ------------------------------------------------------------------
+
+    def serve(self, address: Address, authkey: bytes) -> None:
+        """
+        Accept API process connections until close(); one thread per connection.
+
+        Raises:
+            ValueError: If `authkey` is empty
+        """
+        authkey = _require_authkey(authkey)
+        if isinstance(address, tuple) and address[0] not in ("localhost", "127.0.0.1", "::1"):
+            logger.warning(f"Worker pool listening on non-loopback address {address[0]}; keep the auth key secret")
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)  # stale socket from a previous run
+        self._listener = Listener(address, authkey=authkey)
+        logger.info(f"Worker pool listening on {address}")
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._closed.is_set():
+                    return
+                logger.warning("Worker pool: rejected a connection", exc_info=True)
+                continue
+            threading.Thread(target=self._handle, args=(conn,), name="worker-pool-conn", daemon=True).start()
+
+    def _handle(self, conn: Connection) -> None:
+        """Serve one API process connection: a sequence of (method, kwargs) requests."""
+        try:
+            while True:
+                method, kwargs = conn.recv()
+                try:
+                    if method in SUPERVISOR_METHODS:
+                        conn.send(("result", self._answer(method, kwargs), (0, 0)))
+                    elif method in WORKER_METHODS:
+                        self._relay(conn, method, kwargs)
+                    else:
+                        raise ValueError(f"Unknown worker pool method '{method}'")
+                except (EOFError, OSError):
+                    raise
+                except Exception as e:  # noqa: BLE001
+                    conn.send(("error", type(e).__name__, str(e)))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def _answer(self, method: str, kwargs: Dict[str, Any]) -> Any:
+        if method == "stats":
+            return self.stats()
+        genre = plotcraft_generator._normalize_model_name(kwargs.get("model_name"))
+        if method == "model_version":
+            return self._versions.get(genre)
+        if genre not in self._models:
+            raise PlotCraftUnavailable(f"Genre '{genre}' is not served by this worker pool")
+        if method == "preload":
+            return None
+        # The supervisor holds the same tokenizers as the workers
+        return getattr(plotcraft_generator, method)(**kwargs)
+
+    def _relay(self, conn: Connection, method: str, kwargs: Dict[str, Any]) -> None:
+        """Run a job on a worker, relaying its events to the client and the client's cancel to the job."""
+        job_id, job = self._submit(method, kwargs, forward_tokens=kwargs.pop("watch_tokens", False))
+        while True:
+            try:
+                if conn.poll(0) and conn.recv() == "cancel":
+                    self._cancel_flags[job.slot] = 1
+            except (EOFError, OSError):
+                # Client gone: stop the decode, then drop its events
+                self._cancel_flags[job.slot] = 1
+                while job.events.get()[0] not in ("result", "error"):
+                    pass
+                raise
+            try:
+                event = job.events.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            conn.send((event[0], *event[2:]))
+            if event[0] in ("result", "error"):
+                return
+
+
+# ---------------------------------------------------------------------------
+# Client (API processes)
+# ---------------------------------------------------------------------------
+
+
+class WorkerPoolClient:
+    """
+    plotcraft_generator's generation and tokenizer calls, served by a worker pool.
+
+    Connections are opened on demand and reused; each carries one call at a
+    time, so concurrent callers use separate connections.
+
+    Args:
+        address: Supervisor address (Unix socket path or "host:port")
+        authkey: Shared secret the supervisor was started with
+
+    Raises:
+        ValueError: If `authkey` is empty
+    """
+
+    def __init__(self, address: str, authkey: str):
+        self.address = parse_address(address)
+        self.authkey = _require_authkey(authkey)
+        self._idle: List[Connection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return Client(self.address, authkey=self.authkey)
+        except (OSError, EOFError) as e:
+            raise PlotCraftUnavailable(f"PlotCraft worker pool unreachable at {self.address}: {e}") from e
+
+    def _release(self, conn: Connection) -> None:
+        with self._lock:
+            self._idle.append(conn)
+
+    def close(self) -> None:
+        """Close idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    @staticmethod
+    def _raise(kind: str, message: str) -> None:
+        if kind == "ValueError":
+            raise ValueError(message)
+        if kind == "PlotCraftUnavailable":
+            raise PlotCraftUnavailable(message)
+        raise RuntimeError(f"PlotCraft worker failed: {kind}: {message}")
+
+    def _events(
+        self,
+        method: str,
+        kwargs: Dict[str, Any],
+        stop_criteria: Optional[List[Callable]] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[tuple]:
+        """
+        Send one request and yield its events up to and including the result.
+
+        While the job runs, `stop_criteria` are checked with the token ids
+        streamed back so far (every POLL_INTERVAL at least); the first one
+        that fires cancels the job. Without stop criteria, each event is
+        awaited for at most `timeout` seconds (None waits indefinitely).
+
+        Raises:
+            PlotCraftUnavailable: If the connection is lost or `timeout` passes
+        """
+        conn = self._connect()
+        done = False
+        try:
+            conn.send((method, kwargs))
+            generated: List[int] = []
+            cancelled = False
+            while True:
+                if not conn.poll(POLL_INTERVAL if stop_criteria else timeout):
+                    if not stop_criteria:
+                        raise PlotCraftUnavailable(f"PlotCraft worker pool did not answer '{method}' within {timeout}s")
+                    event = None
+                else:
+                    event = conn.recv()
+                    if event[0] == "tokens":
+                        start, ids = event[1], event[2]
+                        generated[start:] = ids
+                    elif event[0] in ("result", "error"):
+                        done = True
+                        yield event
+                        return
+                    else:
+                        yield event
+                if stop_criteria and not cancelled and any(criterion(generated) for criterion in stop_criteria):
+                    conn.send("cancel")
+                    cancelled = True
+        except (OSError, EOFError) as e:
+            raise PlotCraftUnavailable(f"PlotCraft worker pool connection lost: {e}") from e
+        finally:
+            # A connection abandoned mid-call may still receive that call's events
+            if done:
+                self._release(conn)
+            else:
+                conn.close()
+
+    def _call(
+        self,
+        method: str,
+        kwargs: Dict[str, Any],
+        stats: Optional[GenerationStats] = None,
+        stop_criteria: Optional[List[Callable]] = None,
+    ) -> Any:
+        timeout = SUPERVISOR_TIMEOUT if method in SUPERVISOR_METHODS else None
+        for event in self._events(method, kwargs, stop_criteria, timeout):
+            if event[0] == "error":
+                self._raise(event[1], event[2])
+            if event[0] == "result":
+                if stats is not None:
+                    stats.prompt_tokens, stats.new_tokens = event[2]
+                return event[1]
+        raise PlotCraftUnavailable("PlotCraft worker pool closed the call without a result")
+
+    def _generate(self, method: str, stats, stop_criteria, kwargs: Dict[str, Any]) -> Any:
+        if stop_criteria and method in TOKEN_STREAMING_METHODS:
+            kwargs["watch_tokens"] = True
+        return self._call(method, kwargs, stats, stop_criteria)
+
+    def generate_text(self, prompt: str, stats=None, stop_criteria=None, **kwargs) -> str:
+        """plotcraft_generator.generate_text() on a worker."""
+        return self._generate("generate_text", stats, stop_criteria, dict(prompt=prompt, **kwargs))
+
+    def generate_long_text(self, prompt: str, stats=None, stop_criteria=None, **kwargs) -> str:
+        """plotcraft_generator.generate_long_text() on a worker."""
+        return self._generate("generate_long_text", stats, stop_criteria, dict(prompt=prompt, **kwargs))
+
+    def generate_candidates(self, prompt: str, num_candidates: int, stats=None, stop_criteria=None, **kwargs) -> List[Tuple[str, float]]:
+        """plotcraft_generator.generate_candidates() on a worker."""
+        return self._generate(
+            "generate_candidates", stats, stop_criteria, dict(prompt=prompt, num_candidates=num_candidates, **kwargs)
+        )
+
+    def generate_batch(self, prompts: List[str], stats=None, stop_criteria=None, **kwargs) -> List[str]:
+        """plotcraft_generator.generate_batch() on a worker."""
+        return self._generate("generate_batch", stats, stop_criteria, dict(prompts=prompts, **kwargs))
+
+    def stream_text(self, prompt: str, stop_criteria=None, **kwargs) -> Iterator[str]:
+        """
+        plotcraft_generator.stream_text() on a worker.
+
+        Like the local call, loading and validation errors are raised here
+        rather than on first iteration.
+        """
+        events = self._events("stream_text", dict(prompt=prompt, **kwargs), stop_criteria)
+        for event in events:
+            if event[0] == "error":
+                self._raise(event[1], event[2])
+            if event[0] in ("ready", "result"):
+                break
+
+        def chunks() -> Iterator[str]:
+            for event in events:
+                if event[0] == "chunk":
+                    yield event[1]
+                elif event[0] == "error":
+                    self._raise(event[1], event[2])
+
+        return chunks()
+
+    def warmup(self, model_name: Optional[str] = None) -> None:
+        """Run plotcraft_generator.warmup() on one worker."""
+        self._call("warmup", dict(model_name=model_name))
+
+    def preload(self, model_name: Optional[str] = None) -> None:
+        """
+        Check that the pool serves a genre (the supervisor loads every genre at startup).
+
+        Raises:
+            PlotCraftUnavailable: If the genre is not served or the pool is unreachable
+        """
+        self._call("preload", dict(model_name=model_name))
+
+    def count_tokens(self, texts: List[str], model_name: Optional[str] = None) -> List[int]:
+        return self._call("count_tokens", dict(texts=texts, model_name=model_name))
+
+    def encode_text(self, text: str, model_name: Optional[str] = None) -> List[int]:
+        return self._call("encode_text", dict(text=text, model_name=model_name))
+
+    def decode_tokens(self, token_ids: List[int], model_name: Optional[str] = None) -> str:
+        return self._call("decode_tokens", dict(token_ids=list(token_ids), model_name=model_name))
+
+    def model_version(self, model_name: Optional[str] = None) -> Optional[str]:
+        """Version of the weights the pool serves for a genre; None if it does not serve it."""
+        try:
+            return self._call("model_version", dict(model_name=model_name))
+        except PlotCraftUnavailable:
+            return None
+
+    def loaded_version(self, model_name: Optional[str] = None) -> Optional[str]:
+        """Same as model_version(): the pool loads every genre it serves at startup."""
+        return self.model_version(model_name)
+
+    def stats(self) -> Dict[str, Any]:
+        """The supervisor's WorkerPool.stats()."""
+        return self._call("stats", {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve PlotCraft genres from worker processes sharing model weights")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="Unix socket path or host:port to listen on")
+    parser.add_argument(
+        "--authkey",
+        default=os.environ.get("PLOTCRAFT_WORKER_POOL_AUTHKEY", ""),
+        help="Shared secret API processes authenticate with (required; default: $PLOTCRAFT_WORKER_POOL_AUTHKEY)",
+    )
+    parser.add_argument("--genres", nargs="+", default=plotcraft_generator.SUPPORTED_GENRES)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: cores / threads per worker)")
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--jobs-per-worker", type=int, default=1, help="Concurrent jobs per worker, batched together")
+    parser.add_argument("--max-jobs", type=int, default=None, help="Jobs accepted at once (default: 4 per worker slot)")
+    parser.add_argument("--speculative", action="store_true", help="Prompt-lookup speculative decoding per job")
+    parser.add_argument("--compile", action="store_true", help="torch.compile'd decoding per job")
+    parser.add_argument("--character-bias-strength", type=float, default=None)
+    parser.add_argument("--character-bias-decay", type=float, default=None)
+    args = parser.parse_args()
+    if not args.authkey:
+        parser.error("an auth key is required: pass --authkey or set PLOTCRAFT_WORKER_POOL_AUTHKEY")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    workers = args.workers or max(1, (os.cpu_count() or 1) // max(1, args.threads_per_worker))
+    options = {
+        "speculative": args.speculative,
+        "compiled": args.compile,
+        "character_bias_strength": args.character_bias_strength,
+        "character_bias_decay": args.character_bias_decay,
+    }
+    pool = WorkerPool(
+        args.genres,
+        workers,
+        threads_per_worker=args.threads_per_worker,
+        jobs_per_worker=args.jobs_per_worker,
+        max_jobs=args.max_jobs,
+        options={key: value for key, value in options.items() if value is not None},
+    ).start()
+    # Stop like on Ctrl-C when the orchestrator sends SIGTERM, so workers are shut down too
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        pool.serve(parse_address(args.address), args.authkey.encode())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
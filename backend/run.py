@@ -41,7 +41,6 @@ def _run_server() -> None:
         reload_dirs=["app"] if settings.DEBUG else None,
         timeout_keep_alive=settings.KEEP_ALIVE_TIMEOUT,  # Keep-alive timeout (seconds)
         access_log=True,         # Log all requests for debugging
-        limit_concurrency=10,    # Limit concurrent connections
         limit_max_requests=1000, # Restart worker after 1000 requests
         interface="auto",  # Auto-detect uvloop/httptools
     )
@@ -0,0 +1,51 @@
+"""Tests for the generation fallback circuit breakers."""
+
+from app.core import circuit_breaker
+from app.core.circuit_breaker import CircuitBreaker, CircuitBreakers
+from app.services import story_service
+
+
+def test_breaker_opens_after_threshold_and_probes_after_cooldown(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("plotcraft:horror", failure_threshold=2, cooldown_seconds=10)
+
+    breaker.record_failure(RuntimeError("boom"))
+    assert breaker.allow()
+    breaker.record_failure(RuntimeError("boom"))
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    now[0] += 10
+    assert breaker.allow()  # the half-open probe
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_failure(RuntimeError("still broken"))
+    assert breaker.state == "open" and breaker.retry_in() == 10
+
+    now[0] += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.snapshot()["trips"] == 2
+    assert breaker.snapshot()["rejected"] == 2
+
+
+def test_missing_checkpoint_is_not_retried_per_request(monkeypatch):
+    """A failed PlotCraft load opens the genre's breaker; later requests go straight to transformers."""
+    calls = []
+
+    def missing_checkpoint(prompt, **kwargs):
+        calls.append(kwargs["model_name"])
+        raise story_service.PlotCraftUnavailable("Model not found")
+
+    monkeypatch.setattr(story_service, "breakers", CircuitBreakers(failure_threshold=3, cooldown_seconds=60))
+    monkeypatch.setattr(story_service, "plotcraft_generate_text", missing_checkpoint)
+    monkeypatch.setattr(story_service, "generate_story", lambda prompt, **kwargs: "fallback text")
+
+    for _ in range(3):
+        assert story_service._generate_with_plotcraft_fallback("A dark night", "horror") == "fallback text"
+    assert calls == ["horror"]
+    snapshot = story_service.breakers.snapshot()
+    assert snapshot["plotcraft:horror"]["state"] == "open"
+    assert snapshot["plotcraft:horror"]["rejected"] == 2
+    assert snapshot["transformers"]["state"] == "closed"
@@ -0,0 +1,85 @@
+"""Tests for request deadlines and cancellation of generation."""
+
+import pytest
+
+from app.core.deadline import Deadline, GenerationCancelled
+
+
+def test_cancelling_deadline_stops_batched_decode_within_one_step():
+    """A cancelled deadline ends a scheduler job after the current token; queued cancelled jobs never prefill."""
+    torch = pytest.importorskip("torch")
+    from plotcraft.src.batching import BatchScheduler, GenerationJob
+    from plotcraft.src.model import build_model
+
+    torch.manual_seed(0)
+    model = build_model(64, 512).eval()
+    scheduler = BatchScheduler(model, torch.device("cpu"), name="deadline-test")
+
+    deadline = Deadline(60)
+    generated = []
+
+    def on_token(token_id):
+        generated.append(token_id)
+        if len(generated) == 3:
+            deadline.cancel()
+
+    job = GenerationJob(input_ids=[1, 2, 3], max_new_tokens=200, on_token=on_token, stop_criteria=[deadline])
+    assert len(scheduler.submit(job).result()) == 3
+
+    queued = GenerationJob(input_ids=[4, 5, 6], max_new_tokens=200, stop_criteria=[deadline])
+    assert scheduler.submit(queued).result() == []
+    scheduler.stop()
+
+
+def test_pipeline_returns_partial_story_at_deadline(monkeypatch):
+    """Past the deadline the partial story is returned, later passes are skipped and nothing is cached."""
+    from app.core.result_cache import ResultCache
+    from app.services import story_service
+
+    calls = []
+
+    def fake_generate(
+        prompt, genre, max_tokens=300, temperature=0.8, prompt_prefix=None, seed=None, deadline=None,
+        characters=None, monitor=None, context_header=None,
+    ):
+        calls.append(prompt)
+        deadline.expires_at = 0.0  # time runs out mid-decode; the decode loop sees it and stops
+        assert deadline()
+        return "Alice opened"
+
+    cache = ResultCache(max_entries=8)
+    monkeypatch.setattr(story_service, "result_cache", cache)
+    monkeypatch.setattr(story_service, "_generate_with_plotcraft_fallback", fake_generate)
+    monkeypatch.setattr(story_service, "get_characters", lambda text: ["Alice", "Bob"])
+    monkeypatch.setattr(story_service, "get_user_characters", lambda user_id: ["Alice", "Bob"])
+    monkeypatch.setattr(story_service, "save_user_characters", lambda user_id, chars: None)
+
+    result = story_service.generate_story_pipeline(
+        user_id="user_deadline",
+        prompt="Alice and Bob opened the cellar door.",
+        genre="horror",
+        refine=True,
+        seed=7,
+        deadline=Deadline(60),
+    )
+
+    assert len(calls) == 1  # no refinement or character-focus regeneration
+    assert result["generated_text"] == "Alice opened"
+    assert result["deadline_exceeded"] is True and result["refined"] is False
+    assert cache.stats()["stores"] == 0
+
+
+def test_pipeline_raises_when_client_disconnected(monkeypatch):
+    """A cancelled deadline aborts the pipeline instead of scoring text nobody will read."""
+    from app.services import story_service
+
+    deadline = Deadline(60)
+    deadline.cancel()
+    monkeypatch.setattr(story_service, "get_characters", lambda text: [])
+    monkeypatch.setattr(story_service, "get_user_characters", lambda user_id: [])
+    monkeypatch.setattr(story_service, "save_user_characters", lambda user_id, chars: None)
+
+    with pytest.raises(GenerationCancelled):
+        story_service.generate_story_pipeline(
+            user_id="user_gone", prompt="Alice opened the cellar door.", genre="horror", deadline=deadline
+        )
@@ -0,0 +1,48 @@
+"""Tests for the bounded inference executors."""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import executor as executor_module
+from app.core.executor import BoundedExecutor, InferenceQueueFull
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_bounded_executor_rejects_when_full():
+    """Jobs beyond workers + queue are rejected immediately."""
+    pool = BoundedExecutor("test", max_workers=1, max_queue=1, retry_after=3)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(InferenceQueueFull) as exc_info:
+            await pool.run(lambda: None)
+        assert exc_info.value.retry_after == 3
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(scenario())
+    assert pool.stats()["in_flight"] == 0
+    assert pool.stats()["rejected"] == 1
+    pool.shutdown()
+
+
+def test_full_queue_returns_503_with_retry_after(monkeypatch):
+    """A saturated scoring queue surfaces as 503 with Retry-After."""
+    full = BoundedExecutor("scoring", max_workers=1, max_queue=0, retry_after=7)
+    full._in_flight = full.capacity
+    monkeypatch.setattr(executor_module, "scoring_executor", full)
+
+    response = client.post(
+        "/api/v1/score/story",
+        json={"text": "This is a test story with multiple sentences. It has characters and plot."},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    full.shutdown()
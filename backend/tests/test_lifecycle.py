@@ -0,0 +1,48 @@
+"""Tests for startup warmup and the /ready probe."""
+
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.core import lifecycle
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_ready_reports_warming_then_component_states(monkeypatch):
+    """/ready is 503 until warmup finishes, then lists each component with timings."""
+    release = threading.Event()
+
+    def failing():
+        raise RuntimeError("checkpoint missing")
+
+    monkeypatch.setattr(lifecycle, "readiness", lifecycle.Readiness())
+    monkeypatch.setattr("app.main.readiness", lifecycle.readiness)
+    monkeypatch.setattr(
+        lifecycle,
+        "warmup_components",
+        lambda: [("slow", release.wait, lambda: None), ("plotcraft:horror", failing, None)],
+    )
+
+    thread = threading.Thread(target=lifecycle.run_warmup)
+    thread.start()
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming"
+
+    release.set()
+    thread.join()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "degraded"
+    assert body["components"]["slow"]["state"] == "ready"
+    assert body["components"]["slow"]["warmup_ms"] is not None
+    assert body["components"]["plotcraft:horror"] == {
+        "state": "failed",
+        "load_ms": None,
+        "warmup_ms": None,
+        "error": "checkpoint missing",
+    }
+    assert client.get("/health").json()["ready"] is True
@@ -0,0 +1,129 @@
+"""Tests for NER-only spaCy loading and batched character extraction."""
+
+import threading
+import time
+
+import pytest
+
+spacy = pytest.importorskip("spacy")
+
+from app.core.config import settings
+from app.models import ner_model
+from app.models.ner_model import NERModel, _DocBatcher
+
+NAMES = ["Alice", "Bob", "Carol", "Dave"]
+
+
+def _ruler_pipeline():
+    """Blank English pipeline whose PERSON entities come from an entity ruler."""
+    nlp = spacy.blank("en")
+    nlp.add_pipe("entity_ruler").add_patterns([{"label": "PERSON", "pattern": name} for name in NAMES])
+    return nlp
+
+
+def _loaded_model(nlp):
+    """NERModel over `nlp`, in the state _load_model() leaves it in."""
+    model = NERModel()
+    model.nlp, model._is_loaded = nlp, True
+    model._batcher = _DocBatcher(nlp, settings.NER_BATCH_SIZE, settings.NER_BATCH_WAIT_MS / 1000)
+    return model
+
+
+def test_model_loads_without_non_ner_components(tmp_path, monkeypatch):
+    nlp = _ruler_pipeline()
+    nlp.add_pipe("attribute_ruler", first=True)
+    nlp.to_disk(tmp_path / "pipeline")
+    monkeypatch.setattr(settings, "SPACY_MODEL", str(tmp_path / "pipeline"))
+
+    model = NERModel()
+    assert model._load_model()
+    assert model.nlp.pipe_names == ["entity_ruler"]
+    assert model.extract_characters("Alice met Bob at the market.") == ["Alice", "Bob"]
+
+
+def test_concurrent_calls_are_coalesced_into_batches(monkeypatch):
+    monkeypatch.setattr(settings, "NER_BATCH_WAIT_MS", 50.0)
+    model = _loaded_model(_ruler_pipeline())
+    texts = [f"{NAMES[i % 4]} waited for {NAMES[(i + 1) % 4]} by the old gate." for i in range(8)]
+
+    results = [None] * len(texts)
+    start = threading.Barrier(len(texts))
+
+    def extract(i):
+        start.wait()
+        results[i] = model.extract_characters(texts[i])
+
+    threads = [threading.Thread(target=extract, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = model.batch_stats()
+    assert stats["docs"] == len(texts) and stats["batches"] < len(texts)
+    assert results == model.extract_characters_batch(texts)
+    assert results[0] == ["Alice", "Bob"]
+    assert model.extract_characters_batch(["", "Carol ran."]) == [[], ["Carol"]]
+
+
+def test_batch_wait_is_one_deadline_not_per_arrival():
+    class EchoPipeline:
+        def pipe(self, texts, batch_size, n_process=1):
+            return list(texts)
+
+    batcher = _DocBatcher(EchoPipeline(), batch_size=64, max_wait=0.2)
+    start = time.monotonic()
+    first = batcher.submit(["first"])
+    # Arrivals every 50 ms would keep a per-item timeout waiting for 64 of them
+    while not first.done() and time.monotonic() - start < 2:
+        batcher.submit(["more"])
+        time.sleep(0.05)
+    assert first.result(timeout=2) == ["first"]
+    assert time.monotonic() - start < 0.6
+
+
+def test_batch_options_run_as_one_pipe_call_on_the_batcher_thread():
+    nlp = _ruler_pipeline()
+    calls = []
+
+    class RecordingPipeline:
+        def pipe(self, texts, batch_size, n_process=1):
+            texts = list(texts)
+            calls.append((len(texts), batch_size, n_process, threading.current_thread().name))
+            return nlp.pipe(texts, batch_size=batch_size)
+
+    model = _loaded_model(RecordingPipeline())
+    texts = [f"{name} ran home." for name in NAMES]
+
+    assert model.extract_characters_batch(texts, batch_size=3) == [[name] for name in NAMES]
+    model.extract_characters_batch(texts, n_process=2)
+
+    assert calls == [(4, 3, 1, "ner-batcher"), (4, settings.NER_BATCH_SIZE, 2, "ner-batcher")]
+
+
+def test_concurrent_first_calls_load_one_pipeline_and_batcher(monkeypatch):
+    loads = []
+
+    def slow_load(name, exclude=()):
+        loads.append(name)
+        time.sleep(0.1)
+        return _ruler_pipeline()
+
+    monkeypatch.setattr(ner_model.spacy, "load", slow_load)
+    model = NERModel()
+    start = threading.Barrier(4)
+    results = [None] * 4
+
+    def extract(i):
+        start.wait()
+        results[i] = model.extract_characters(f"{NAMES[i]} ran home.")
+
+    threads = [threading.Thread(target=extract, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert results == [[name] for name in NAMES]
+    assert model.batch_stats()["docs"] == 4
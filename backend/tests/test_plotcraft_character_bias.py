@@ -0,0 +1,43 @@
+"""Tests for character-name logit biasing."""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from plotcraft.src.character_bias import COMPLETION_BIAS, CharacterBias
+from plotcraft.src.decoding import DecodeState, decode
+from plotcraft.src.model import build_model
+
+
+def test_bias_decays_and_started_names_are_completed():
+    bias = CharacterBias.for_names(["Ada Lovelace", "Bob", "", "Bob"], {"Ada Lovelace": [5, 6, 7], "Bob": [9]}.get)
+    assert bias.names == ((5, 6, 7), (9,))
+
+    assert bias.biases([], {0, 1}) == {5: 2.0, 9: 2.0}
+    assert bias.biases([1] * 100, {1}) == pytest.approx({9: 2.0 * 0.99**100})
+    # Mid-name, the next piece of a pending name is forced
+    assert bias.biases([1, 5, 6], {0})[7] == COMPLETION_BIAS
+    assert bias.completed([1, 5, 6, 7], {0, 1}) == {0}
+
+
+def test_names_sharing_a_first_piece_are_only_forced_while_pending():
+    # " J" + "ane" and " J" + "ohn"
+    bias = CharacterBias.for_names(["Jane", "John"], {"Jane": [4, 5], "John": [4, 6]}.get, strength=0.0)
+
+    assert bias.biases([1, 4], {0, 1}) == {5: COMPLETION_BIAS, 6: COMPLETION_BIAS}
+    # Jane was written: a later " J" only steers toward John
+    assert bias.biases([4, 5, 1, 4], {1}) == {6: COMPLETION_BIAS}
+    # Both written: " J" is free to start any other word
+    assert bias.biases([4, 5, 4, 6, 1, 4], set()) == {}
+
+
+def test_biased_decode_writes_every_pending_name():
+    torch.manual_seed(0)
+    model = build_model(64, 128).eval()
+    names = CharacterBias(((11, 12, 13), (20, 21)), strength=50.0, decay=1.0)
+    state = DecodeState(input_ids=[1, 2, 3, 4], max_new_tokens=8, top_k=1, character_bias=names)
+
+    generated = decode(model, state)
+
+    assert generated[:5] in ([11, 12, 13, 20, 21], [20, 21, 11, 12, 13])
+    assert state.pending_names == set()
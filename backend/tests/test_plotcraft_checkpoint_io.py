@@ -0,0 +1,54 @@
+"""Tests for meta-device / mmap / safetensors checkpoint loading."""
+
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("safetensors")
+
+from plotcraft.src.checkpoint_io import convert_checkpoint, load_checkpoint, safetensors_path_for
+from plotcraft.src.model import build_model
+
+
+@pytest.fixture(scope="module")
+def checkpoint(tmp_path_factory):
+    torch.manual_seed(0)
+    model = build_model(64, 512).eval()
+    path = tmp_path_factory.mktemp("best_model") / "model.pt"
+    torch.save(model.state_dict(), path)
+    return model, str(path)
+
+
+def _logits(model):
+    with torch.no_grad():
+        return model(input_ids=torch.tensor([[1, 2, 3, 4, 5]])).logits
+
+
+def test_mmap_and_safetensors_loads_match_checkpoint(checkpoint):
+    model, path = checkpoint
+    expected = _logits(model)
+
+    mmapped = load_checkpoint(path, 64, prefer_safetensors=False)
+    assert torch.equal(_logits(mmapped), expected)
+
+    convert_checkpoint(path)
+    loaded = load_checkpoint(path, 64)
+    assert torch.equal(_logits(loaded), expected)
+    assert loaded.lm_head.weight is loaded.transformer.wte.weight
+    assert not any(p.is_meta for p in loaded.parameters())
+
+
+def test_stale_safetensors_is_ignored(checkpoint):
+    model, path = checkpoint
+    convert_checkpoint(path)
+
+    # Retrain: model.pt changes after the conversion
+    torch.manual_seed(1)
+    retrained = build_model(64, 512).eval()
+    torch.save(retrained.state_dict(), path)
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    assert os.path.exists(safetensors_path_for(path))
+    assert torch.equal(_logits(load_checkpoint(path, 64)), _logits(retrained))
@@ -0,0 +1,41 @@
+"""Tests for the shape-bucketed compiled decode path."""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from plotcraft.src.compiled import CompiledDecoder
+from plotcraft.src.decoding import DecodeState, decode
+from plotcraft.src.model import build_model
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    return build_model(64, 512).eval()
+
+
+def _state(prompt_len: int) -> DecodeState:
+    # top_k=1 makes sampling deterministic, so outputs must match decode() exactly
+    return DecodeState(input_ids=[(i * 7) % 60 + 1 for i in range(prompt_len)], max_new_tokens=40, top_k=1)
+
+
+@pytest.mark.parametrize("prompt_len", [10, 40, 100])
+def test_static_bucketed_decode_matches_decode(model, prompt_len):
+    decoder = CompiledDecoder(model, None, buckets=(32, 64, 128), compile=False)
+    assert decoder.decode(_state(prompt_len)) == decode(model, _state(prompt_len))
+
+
+def test_falls_back_to_eager_when_compilation_fails(model, monkeypatch):
+    def broken_compile(module, **kwargs):
+        def forward(**inputs):
+            raise RuntimeError("backend compiler failed")
+
+        return forward
+
+    monkeypatch.setattr(torch, "compile", broken_compile)
+    decoder = CompiledDecoder(model, None, buckets=(64,))
+    assert decoder.compiled
+    assert decoder.decode(_state(10)) == decode(model, _state(10))
+    assert not decoder.compiled
+    assert decoder.bucket_for(65) == 512
@@ -0,0 +1,99 @@
+"""Tests for the PlotCraft first-party decode loop."""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from plotcraft.src.model import build_model
+from plotcraft.src.decoding import DecodeState, KVCache, cache_tensors, continuation_logprobs, decode
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    return build_model(64, 512).eval()
+
+
+def test_decode_matches_hf_generate(model):
+    """decode() samples exactly like model.generate under the same seed."""
+    prompt = [5, 6, 7, 8, 9, 10, 11]
+    torch.manual_seed(123)
+    with torch.no_grad():
+        expected = model.generate(
+            torch.tensor([prompt]),
+            max_new_tokens=30,
+            do_sample=True,
+            top_k=40,
+            top_p=0.95,
+            temperature=0.8,
+            repetition_penalty=1.2,
+            no_repeat_ngram_size=3,
+            pad_token_id=0,
+        )[0, len(prompt):].tolist()
+
+    torch.manual_seed(123)
+    assert decode(model, DecodeState(input_ids=prompt, max_new_tokens=30)) == expected
+
+
+def test_decode_hooks_stream_and_stop(model):
+    """on_token sees every generated id and a stop criterion ends decoding early."""
+    streamed = []
+    state = DecodeState(
+        input_ids=[1, 2, 3],
+        max_new_tokens=20,
+        top_k=1,
+        on_token=streamed.append,
+        stop_criteria=[lambda generated: len(generated) >= 4],
+    )
+    generated = decode(model, state)
+    assert len(generated) == 4
+    assert streamed == generated
+
+
+def test_kv_cache_crop():
+    """Cropping a cache drops trailing positions without reallocating."""
+    layers = [(torch.randn(1, 2, 5, 4), torch.randn(1, 2, 5, 4)) for _ in range(2)]
+    cache = KVCache.from_tensors(layers, capacity=16)
+    assert cache.length == 5
+    cache.crop(3)
+    assert cache.length == 3
+    assert torch.equal(cache.tensors()[0][0], layers[0][0][:, :, :3])
+
+
+def test_continuation_logprobs_match_full_forward(model):
+    """Batched, right-padded scoring over a shared prompt KV matches scoring each sequence alone."""
+    prompt = [5, 6, 7, 8, 9]
+    continuations = [[1, 2, 3], [4], [10, 11, 12, 13, 14], []]
+    expected = []
+    for cont in continuations:
+        if not cont:
+            expected.append(0.0)
+            continue
+        with torch.no_grad():
+            logprobs = model(torch.tensor([prompt + cont])).logits[0].log_softmax(dim=-1)
+        expected.append(float(sum(logprobs[len(prompt) - 1 + i, t] for i, t in enumerate(cont)) / len(cont)))
+    assert continuation_logprobs(model, prompt, continuations) == pytest.approx(expected, abs=1e-5)
+
+
+def test_seeded_decode_ignores_global_rng(model):
+    """A seeded state samples from its own generator, whatever the global RNG state."""
+    kwargs = dict(input_ids=[5, 6, 7, 8], max_new_tokens=15, seed=11)
+    torch.manual_seed(0)
+    first = decode(model, DecodeState(**kwargs))
+    torch.manual_seed(1)
+    assert decode(model, DecodeState(**kwargs)) == first
+    assert decode(model, DecodeState(**{**kwargs, "seed": 12})) != first
+
+
+def test_cache_tensors_reads_every_transformers_cache_layout(model):
+    with torch.no_grad():
+        past = model(torch.tensor([[5, 6, 7]]), use_cache=True).past_key_values
+    layers = cache_tensors(past)
+    assert len(layers) == model.config.n_layer and layers[0][0].shape[2] == 3
+
+    class OlderDynamicCache:
+        key_cache = [k for k, _ in layers]
+        value_cache = [v for _, v in layers]
+
+    for legacy in (OlderDynamicCache(), tuple(layers)):
+        assert all(a[0] is b[0] and a[1] is b[1] for a, b in zip(cache_tensors(legacy), layers))
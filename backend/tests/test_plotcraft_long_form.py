@@ -0,0 +1,49 @@
+"""Tests for long-form PlotCraft generation past the context window."""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from plotcraft.src import plotcraft_generator
+from plotcraft.src.model import build_model
+from plotcraft.src.plotcraft_generator import CONTEXT_SIZE, GenerationStats, generate_long_text
+
+
+class _CharTokenizer:
+    """One token per character (ids 1-63), enough to drive the decode loop."""
+
+    def encode(self, text, out_type=int):
+        return [ord(c) % 63 + 1 for c in text]
+
+    def decode(self, ids):
+        return "".join(chr(i + 64) for i in ids)
+
+
+@pytest.fixture
+def tiny_model(monkeypatch):
+    torch.manual_seed(0)
+    model = build_model(64, CONTEXT_SIZE).eval()
+    monkeypatch.setattr(plotcraft_generator, "_ensure_loaded", lambda model_name=None: (model, _CharTokenizer(), None))
+    yield model
+    plotcraft_generator.stop_schedulers(plotcraft_generator._variant_key("horror"))
+
+
+def test_long_form_delivers_requested_tokens_past_the_window(tiny_model):
+    stats = GenerationStats()
+    prompt = "x" * 480  # leaves less than MIN_CHUNK_TOKENS of room: rolls from the start
+
+    text = generate_long_text(
+        prompt, max_tokens=700, model_name="horror", context_header="Horror. Characters: Ada.\n", stats=stats, top_k=1
+    )
+
+    assert len(text) == stats.new_tokens == 700
+    # Every chunk is prompted with the 25-token header plus the 256-token story tail
+    assert stats.prompt_tokens % (25 + 256) == 0 and stats.prompt_tokens // (25 + 256) >= 3
+
+
+def test_long_form_stops_when_a_stop_criterion_fires(tiny_model):
+    stats = GenerationStats()
+    text = generate_long_text(
+        "A story.", max_tokens=900, model_name="horror", stats=stats, stop_criteria=[lambda ids: len(ids) >= 100]
+    )
+    assert stats.new_tokens == len(text) == 100
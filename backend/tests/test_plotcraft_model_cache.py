@@ -0,0 +1,68 @@
+"""Tests for the memory-budgeted PlotCraft model cache."""
+
+import threading
+import time
+
+from plotcraft.src.model_cache import ModelCache
+
+
+def _sized(size):
+    return lambda: {"size": size}
+
+
+def _cache(**kwargs):
+    return ModelCache(size_of=lambda value: value["size"], **kwargs)
+
+
+def test_lru_eviction_respects_budget_and_pins():
+    evicted = []
+    cache = _cache(max_bytes=250, on_evict=lambda key, value: evicted.append(key))
+    cache.pin("scifi")
+    cache.get_or_load("scifi", _sized(100))
+    cache.get_or_load("horror", _sized(100))
+    cache.get_or_load("horror", _sized(100))  # hit: horror is now most recent
+    cache.get_or_load("fantasy", _sized(100))
+
+    # scifi is least recent but pinned, so horror goes
+    assert evicted == ["horror"]
+    assert sorted(cache.keys()) == ["fantasy", "scifi"]
+
+    stats = cache.stats()
+    assert stats["bytes"] == 200
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+    assert stats["entries"]["scifi"] == {"bytes": 100, "hits": 0}
+
+
+def test_lfu_evicts_least_used():
+    cache = _cache(max_bytes=250, policy="lfu")
+    cache.get_or_load("scifi", _sized(100))
+    cache.get_or_load("horror", _sized(100))
+    for _ in range(3):
+        cache.get_or_load("scifi", _sized(100))
+    cache.get_or_load("fantasy", _sized(100))
+
+    assert sorted(cache.keys()) == ["fantasy", "scifi"]
+
+
+def test_concurrent_loads_are_single_flight():
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"size": 1}
+
+    cache = _cache()
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("mystery", slow_loader)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len(results) == 8 and all(r is results[0] for r in results)
+    assert cache.stats()["misses"] == 1
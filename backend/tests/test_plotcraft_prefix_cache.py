@@ -0,0 +1,60 @@
+"""Tests for the PlotCraft shared-prefix KV cache."""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from plotcraft.src.model import build_model
+from plotcraft.src.decoding import DecodeState, KVCache, decode
+from plotcraft.src.prefix_cache import PrefixCache, kv_nbytes
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    return build_model(64, 512).eval()
+
+
+def _compute(model):
+    def compute(prefix_ids):
+        cache = KVCache.for_model(model)
+        with torch.no_grad():
+            model(input_ids=torch.tensor([prefix_ids]), past_key_values=cache.model_cache, use_cache=True)
+        return cache.tensors()
+    return compute
+
+
+def test_reused_prefix_is_token_exact(model):
+    """Decoding from cached prefix KV matches a full prefill, even if the prefix diverges."""
+    prompt = [5, 6, 7, 8, 9, 10, 11, 12]
+    cache = PrefixCache()
+
+    # Template encodes differently at its last token: only the shared 5 tokens are reused
+    prefix_kv = cache.lookup("m", prompt, [5, 6, 7, 8, 9, 40], _compute(model))
+    assert prefix_kv[0][0].shape[2] == 5
+
+    torch.manual_seed(7)
+    expected = decode(model, DecodeState(input_ids=prompt, max_new_tokens=20))
+    torch.manual_seed(7)
+    assert decode(model, DecodeState(input_ids=prompt, max_new_tokens=20, prefix_kv=prefix_kv)) == expected
+
+    cache.lookup("m", prompt, [5, 6, 7, 8, 9, 40], _compute(model))
+    assert cache.stats()["hits"] == 1
+    assert cache.lookup("m", prompt, [30, 31], _compute(model)) is None
+
+
+def test_cache_is_bounded_lru(model):
+    """Entries beyond the byte budget are evicted least-recently-used first."""
+    compute = _compute(model)
+    entry_bytes = kv_nbytes(compute([1, 2, 3, 4]))
+    cache = PrefixCache(max_bytes=2 * entry_bytes)
+
+    cache.get("m", [1, 2, 3, 4], compute)
+    cache.get("m", [5, 6, 7, 8], compute)
+    cache.get("m", [1, 2, 3, 4], compute)  # refresh
+    cache.get("m", [9, 10, 11, 12], compute)  # evicts [5..8]
+
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] <= 2 * entry_bytes
+    cache.get("m", [1, 2, 3, 4], compute)
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,39 @@
+"""Tests for PlotCraft int8 dynamic quantization."""
+
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from plotcraft.src.model import build_model
+from plotcraft.src.quantization import load_quantized, quantized_artifact_path
+
+
+def test_load_quantized_caches_artifact(tmp_path, monkeypatch):
+    """The first load writes the int8 artifact; the next load reuses it without re-quantizing."""
+    torch.manual_seed(0)
+    fp32 = build_model(64, 512).eval()
+    model_path = str(tmp_path / "model.pt")
+    torch.save(fp32.state_dict(), model_path)
+
+    first = load_quantized(model_path, 64)
+    assert os.path.exists(quantized_artifact_path(model_path))
+
+    inputs = torch.tensor([[1, 2, 3, 4, 5, 6, 7, 8]])
+    with torch.no_grad():
+        expected = fp32(inputs).logits
+        quantized = first(inputs).logits
+    assert torch.allclose(quantized, expected, atol=0.5)
+
+    monkeypatch.setattr(torch, "load", _fail_on_checkpoint(torch.load, model_path))
+    second = load_quantized(model_path, 64)
+    with torch.no_grad():
+        assert torch.equal(second(inputs).logits, quantized)
+
+
+def _fail_on_checkpoint(load, model_path):
+    def _load(path, *args, **kwargs):
+        assert path != model_path, "fp32 checkpoint should not be re-read"
+        return load(path, *args, **kwargs)
+    return _load
@@ -0,0 +1,45 @@
+"""Tests for batched PlotCraft sampling."""
+
+import random
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from plotcraft.src.character_bias import CharacterBias
+from plotcraft.src.decoding import DecodeState, process_logits
+from plotcraft.src.sampling import SamplingBatch
+
+VOCAB = 300
+
+
+def test_batched_processing_matches_per_row():
+    """Every row of a heterogeneous batch is processed exactly as process_logits would."""
+    params = [
+        dict(temperature=0.8, top_k=40, top_p=0.95, repetition_penalty=1.2, no_repeat_ngram_size=3),
+        dict(temperature=1.0, top_k=0, top_p=1.0, repetition_penalty=1.0, no_repeat_ngram_size=0),
+        dict(temperature=1.3, top_k=5, top_p=0.5, repetition_penalty=1.5, no_repeat_ngram_size=2),
+        dict(temperature=0.5, top_k=1000, top_p=0.9, repetition_penalty=1.0, no_repeat_ngram_size=4),
+        dict(temperature=0.9, top_k=0, top_p=0.7, repetition_penalty=1.1, no_repeat_ngram_size=1),
+        dict(temperature=0.8, top_k=40, top_p=0.95, character_bias=CharacterBias(((7, 8), (9,)), strength=3.0)),
+    ]
+    rng = random.Random(0)
+    states = [DecodeState(input_ids=[rng.randrange(VOCAB) for _ in range(30)], max_new_tokens=20, **p) for p in params]
+    for state in states:
+        state.start()
+    batch = SamplingBatch.from_states(states, VOCAB, torch.device("cpu"))
+
+    torch.manual_seed(0)
+    for _ in range(20):
+        logits = torch.randn(len(states), VOCAB) * 3
+        expected = torch.stack([process_logits(logits[i].clone(), s) for i, s in enumerate(states)])
+        assert torch.equal(batch.process(logits.clone(), states), expected)
+
+        tokens = batch.sample(logits.clone(), states)
+        for state, token in zip(states, tokens.tolist()):
+            state.append(token)
+
+    batch.select([4, 0])
+    logits = torch.randn(2, VOCAB)
+    expected = torch.stack([process_logits(logits[0].clone(), states[4]), process_logits(logits[1].clone(), states[0])])
+    assert torch.equal(batch.process(logits.clone(), [states[4], states[0]]), expected)
@@ -0,0 +1,51 @@
+"""Tests for prompt-lookup speculative decoding."""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from plotcraft.src.model import build_model
+from plotcraft.src.decoding import DecodeState, decode
+from plotcraft.src.speculative import SpeculativeStats, accept_or_resample, propose_draft, speculative_decode
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    return build_model(64, 512).eval()
+
+
+def test_propose_draft_respects_ngram_ban():
+    tokens = [1, 2, 3, 4, 5, 9, 1, 2]
+    assert propose_draft(tokens, num_draft=3) == [3, 4, 5]
+    # With a trigram ban only one token past a unigram match can be copied
+    assert propose_draft(tokens, num_draft=3, no_repeat_ngram_size=3) == [3]
+    assert propose_draft([1, 2, 3], num_draft=3) == []
+
+
+@pytest.mark.parametrize("no_repeat_ngram_size, repetition_penalty", [(0, 1.0), (3, 1.2)])
+def test_speculative_matches_decode_when_deterministic(model, no_repeat_ngram_size, repetition_penalty):
+    """With top_k=1 the target distribution is a point mass, so outputs must be identical."""
+    kwargs = dict(
+        input_ids=[5, 6, 7, 8, 5, 6, 7, 8, 5, 6],
+        max_new_tokens=60,
+        top_k=1,
+        no_repeat_ngram_size=no_repeat_ngram_size,
+        repetition_penalty=repetition_penalty,
+    )
+    stats = SpeculativeStats()
+    expected = decode(model, DecodeState(**kwargs))
+    assert speculative_decode(model, DecodeState(**kwargs), stats=stats) == expected
+    assert stats.drafted > 0
+    assert stats.tokens == len(expected)
+    assert stats.steps < len(expected)
+
+
+def test_accept_or_resample_preserves_distribution():
+    probs = torch.tensor([0.5, 0.3, 0.2])
+    torch.manual_seed(0)
+    counts = torch.zeros(3)
+    for _ in range(20000):
+        token, _ = accept_or_resample(probs, draft_token=1)
+        counts[token] += 1
+    assert torch.allclose(counts / counts.sum(), probs, atol=0.015)
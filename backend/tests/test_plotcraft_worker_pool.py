@@ -0,0 +1,106 @@
+"""Tests for the multi-process PlotCraft worker pool."""
+
+import os
+import threading
+import time
+
+import pytest
+
+torch = pytest.importorskip("torch")
+spm = pytest.importorskip("sentencepiece")
+
+from plotcraft.src import plotcraft_generator
+from plotcraft.src.model import build_model
+from plotcraft.src.plotcraft_generator import CONTEXT_SIZE, GenerationStats, PlotCraftUnavailable
+from plotcraft.src.worker_pool import WorkerPool, WorkerPoolClient
+
+TEXT = "Alice and Bob walked into the old house as the storm began. The door creaked behind them.\n"
+
+
+@pytest.fixture(scope="module")
+def pool(tmp_path_factory):
+    base = tmp_path_factory.mktemp("pool")
+    (base / "corpus.txt").write_text(TEXT * 50)
+    spm.SentencePieceTrainer.train(
+        input=str(base / "corpus.txt"), model_prefix=str(base / "spm"), vocab_size=32, minloglevel=2
+    )
+    tokenizer = spm.SentencePieceProcessor(model_file=str(base / "spm.model"))
+    torch.manual_seed(0)
+    torch.save(build_model(tokenizer.vocab_size(), CONTEXT_SIZE).state_dict(), base / "model.pt")
+
+    resolve_paths = plotcraft_generator._resolve_paths
+    plotcraft_generator._resolve_paths = lambda model_name: (str(base / "model.pt"), str(base / "spm.model"))
+    pool = WorkerPool(["horror"], workers=2).start()
+    address = str(base / "pool.sock")
+    threading.Thread(target=pool.serve, args=(address, b"test-key"), daemon=True).start()
+    while not os.path.exists(address):
+        time.sleep(0.01)
+    client = WorkerPoolClient(address, "test-key")
+    yield pool, client
+    client.close()
+    pool.close()
+    plotcraft_generator._resolve_paths = resolve_paths
+    plotcraft_generator.clear_cache()
+
+
+def test_workers_generate_from_weights_shared_by_the_supervisor(pool):
+    supervisor, client = pool
+    stats = GenerationStats()
+
+    text = client.generate_text("Alice and Bob", max_tokens=12, model_name="horror", seed=3, stats=stats)
+
+    assert text and stats.new_tokens == 12
+    assert client.decode_tokens(client.encode_text("the old house", "horror"), "horror") == "the old house"
+    assert client.model_version("horror") == plotcraft_generator.model_version("horror")
+    model = supervisor._models["horror"][0]
+    assert all(p.is_shared() for p in model.parameters())
+    snapshot = client.stats()
+    assert snapshot["workers_alive"] == 2 and snapshot["completed"] == 1
+
+
+def test_client_stop_criterion_cancels_the_remote_decode(pool):
+    _, client = pool
+    stats = GenerationStats()
+    seen = []
+
+    def enough(ids):
+        seen.append(len(ids))
+        return len(ids) >= 10
+
+    client.generate_text("Alice and Bob", max_tokens=400, model_name="horror", stats=stats, stop_criteria=[enough])
+
+    assert max(seen) >= 10  # token ids were streamed back to the client
+    assert 10 <= stats.new_tokens < 400
+
+
+def test_unserved_genre_is_unavailable(pool):
+    _, client = pool
+    with pytest.raises(PlotCraftUnavailable):
+        client.generate_text("Alice and Bob", max_tokens=5, model_name="action")
+    assert client.model_version("action") is None
+
+
+def test_pool_refuses_to_run_without_an_authkey():
+    with pytest.raises(ValueError):
+        WorkerPoolClient("/tmp/plotcraft-pool.sock", "")
+    with pytest.raises(ValueError):
+        WorkerPool(["horror"], workers=1).serve("127.0.0.1:0", b"")
+
+
+def test_client_gives_up_on_a_wedged_supervisor(tmp_path, monkeypatch):
+    from multiprocessing.connection import Listener
+
+    from plotcraft.src import worker_pool
+
+    monkeypatch.setattr(worker_pool, "SUPERVISOR_TIMEOUT", 0.2)
+    address = str(tmp_path / "wedged.sock")
+    listener = Listener(address, authkey=b"test-key")
+    accepted = []
+    threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True).start()
+
+    client = WorkerPoolClient(address, "test-key")
+    start = time.monotonic()
+    with pytest.raises(PlotCraftUnavailable, match="did not answer"):
+        client.stats()
+    assert time.monotonic() - start < 2
+    listener.close()
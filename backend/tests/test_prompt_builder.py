@@ -0,0 +1,44 @@
+"""Tests for token-budgeted prompt assembly."""
+
+from app.utils.prompt_builder import PromptBudget, PromptBuilder, fragment_cache
+
+
+def _builder(context_size=60, **budget):
+    return PromptBuilder(str.split, " ".join, context_size, PromptBudget(**budget), cache_key="words-test")
+
+
+def test_story_keeps_its_tail_and_generation_room_is_reserved():
+    story = " ".join(f"w{i}" for i in range(100))
+    built = _builder(header=4, characters=4, twist=4, story=50, min_generation=20).build(
+        header="Continue this story. ", characters="Focus on Ada. ", story=story, footer=" Continue:"
+    )
+
+    assert built.text.endswith("w98 w99 Continue:")
+    assert "w0 " not in built.text
+    assert built.prompt_tokens == len(built.text.split()) <= 60 - 20
+    assert built.generation_budget >= 20
+    assert built.truncated == ["story"]
+
+
+def test_sections_are_cut_to_their_budgets():
+    built = _builder(header=2, characters=3, twist=0, min_generation=10).build(
+        header="one two three four", characters="Ada Bob Cy Dee", twist="[Story direction: betrayal]", story="It rained."
+    )
+    assert built.text == "one two\nAda Bob Cy\nIt rained."
+    assert built.section_tokens == {"header": 2, "characters": 3, "twist": 0, "story": 2}
+    assert built.truncated == ["header", "characters", "twist"]
+
+
+def test_template_fragments_are_tokenized_once_per_backend():
+    calls = []
+
+    def encode(text):
+        calls.append(text)
+        return text.split()
+
+    fragment_cache.clear()
+    for _ in range(3):
+        PromptBuilder(encode, " ".join, 400, cache_key="counting").build(header="Continue this story. ", story="It rained.")
+    assert calls.count("Continue this story. ") == 1
+    PromptBuilder(encode, " ".join, 400, cache_key="other").build(header="Continue this story. ", story="It rained.")
+    assert calls.count("Continue this story. ") == 2
@@ -0,0 +1,37 @@
+"""Tests for the seeded generation result cache."""
+
+from app.core import result_cache as result_cache_module
+from app.core.result_cache import ResultCache
+
+
+def test_lru_and_ttl(monkeypatch):
+    """Least recently used entries are evicted; expired ones count as misses."""
+    now = [1000.0]
+    monkeypatch.setattr(result_cache_module.time, "time", lambda: now[0])
+    cache = ResultCache(max_entries=2, ttl_seconds=60)
+
+    cache.put("a", {"text": "A"})
+    cache.put("b", {"text": "B"})
+    assert cache.get("a") == {"text": "A"}
+    cache.put("c", {"text": "C"})  # evicts "b"
+    assert cache.get("b") is None
+
+    now[0] += 61
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expired"]) == (1, 2, 1, 1)
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    """Entries written to SQLite are served (and promoted to memory) by a new instance."""
+    path = str(tmp_path / "results.sqlite")
+    key = ResultCache.make_key(genre="horror", prompt="Alice", seed=7)
+    assert key == ResultCache.make_key(seed=7, prompt="Alice", genre="horror")
+
+    ResultCache(db_path=path).put(key, {"generated_text": "Alice screamed.", "score": 50})
+
+    cache = ResultCache(db_path=path)
+    assert cache.get(key) == {"generated_text": "Alice screamed.", "score": 50}
+    assert cache.get(key) is not None
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
@@ -40,3 +40,341 @@ def test_continue_story_short_text():
         json={"text": "short"}
     )
     assert response.status_code == 400
+
+
+def test_generate_stream_sends_metadata_tokens_and_score(monkeypatch):
+    """Streaming endpoint emits metadata first, then tokens, then score and done."""
+    from app.api import routes_story
+
+    def fake_stream(**kwargs):
+        yield "metadata", {"genre": "horror", "detected_characters": ["Alice"]}
+        yield "token", {"text": "Alice "}
+        yield "token", {"text": "screamed."}
+        yield "score", {"score": 55}
+        yield "done", {"generated_text": "Alice screamed."}
+
+    monkeypatch.setattr(routes_story, "generate_story_stream", fake_stream)
+    response = client.post(
+        "/api/story/generate/stream",
+        json={"user_id": "user_1", "story": "Alice opened the cellar door.", "genre": "horror"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events == ["metadata", "token", "token", "score", "done"]
+
+
+def test_best_of_n_returns_highest_ranked_candidate(monkeypatch):
+    """Candidates are reranked in one pass; no character-focus regeneration follows."""
+    from app.services import story_service
+
+    def fake_candidates(prompt, genre, num_candidates, **kwargs):
+        assert num_candidates == 3
+        return [
+            ("The wind howled outside.", -1.0),
+            ("Alice grabbed Bob by the arm and ran.", -3.0),
+            ("Bob stood alone in the hall.", -2.0),
+        ]
+
+    def no_regeneration(*args, **kwargs):
+        raise AssertionError("best-of-N must not regenerate")
+
+    monkeypatch.setattr(story_service, "_generate_candidates_with_plotcraft_fallback", fake_candidates)
+    monkeypatch.setattr(story_service, "_regenerate_for_character_focus", no_regeneration)
+    monkeypatch.setattr(story_service, "get_characters", lambda text: ["Alice", "Bob"])
+    monkeypatch.setattr(story_service, "get_user_characters", lambda user_id: ["Alice", "Bob"])
+    monkeypatch.setattr(story_service, "save_user_characters", lambda user_id, chars: None)
+
+    result = story_service.generate_story_pipeline(
+        "user_best_of_n", "Alice and Bob opened the cellar door.", genre="horror", candidates=3
+    )
+    assert result["generated_text"] == "Alice grabbed Bob by the arm and ran."
+    assert result["character_focus_required"] is False
+    assert result["score"] is not None
+
+
+def test_seeded_generation_is_served_from_result_cache(monkeypatch):
+    """A repeated seeded request skips generation and is flagged as cached."""
+    from app.core.result_cache import ResultCache
+    from app.services import story_service
+
+    calls = []
+
+    def fake_generate(
+        prompt, genre, max_tokens=300, temperature=0.8, prompt_prefix=None, seed=None, deadline=None,
+        characters=None, monitor=None, context_header=None,
+    ):
+        calls.append(seed)
+        return "Alice screamed and ran down the hall."
+
+    monkeypatch.setattr(story_service, "result_cache", ResultCache(max_entries=8))
+    monkeypatch.setattr(story_service, "_generate_with_plotcraft_fallback", fake_generate)
+    monkeypatch.setattr(story_service, "get_characters", lambda text: ["Alice"])
+    monkeypatch.setattr(story_service, "get_user_characters", lambda user_id: ["Alice"])
+    monkeypatch.setattr(story_service, "save_user_characters", lambda user_id, chars: None)
+
+    kwargs = dict(user_id="user_seeded", prompt="Alice opened the cellar door.", genre="horror", seed=42)
+    first = story_service.generate_story_pipeline(**kwargs)
+    second = story_service.generate_story_pipeline(**kwargs)
+    story_service.generate_story_pipeline(**{**kwargs, "seed": 43})
+
+    assert calls == [42, 43]
+    assert first["cached"] is False and second["cached"] is True
+    assert second["generated_text"] == first["generated_text"]
+    assert second["score"] == first["score"]
+
+
+def test_generate_reports_stage_timings_and_serving_backend(monkeypatch):
+    """/generate returns per-stage timings, the backend that served generation and a Server-Timing header."""
+    from app.services import story_service
+
+    def fake_generate_story(
+        prompt, max_length=None, temperature=0.85, prompt_prefix=None, seed=None, stop=None, characters=None
+    ):
+        return "Alice screamed and ran down the hall."
+
+    monkeypatch.setattr(story_service, "plotcraft_generate_text", None)
+    monkeypatch.setattr(story_service, "generate_story", fake_generate_story)
+    monkeypatch.setattr(story_service, "count_story_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(story_service, "get_characters", lambda text: ["Alice"])
+    monkeypatch.setattr(story_service, "get_user_characters", lambda user_id: ["Alice"])
+    monkeypatch.setattr(story_service, "save_user_characters", lambda user_id, chars: None)
+
+    response = client.post(
+        "/api/story/generate",
+        json={"user_id": "user_timed", "story": "Alice opened the cellar door.", "genre": "horror", "measure": False},
+    )
+    assert response.status_code == 200
+    timings = response.json()["timings"]
+    for name in ("character_detection", "character_persistence", "prompt_build", "generation", "presence_check"):
+        assert name in timings["stages"]
+    assert "scoring" not in timings["stages"]
+    assert timings["total_ms"] >= timings["stages"]["generation"]
+    [call] = timings["generations"]
+    assert call["stage"] == "generation"
+    assert call["backend"] == "transformers"
+    assert call["new_tokens"] == 7
+    server_timing = response.headers["server-timing"]
+    assert "generation;dur=" in server_timing and "total;dur=" in server_timing
+
+
+def test_refine_splits_long_story_into_one_batch_of_windows(monkeypatch):
+    """Refinement rewrites overlapping sentence windows in one batched call and stitches them without duplicates."""
+    from app.core.circuit_breaker import CircuitBreakers
+    from app.services import story_service
+
+    batches = []
+
+    def fake_batch(prompts, **kwargs):
+        batches.append(prompts)
+        # "Rewrite" each window by echoing its story sentences in upper case
+        return [p.split("Original Story:\n", 1)[1].split("\n\nRefined Story:")[0].upper() for p in prompts]
+
+    story = " ".join(f"Sentence number {i} is here." for i in range(60))
+    monkeypatch.setattr(story_service, "breakers", CircuitBreakers())
+    monkeypatch.setattr(story_service, "plotcraft_count_tokens", lambda texts, model_name: [len(t.split()) for t in texts])
+    monkeypatch.setattr(story_service, "plotcraft_loaded_version", lambda model_name: "horror@test")
+    monkeypatch.setattr(story_service, "plotcraft_generate_batch", fake_batch)
+    monkeypatch.setattr(story_service, "PLOTCRAFT_CONTEXT_SIZE", 512)
+    monkeypatch.setattr(story_service.settings, "REFINE_WINDOW_TOKENS", 60)
+    monkeypatch.setattr(story_service.settings, "REFINE_WINDOW_OVERLAP_TOKENS", 10)
+
+    refined = story_service._refine_story(story, "horror")
+
+    [prompts] = batches
+    assert len(prompts) > 1
+    assert all(len(p.split("Original Story:\n", 1)[1].split()) <= 60 + 2 for p in prompts)
+    assert refined == story.upper()
+
+
+def test_drifting_first_pass_is_aborted_at_presence_checkpoint(monkeypatch):
+    """A first pass with no characters by the checkpoint stops there and restarts with the focus prompt."""
+    from app.core.character_focus import CharacterFocusStats
+    from app.core.circuit_breaker import CircuitBreakers
+    from app.services import story_service
+
+    decoded = []
+
+    def fake_plotcraft(prompt, max_tokens=300, stop_criteria=(), **kwargs):
+        focused = "IMPORTANT" in prompt
+        ids = []
+        while len(ids) < max_tokens:
+            ids.append(2 if focused else 1)
+            if any(criterion(ids) for criterion in stop_criteria):
+                break
+        decoded.append(len(ids))
+        return "Alice ran." if focused else "The wind howled."
+
+    stats = CharacterFocusStats()
+    monkeypatch.setattr(story_service, "character_focus_stats", stats)
+    monkeypatch.setattr(story_service, "breakers", CircuitBreakers())
+    monkeypatch.setattr(story_service, "plotcraft_generate_text", fake_plotcraft)
+    monkeypatch.setattr(story_service, "plotcraft_generate_long_text", fake_plotcraft)
+    monkeypatch.setattr(
+        story_service, "plotcraft_decode_tokens", lambda ids, model_name: "Alice" if 2 in ids else "The wind"
+    )
+    monkeypatch.setattr(story_service, "get_characters", lambda text: ["Alice"])
+    monkeypatch.setattr(story_service, "get_user_characters", lambda user_id: ["Alice"])
+    monkeypatch.setattr(story_service, "save_user_characters", lambda user_id, chars: None)
+    monkeypatch.setattr(story_service.settings, "CHARACTER_MONITOR_CHECKPOINT_TOKENS", 64)
+
+    result = story_service.generate_story_pipeline(
+        "user_drift", "Alice opened the cellar door.", genre="horror", measure=False, max_tokens=300
+    )
+
+    assert decoded == [64, 300]
+    assert result["generated_text"] == "Alice ran."
+    assert result["character_focus_required"] is True
+    snapshot = stats.snapshot()
+    assert snapshot["early_aborts"] == 1 and snapshot["tokens_saved"] == 300 - 64
+    assert snapshot["regenerations"] == 1
+
+
+def test_empty_candidates_fail_with_the_backend_error(monkeypatch):
+    """A fallback that samples no candidates is reported as such, not as an unexplained failure."""
+    from app.core.circuit_breaker import CircuitBreakers
+    from app.services import story_service
+
+    monkeypatch.setattr(story_service, "breakers", CircuitBreakers())
+    monkeypatch.setattr(story_service, "plotcraft_generate_candidates", None)
+    monkeypatch.setattr(story_service, "generate_story_candidates", lambda prompt, num_candidates, **kwargs: [])
+
+    with pytest.raises(RuntimeError, match="Transformers produced no output"):
+        story_service._generate_candidates_with_plotcraft_fallback("A dark night", "horror", 3)
+
+
+def test_refine_rewrites_never_exceed_the_plotcraft_context(monkeypatch):
+    """The rewrite budget of each window is clamped to the context left after its prompt."""
+    from app.core.circuit_breaker import CircuitBreakers
+    from app.services import story_service
+
+    calls = []
+
+    def fake_batch(prompts, max_tokens=None, **kwargs):
+        calls.append((prompts, max_tokens))
+        return ["" for _ in prompts]
+
+    monkeypatch.setattr(story_service, "breakers", CircuitBreakers())
+    monkeypatch.setattr(story_service, "plotcraft_count_tokens", lambda texts, model_name: [len(t.split()) for t in texts])
+    monkeypatch.setattr(story_service, "plotcraft_loaded_version", lambda model_name: "horror@test")
+    monkeypatch.setattr(story_service, "plotcraft_generate_batch", fake_batch)
+    monkeypatch.setattr(story_service, "PLOTCRAFT_CONTEXT_SIZE", 160)
+    monkeypatch.setattr(story_service.settings, "REFINE_WINDOW_TOKENS", 200)
+
+    story_service._refine_story(" ".join(f"Sentence number {i} is here." for i in range(40)), "horror")
+
+    [(prompts, max_tokens)] = calls
+    assert all(len(prompt.split()) + max_tokens <= 160 for prompt in prompts)
+
+
+def test_refine_splits_an_overlong_sentence_instead_of_shrinking_every_rewrite(monkeypatch):
+    """One long sentence is cut at word boundaries; the other windows keep a full rewrite budget."""
+    from app.core.circuit_breaker import CircuitBreakers
+    from app.services import story_service
+
+    calls = []
+
+    def fake_batch(prompts, max_tokens=None, **kwargs):
+        calls.append((prompts, max_tokens))
+        return [p.split("Original Story:\n", 1)[1].split("\n\nRefined Story:")[0].upper() for p in prompts]
+
+    story = " ".join(" ".join(["word"] * (n - 1)) + " end." for n in (30, 30, 400, 30, 30))
+    monkeypatch.setattr(story_service, "breakers", CircuitBreakers())
+    monkeypatch.setattr(story_service, "plotcraft_count_tokens", lambda texts, model_name: [len(t.split()) for t in texts])
+    monkeypatch.setattr(story_service, "plotcraft_loaded_version", lambda model_name: "horror@test")
+    monkeypatch.setattr(story_service, "plotcraft_generate_batch", fake_batch)
+    monkeypatch.setattr(story_service, "PLOTCRAFT_CONTEXT_SIZE", 512)
+
+    refined = story_service._refine_story(story, "horror")
+
+    [(prompts, max_tokens)] = calls
+    window_tokens = story_service.settings.REFINE_WINDOW_TOKENS
+    assert max_tokens >= window_tokens
+    assert all(len(p.split("Original Story:\n", 1)[1].split()) <= window_tokens + 2 for p in prompts)
+    assert refined == story.upper()
+
+
+def test_refine_keeps_originals_for_truncated_or_collapsed_rewrites(monkeypatch):
+    """A rewrite that fills the whole budget or shrinks below half its window is discarded."""
+    from app.core.circuit_breaker import CircuitBreakers
+    from app.services import story_service
+
+    def fake_batch(prompts, max_tokens=None, **kwargs):
+        return ["Short." if i == 0 else " ".join(["cut"] * max_tokens) for i, _ in enumerate(prompts)]
+
+    story = " ".join(f"Sentence number {i} is here." for i in range(60))
+    monkeypatch.setattr(story_service, "breakers", CircuitBreakers())
+    monkeypatch.setattr(story_service, "plotcraft_count_tokens", lambda texts, model_name: [len(t.split()) for t in texts])
+    monkeypatch.setattr(story_service, "plotcraft_loaded_version", lambda model_name: "horror@test")
+    monkeypatch.setattr(story_service, "plotcraft_generate_batch", fake_batch)
+    monkeypatch.setattr(story_service, "PLOTCRAFT_CONTEXT_SIZE", 512)
+    monkeypatch.setattr(story_service.settings, "REFINE_WINDOW_TOKENS", 60)
+    monkeypatch.setattr(story_service.settings, "REFINE_WINDOW_OVERLAP_TOKENS", 10)
+
+    assert story_service._refine_story(story, "horror") == story
+
+
+def test_prompt_builder_is_resolved_from_loaded_state_and_cached(monkeypatch):
+    """No tokenizer probe runs per request; the builder changes only with the loaded model or breaker."""
+    from app.core.circuit_breaker import CircuitBreakers
+    from app.services import story_service
+
+    versions = {"horror": None}
+
+    def no_probe(text, model_name):
+        raise AssertionError("the PlotCraft tokenizer must not be probed")
+
+    breakers = CircuitBreakers()
+    monkeypatch.setattr(story_service, "breakers", breakers)
+    monkeypatch.setattr(story_service, "plotcraft_encode_text", no_probe)
+    monkeypatch.setattr(story_service, "plotcraft_loaded_version", versions.get)
+    monkeypatch.setattr(story_service, "_prompt_builders", {})
+
+    assert not story_service._prompt_builder("horror").cache_key.startswith("plotcraft:")
+    versions["horror"] = "horror@1"
+    builder = story_service._prompt_builder("horror")
+    assert builder.cache_key == "plotcraft:horror@1"
+    assert story_service._prompt_builder("horror") is builder
+    breakers.get("plotcraft", "horror").record_failure(RuntimeError("load failed"), trip=True)
+    assert story_service._prompt_builder("horror") is not builder
+
+
+def test_fallback_output_is_not_cached_under_the_plotcraft_key(monkeypatch):
+    """A seeded request PlotCraft failed on is not replayed as PlotCraft output."""
+    from app.core.circuit_breaker import CircuitBreakers
+    from app.core.result_cache import ResultCache
+    from app.services import story_service
+
+    calls = []
+
+    def failing_plotcraft(prompt, **kwargs):
+        calls.append("plotcraft")
+        raise RuntimeError("decode failed")
+
+    def fake_generate_story(prompt, **kwargs):
+        calls.append("transformers")
+        return "Alice screamed and ran down the hall."
+
+    monkeypatch.setattr(story_service, "result_cache", ResultCache(max_entries=8))
+    monkeypatch.setattr(story_service, "breakers", CircuitBreakers(failure_threshold=2))
+    monkeypatch.setattr(story_service, "plotcraft_loaded_version", lambda model_name: "horror@1")
+    monkeypatch.setattr(story_service, "plotcraft_encode_text", lambda text, model_name: text.split())
+    monkeypatch.setattr(story_service, "plotcraft_decode_tokens", lambda ids, model_name: " ".join(ids))
+    monkeypatch.setattr(story_service, "_prompt_builders", {})
+    monkeypatch.setattr(story_service, "plotcraft_generate_text", failing_plotcraft)
+    monkeypatch.setattr(story_service, "plotcraft_generate_long_text", failing_plotcraft)
+    monkeypatch.setattr(story_service, "generate_story", fake_generate_story)
+    monkeypatch.setattr(story_service, "count_story_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(story_service, "get_characters", lambda text: ["Alice"])
+    monkeypatch.setattr(story_service, "get_user_characters", lambda user_id: ["Alice"])
+    monkeypatch.setattr(story_service, "save_user_characters", lambda user_id, chars: None)
+
+    kwargs = dict(user_id="user_fallback", prompt="Alice opened the cellar door.", genre="horror", seed=7, measure=False)
+    first = story_service.generate_story_pipeline(**kwargs)
+    second = story_service.generate_story_pipeline(**kwargs)
+
+    assert first["cached"] is False and second["cached"] is False
+    assert calls == ["plotcraft", "transformers", "plotcraft", "transformers"]
+    # The breaker is open now: the request is keyed (and cached) for transformers
+    story_service.generate_story_pipeline(**kwargs)
+    assert story_service.generate_story_pipeline(**kwargs)["cached"] is True
@@ -0,0 +1,75 @@
+"""Tests for the transformers story generator."""
+
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+tokenizers = pytest.importorskip("tokenizers")
+
+from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast, pipeline
+
+from app.models.story_generator import StoryGenerator
+
+WORDS = "the a dark night alice bob ran to door house storm and".split()
+
+
+@pytest.fixture(scope="module")
+def generator():
+    """StoryGenerator over a tiny random GPT-2 and a word-level tokenizer (no download)."""
+    vocab = {word: i for i, word in enumerate(["<eos>", "<unk>"] + WORDS)}
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    torch.manual_seed(0)
+    config = GPT2Config(
+        vocab_size=len(vocab), n_positions=256, n_embd=32, n_layer=1, n_head=2, bos_token_id=0, eos_token_id=0
+    )
+    story = StoryGenerator()
+    story.generator = pipeline(
+        "text-generation",
+        model=GPT2LMHeadModel(config).eval(),
+        tokenizer=PreTrainedTokenizerFast(tokenizer_object=tokenizer, eos_token="<eos>", unk_token="<unk>"),
+    )
+    story._is_loaded = True
+    return story
+
+
+def test_seeded_generation_ignores_concurrent_unseeded_sampling(generator):
+    kwargs = dict(max_length=40, seed=7)
+    expected = generator.generate("alice ran to the door", **kwargs)
+
+    done = threading.Event()
+
+    def unseeded_traffic():
+        while not done.is_set():
+            generator.generate("bob and the storm", max_length=5)
+            torch.rand(1)
+
+    traffic = threading.Thread(target=unseeded_traffic)
+    traffic.start()
+    try:
+        results = [generator.generate("alice ran to the door", **kwargs) for _ in range(3)]
+    finally:
+        done.set()
+        traffic.join()
+
+    assert results == [expected] * 3
+    assert generator.generate("alice ran to the door", **{**kwargs, "seed": 8}) != expected
+
+
+def test_batch_generation_leaves_the_shared_tokenizer_unchanged(generator):
+    tokenizer = generator.generator.tokenizer
+    before = (tokenizer.pad_token, tokenizer.padding_side)
+
+    continuations = generator.generate_batch(["alice ran", "bob and the dark storm"], max_length=5, seed=3)
+
+    assert len(continuations) == 2
+    assert (tokenizer.pad_token, tokenizer.padding_side) == before
+
+
+def test_prefix_cache_reuses_the_template_kv(generator):
+    prefix = "the dark night and the storm"
+    generator.generate(prefix + " alice ran", max_length=5, prompt_prefix=prefix)
+    generator.generate(prefix + " bob ran", max_length=5, prompt_prefix=prefix)
+
+    assert generator._prefix_cache.stats()["hits"] >= 1